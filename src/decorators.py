@@ -1,13 +1,16 @@
 """Decorators for database operations."""
 
+import sys
+import threading
 import time
+from collections import OrderedDict
 
-import prompt
-
+from src.primitive_db import metrics
 from src.primitive_db.constants import (
+    CACHE_MAX_ENTRIES,
+    CACHE_MAX_ENTRY_SIZE,
     INFO_OPERATION_CANCELLED,
     PROMPT_CONFIRM,
-    TIMING_FORMAT,
 )
 
 
@@ -40,6 +43,9 @@ def confirm_action(action_name):
     """
     Decorator factory for confirming dangerous operations.
 
+    The decorated function accepts an extra keyword argument
+    confirmed=True that skips the question (used by batch mode --yes).
+
     Args:
         action_name: Name of the action to confirm
 
@@ -48,7 +54,12 @@ def confirm_action(action_name):
     """
 
     def decorator(func):
-        def wrapper(*args, **kwargs):
+        def wrapper(*args, confirmed=False, **kwargs):
+            if confirmed:
+                return func(*args, **kwargs)
+
+            import prompt
+
             confirmation = prompt.string(
                 PROMPT_CONFIRM.format(action=action_name)
             ).strip().lower()
@@ -64,52 +75,189 @@ def confirm_action(action_name):
     return decorator
 
 
+def _timed_iterator(name, iterator, elapsed):
+    """Yield from an iterator, observing the time spent producing items."""
+    try:
+        while True:
+            start_time = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                elapsed += time.perf_counter() - start_time
+            yield item
+    finally:
+        metrics.observe(name, elapsed)
+
+
 def log_time(func):
     """
-    Decorator to measure and log function execution time.
+    Decorator to record function execution time in the metrics registry.
 
-    Uses time.monotonic() for accurate measurement.
+    Calls are timed with time.perf_counter() and observed under the
+    function name; nothing is printed. A returned iterator does its work
+    while it is consumed, so the time spent in it is added and observed
+    once it is exhausted or closed. Costs one flag check when metrics are
+    disabled.
     """
 
     def wrapper(*args, **kwargs):
-        start_time = time.monotonic()
-        result = func(*args, **kwargs)
-        end_time = time.monotonic()
-
-        elapsed_time = end_time - start_time
-        print(TIMING_FORMAT.format(func_name=func.__name__, elapsed_time=elapsed_time))
-
+        if not metrics.enabled:
+            return func(*args, **kwargs)
+        start_time = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        except BaseException:
+            metrics.observe(func.__name__, time.perf_counter() - start_time)
+            raise
+        elapsed = time.perf_counter() - start_time
+        if hasattr(result, "__next__"):
+            return _timed_iterator(func.__name__, result, elapsed)
+        metrics.observe(func.__name__, elapsed)
         return result
 
     return wrapper
 
 
-def create_cacher():
+def estimate_size(value):
+    """
+    Roughly estimate memory used by a cached value.
+
+    Args:
+        value: Value to measure (list of records or any object)
+
+    Returns:
+        Approximate size in bytes
+    """
+    size = sys.getsizeof(value)
+    if isinstance(value, list):
+        size += sum(sys.getsizeof(item) for item in value)
+    return size
+
+
+def create_cacher(max_entries=CACHE_MAX_ENTRIES, max_entry_size=CACHE_MAX_ENTRY_SIZE):
     """
-    Create a caching function using closures.
+    Create a bounded LRU caching function using closures.
+
+    Values larger than max_entry_size are returned but not cached.
+    When the cache is full the least recently used entry is evicted.
+    The cache can be shared by threads; values are computed outside the
+    lock.
+
+    Args:
+        max_entries: Maximum number of cached entries
+        max_entry_size: Maximum estimated size of one entry in bytes
 
     Returns:
-        cache_result function that caches function results
+        cache_result function that caches function results. It also has
+        get(key), put(key, value, tag), skip(), invalidate(tag), clear()
+        and stats() attributes and the max_entry_size limit.
     """
-    cache = {}
+    cache = OrderedDict()
+    tags = {}
+    counters = {"hits": 0, "misses": 0, "evictions": 0, "skipped": 0}
+    lock = threading.Lock()
+
+    def get(key):
+        """
+        Retrieve a cached value, counting a hit or a miss.
 
-    def cache_result(key, value_func):
+        Args:
+            key: Cache key
+
+        Returns:
+            Cached value or None if key is not in cache
+        """
+        with lock:
+            if key in cache:
+                cache.move_to_end(key)
+                counters["hits"] += 1
+                return cache[key]
+            counters["misses"] += 1
+        return None
+
+    def skip():
+        """Count a value that was too large to be cached."""
+        with lock:
+            counters["skipped"] += 1
+
+    def put(key, result, tag=None):
+        """
+        Store a computed value unless it is too large.
+
+        Args:
+            key: Cache key
+            result: Value to store
+            tag: Optional tag (e.g. table name) used for invalidation
+        """
+        if estimate_size(result) > max_entry_size:
+            skip()
+            return
+
+        with lock:
+            cache[key] = result
+            if tag is not None:
+                tags.setdefault(tag, set()).add(key)
+
+            while len(cache) > max_entries:
+                old_key, _ = cache.popitem(last=False)
+                for keys in tags.values():
+                    keys.discard(old_key)
+                counters["evictions"] += 1
+
+    def cache_result(key, value_func, tag=None):
         """
         Cache result or retrieve from cache.
 
         Args:
             key: Cache key
             value_func: Function to call if key not in cache
+            tag: Optional tag (e.g. table name) used for invalidation
 
         Returns:
             Cached or newly computed value
         """
-        if key in cache:
-            return cache[key]
-
-        result = value_func()
-        cache[key] = result
+        result = get(key)
+        if result is None:
+            result = value_func()
+            if result is not None:
+                put(key, result, tag)
         return result
 
-    return cache_result
+    def invalidate(tag):
+        """
+        Drop all entries stored with the given tag.
+
+        Args:
+            tag: Tag passed to cache_result
+        """
+        with lock:
+            for key in tags.pop(tag, ()):
+                cache.pop(key, None)
+
+    def clear():
+        """Drop all cached entries."""
+        with lock:
+            cache.clear()
+            tags.clear()
+
+    def stats():
+        """
+        Get cache counters.
+
+        Returns:
+            Dictionary with hits, misses, evictions, skipped and entries
+        """
+        with lock:
+            return {**counters, "entries": len(cache)}
+
+    cache_result.get = get
+    cache_result.put = put
+    cache_result.skip = skip
+    cache_result.max_entry_size = max_entry_size
+    cache_result.invalidate = invalidate
+    cache_result.clear = clear
+    cache_result.stats = stats
 
+    return cache_result
@@ -0,0 +1,195 @@
+"""Single-pass aggregation for select count/sum/min/max/avg.
+
+The aggregates of a query are compiled into one generated Python
+function that walks the records once, keeping one small state list per
+group: the row count followed by one running value per aggregate. No
+list of matching records is ever built.
+"""
+
+import json
+
+from src.primitive_db.index import is_sorted, range_bounds, sorted_range
+from src.primitive_db.query import accessor, conjuncts
+
+
+def aggregate_name(func, column):
+    """
+    Build result column name of an aggregate.
+
+    Args:
+        func: Aggregate function or None for a plain column
+        column: Column name or None for *
+
+    Returns:
+        Name like "count(*)" or "sum(age)"
+    """
+    if func is None:
+        return column
+    return f"{func}({column or '*'})"
+
+
+def compile_aggregates(aggregates, group_by=None, row_class=None, value_only=False):
+    """
+    Compile aggregates into a function doing one pass over records.
+
+    Args:
+        aggregates: List of (func, column) pairs, column None for count(*)
+        group_by: Column to group by or None
+        row_class: Class of the records, used to read generated row slots
+        value_only: Records are bare values of the only column used
+
+    Returns:
+        Function taking an iterable of records and returning a dictionary
+        from group key (None without group by) to state list
+    """
+
+    def read(column):
+        return "r" if value_only else accessor(column, row_class)
+
+    key = read(group_by) if group_by is not None else "None"
+    init = ["1"]
+    step = ["s[0] += 1"]
+    for pos, (func, column) in enumerate(aggregates, start=1):
+        if func in ("sum", "avg"):
+            # + 0 turns a bool into an int
+            init.append(f"{read(column)} + 0")
+        elif func in ("min", "max"):
+            init.append(read(column))
+        else:
+            init.append("None")
+        if func in ("sum", "avg"):
+            step.append(f"s[{pos}] += {read(column)}")
+        elif func in ("min", "max"):
+            better = "<" if func == "min" else ">"
+            step.append(f"v = {read(column)}")
+            step.append(f"if v {better} s[{pos}]:")
+            step.append(f"    s[{pos}] = v")
+
+    body = "\n".join(" " * 12 + line for line in step)
+    source = (
+        "def run(records):\n"
+        "    groups = {}\n"
+        "    for r in records:\n"
+        f"        k = {key}\n"
+        "        s = groups.get(k)\n"
+        "        if s is None:\n"
+        f"            groups[k] = [{', '.join(init)}]\n"
+        "        else:\n"
+        f"{body}\n"
+        "    return groups\n"
+    )
+    scope = {}
+    exec(source, scope)
+    return scope["run"]
+
+
+def merge_groups(aggregates, groups, partial):
+    """
+    Merge group states computed over another part of the records.
+
+    Args:
+        aggregates: List of (func, column) pairs
+        groups: Dictionary from group key to state list, updated in place
+        partial: Dictionary of the same shape for the other records
+    """
+    for key, state in partial.items():
+        total = groups.get(key)
+        if total is None:
+            groups[key] = state
+            continue
+        total[0] += state[0]
+        for pos, (func, _) in enumerate(aggregates, start=1):
+            if func in ("sum", "avg"):
+                total[pos] += state[pos]
+            elif func == "min" and state[pos] < total[pos]:
+                total[pos] = state[pos]
+            elif func == "max" and state[pos] > total[pos]:
+                total[pos] = state[pos]
+
+
+def finish(aggregates, group_key, state):
+    """
+    Turn a group state into a result record.
+
+    Args:
+        aggregates: List of (func, column) pairs
+        group_key: Value of the group column
+        state: State list or None for an empty input
+
+    Returns:
+        Dictionary from result column name to value
+    """
+    result = {}
+    for pos, (func, column) in enumerate(aggregates, start=1):
+        name = aggregate_name(func, column)
+        if func is None:
+            result[name] = group_key
+        elif func == "count":
+            result[name] = state[0] if state else 0
+        elif state is None:
+            result[name] = None
+        elif func == "avg":
+            result[name] = state[pos] / state[0]
+        else:
+            result[name] = state[pos]
+    return result
+
+
+def index_only(indexes, aggregates, where_clause, group_by, column_types):
+    """
+    Compute aggregates from an index without reading records.
+
+    Works when every aggregate is count(*) or uses one column that has a
+    sorted index, grouping (if any) is by that column and the condition
+    only restricts the range of its values. A hash index can answer
+    count(*) grouped by its column when there is no condition.
+
+    Args:
+        indexes: Dictionary of indexes
+        aggregates: List of (func, column) pairs
+        where_clause: Condition tree or None
+        group_by: Column to group by or None
+        column_types: Dictionary of column types by name
+
+    Returns:
+        Dictionary from group key to state list, or None if the index
+        can not answer the query
+    """
+    if not indexes:
+        return None
+
+    columns = {column for _, column in aggregates if column is not None}
+    if group_by is not None:
+        columns.add(group_by)
+    if len(columns) != 1:
+        return None
+    (column,) = columns
+    index = indexes.get(column)
+    if index is None:
+        return None
+
+    if not is_sorted(index):
+        if where_clause is not None or group_by is None:
+            return None
+        if any(func not in (None, "count") for func, _ in aggregates):
+            return None
+        # Hash keys store bools as ints
+        convert = bool if column_types.get(column) == "bool" else None
+        empty = [None] * len(aggregates)
+        groups = {}
+        for key, ids in index.items():
+            if ids:
+                value = json.loads(key)
+                groups[convert(value) if convert else value] = [len(ids), *empty]
+        return groups
+
+    if any(
+        node[0] != "cmp" or node[2] != column or node[1] == "!="
+        for node in conjuncts(where_clause)
+    ):
+        return None
+    bounds = range_bounds(where_clause, column) or (None, None)
+    start, stop = sorted_range(index, *bounds)
+    run = compile_aggregates(aggregates, group_by, value_only=True)
+    return run(index["keys"][start:stop])
+
@@ -0,0 +1,384 @@
+"""Benchmarks of the core operations at several table sizes.
+
+Usage:
+    python -m src.primitive_db.bench [--sizes 1000,100000,1000000]
+        [--schema name:str,age:int,is_active:bool] [--repeat 5]
+        [--warmup 1] [--output bench.json] [--compare old.json]
+
+For every size a synthetic table with the given schema is generated
+from a fixed seed, then each operation is run warmup times untimed and
+repeat times timed. Throughput is records processed per second at the
+median time. Results are printed and saved as JSON; --compare prints
+the change of median time against an earlier result file and marks
+operations that got slower by more than --threshold.
+
+Files are written to a temporary directory, the database in the
+current directory is not touched.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import resource
+import sys
+import tempfile
+import time
+
+from src.primitive_db.core import (
+    create_table,
+    delete,
+    display_table,
+    insert,
+    insert_many,
+    select,
+    update,
+)
+from src.primitive_db.parser import parse_set, parse_where, tokenize
+from src.primitive_db.storage import table_row_type
+from src.primitive_db.utils import load_table_data, save_table_data
+
+TABLE_NAME = "bench"
+DEFAULT_SIZES = "1000,100000,1000000"
+DEFAULT_SCHEMA = "name:str,age:int,is_active:bool"
+INSERT_BATCH = 1000
+DISPLAY_ROWS = 1000
+# Values of int columns are drawn from this range, so an equality
+# condition matches about 1% of records
+INT_RANGE = 100
+
+
+def _random_value(rng, col_type):
+    if col_type == "int":
+        return rng.randrange(INT_RANGE)
+    if col_type == "bool":
+        return rng.random() < 0.5
+    return f"s{rng.randrange(1_000_000)}"
+
+
+def generate_table(metadata, size, seed):
+    """
+    Generate synthetic records for the benchmark table.
+
+    Args:
+        metadata: Metadata with the benchmark table
+        size: Number of records
+        seed: Random seed
+
+    Returns:
+        List of records with IDs 1..size
+    """
+    rng = random.Random(seed)
+    table_meta = metadata[TABLE_NAME]
+    types = [col["type"] for col in table_meta["columns"][1:]]
+    row_class = table_row_type(table_meta)
+    table_data = [
+        row_class(record_id, *(_random_value(rng, col_type) for col_type in types))
+        for record_id in range(1, size + 1)
+    ]
+    table_meta["sequence"] = size
+    return table_data
+
+
+def _condition_column(columns):
+    """Pick a non-ID int column for scans, or ID if there is none."""
+    for col in columns[1:]:
+        if col["type"] == "int":
+            return col["name"]
+    return "ID"
+
+
+def _set_text(column, sample):
+    name, col_type = column["name"], column["type"]
+    if col_type == "int":
+        return f"{name} = {sample}"
+    if col_type == "bool":
+        return f"{name} = {'true' if sample % 2 else 'false'}"
+    return f'{name} = "v{sample}"'
+
+
+def build_operations(metadata, table_data, seed):
+    """
+    Describe the benchmarked operations.
+
+    Each operation is a tuple (name, setup, run, records): setup(sample)
+    prepares arguments outside the timing, run(arguments) is timed and
+    records is how many records one run processes.
+
+    Args:
+        metadata: Metadata with the benchmark table
+        table_data: Generated records
+        seed: Random seed
+
+    Returns:
+        List of operations
+    """
+    columns = metadata[TABLE_NAME]["columns"]
+    size = len(table_data)
+    rng = random.Random(seed)
+    condition = _condition_column(columns)
+    value = INT_RANGE // 2 if condition != "ID" else size // 2
+    scan_where = parse_where(tokenize(f"{condition} = {value}"))
+    id_where = parse_where(tokenize(f"ID = {max(size // 2, 1)}"))
+    shown = table_data[:DISPLAY_ROWS]
+    row_class = table_row_type(metadata[TABLE_NAME])
+
+    def insert_rows(_):
+        return [
+            [_random_value(rng, col["type"]) for col in columns[1:]]
+            for _ in range(INSERT_BATCH)
+        ]
+
+    def run_insert(rows):
+        data = table_data
+        for values in rows:
+            data = insert(metadata, TABLE_NAME, values, data)
+        # Keep the table at its size for the following operations
+        del data[size:]
+
+    def run_insert_many(rows):
+        insert_many(metadata, TABLE_NAME, rows, table_data)
+        del table_data[size:]
+
+    def run_update(set_clause):
+        update(metadata, TABLE_NAME, table_data, set_clause, scan_where)
+
+    return [
+        ("insert", insert_rows, run_insert, INSERT_BATCH),
+        ("insert_many", insert_rows, run_insert_many, INSERT_BATCH),
+        (
+            "select_scan",
+            lambda _: None,
+            lambda _: select(table_data, scan_where),
+            size,
+        ),
+        (
+            "select_limit",
+            lambda _: None,
+            lambda _: select(table_data, scan_where, limit=10),
+            10,
+        ),
+        ("select_id", lambda _: None, lambda _: select(table_data, id_where), 1),
+        (
+            "update",
+            lambda sample: parse_set(tokenize(_set_text(columns[-1], sample))),
+            run_update,
+            size,
+        ),
+        (
+            "delete",
+            lambda _: list(table_data),
+            lambda data: delete(TABLE_NAME, data, scan_where, confirmed=True),
+            size,
+        ),
+        (
+            "save_table_data",
+            lambda _: None,
+            lambda _: save_table_data(TABLE_NAME, table_data),
+            size,
+        ),
+        (
+            "load_table_data",
+            lambda _: save_table_data(TABLE_NAME, table_data),
+            lambda _: load_table_data(TABLE_NAME, row_class),
+            size,
+        ),
+        (
+            "display_table",
+            lambda _: None,
+            lambda _: display_table(shown, columns),
+            len(shown),
+        ),
+    ]
+
+
+def _percentile(values, share):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * share))]
+
+
+def peak_rss_kb():
+    """
+    Get peak resident set size of the process.
+
+    Returns:
+        Peak RSS in kilobytes
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux kilobytes
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def measure(setup, run, warmup, repeat):
+    """
+    Time an operation.
+
+    Args:
+        setup: Function preparing arguments of a run, called untimed
+        run: Timed function
+        warmup: Number of untimed runs
+        repeat: Number of timed runs
+
+    Returns:
+        List of run times in seconds
+    """
+    times = []
+    with open(os.devnull, "w", encoding="utf-8") as devnull:
+        for sample in range(warmup + repeat):
+            arguments = setup(sample)
+            with contextlib.redirect_stdout(devnull):
+                start = time.perf_counter()
+                run(arguments)
+                elapsed = time.perf_counter() - start
+            if sample >= warmup:
+                times.append(elapsed)
+    return times
+
+
+def run_benchmarks(sizes, schema, warmup, repeat, seed):
+    """
+    Run all operations for all table sizes.
+
+    Args:
+        sizes: List of table sizes
+        schema: List of column definitions like ["name:str", "age:int"]
+        warmup: Number of untimed runs of each operation
+        repeat: Number of timed runs of each operation
+        seed: Random seed
+
+    Returns:
+        List of result dictionaries
+    """
+    results = []
+    for size in sizes:
+        metadata = {}
+        with open(os.devnull, "w", encoding="utf-8") as devnull:
+            with contextlib.redirect_stdout(devnull):
+                created = create_table(metadata, TABLE_NAME, schema)
+        if created is None:
+            raise ValueError(f"Некорректная схема: {' '.join(schema)}")
+        table_data = generate_table(metadata, size, seed)
+
+        for name, setup, run, records in build_operations(
+            metadata, table_data, seed
+        ):
+            times = measure(setup, run, warmup, repeat)
+            median = _percentile(times, 0.5)
+            result = {
+                "size": size,
+                "operation": name,
+                "records": records,
+                "throughput": records / median if median else None,
+                "p50_ms": median * 1000,
+                "p99_ms": _percentile(times, 0.99) * 1000,
+                "peak_rss_kb": peak_rss_kb(),
+            }
+            results.append(result)
+            print(_format_result(result), flush=True)
+    return results
+
+
+def _format_result(result):
+    throughput = result["throughput"]
+    return (
+        f"{result['size']:>9} {result['operation']:<16} "
+        f"{throughput or 0:>14,.0f} зап/с  "
+        f"p50 {result['p50_ms']:>10.3f} мс  p99 {result['p99_ms']:>10.3f} мс  "
+        f"RSS {result['peak_rss_kb'] // 1024} МБ"
+    )
+
+
+def compare(results, baseline, threshold):
+    """
+    Print changes of median times against an earlier run.
+
+    Args:
+        results: Current result dictionaries
+        baseline: Result dictionaries of the earlier run
+        threshold: Share of slowdown that is reported as a regression
+
+    Returns:
+        Number of regressions
+    """
+    old = {(item["size"], item["operation"]): item for item in baseline}
+    regressions = 0
+    for result in results:
+        before = old.get((result["size"], result["operation"]))
+        if before is None or not before["p50_ms"]:
+            continue
+        change = result["p50_ms"] / before["p50_ms"] - 1
+        slower = change > threshold
+        regressions += slower
+        print(
+            f"{result['size']:>9} {result['operation']:<16} "
+            f"{before['p50_ms']:>10.3f} -> {result['p50_ms']:>10.3f} мс "
+            f"({change:+.1%}){'  ЗАМЕДЛЕНИЕ' if slower else ''}"
+        )
+    return regressions
+
+
+def main(argv=None):
+    """
+    Run the benchmarks from the command line.
+
+    Args:
+        argv: List of arguments or None for sys.argv
+
+    Returns:
+        Exit code: 1 if --compare found regressions, 0 otherwise
+    """
+    parser = argparse.ArgumentParser(description="Замеры основных операций.")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES)
+    parser.add_argument("--schema", default=DEFAULT_SCHEMA)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="bench.json")
+    parser.add_argument("--compare", help="файл результатов прошлого запуска")
+    parser.add_argument("--threshold", type=float, default=0.1)
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    schema = args.schema.split(",")
+    output = os.path.abspath(args.output)
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        try:
+            results = run_benchmarks(
+                sizes, schema, args.warmup, args.repeat, args.seed
+            )
+        finally:
+            os.chdir(cwd)
+
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "settings": {
+            "sizes": sizes,
+            "schema": schema,
+            "warmup": args.warmup,
+            "repeat": args.repeat,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Результаты сохранены в {output}")
+
+    if baseline is not None:
+        return 1 if compare(results, baseline, args.threshold) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+"""Launch latency of the command line program.
+
+Usage:
+    python -m src.primitive_db.bench_startup [--runs 20] [--tables 200]
+        [--command "select from t0 where ID = 1"]
+
+A database with the given number of tables is created in a temporary
+directory, then "project -c <command>" is started as a new process again
+and again:
+
+- python: the interpreter alone ("python -c pass"), for reference;
+- first: every launch gets an empty bytecode cache, as the first launch
+  after installing or updating the program;
+- repeated: launches reuse the compiled bytecode.
+
+Wall time of each launch is measured and min, p50 and p95 are printed.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+DEFAULT_COMMAND = "select from t0 where ID = 1"
+# Root of the repository, so that the launched processes find the package
+PACKAGE_ROOT = os.path.dirname(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+)
+
+
+def _environment(pycache=None):
+    env = dict(os.environ)
+    # Launches should find compiled bytecode, as an installed package does
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    if pycache is not None:
+        env["PYTHONPYCACHEPREFIX"] = pycache
+    paths = [PACKAGE_ROOT, env.get("PYTHONPATH", "")]
+    env["PYTHONPATH"] = os.pathsep.join(path for path in paths if path)
+    return env
+
+
+def _launch(arguments, workdir, env):
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, *arguments],
+        cwd=workdir,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        check=True,
+    )
+    return time.perf_counter() - start
+
+
+def create_database(workdir, tables, env):
+    """
+    Create the benchmark database.
+
+    Args:
+        workdir: Directory of the database
+        tables: Number of tables
+        env: Environment of the launched process
+    """
+    lines = [
+        f"create_table t{number} name:str age:int is_active:bool"
+        for number in range(tables)
+    ]
+    lines.append('insert into t0 values ("a", 1, true), ("b", 2, false)')
+    script = os.path.join(workdir, "setup.sql")
+    with open(script, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    _launch(["-m", "src.primitive_db.main", "--file", script], workdir, env)
+
+
+def measure(workdir, command, runs, env):
+    """
+    Time launches of the program.
+
+    Args:
+        workdir: Directory of the database
+        command: Command run by each launch
+        runs: Number of timed launches of each kind
+        env: Environment of the launched processes
+
+    Returns:
+        Dictionary mapping launch kinds to lists of times in seconds
+    """
+    program = ["-m", "src.primitive_db.main", "-c", command]
+    times = {"python": [], "first": [], "repeated": []}
+
+    for _ in range(runs):
+        times["python"].append(_launch(["-c", "pass"], workdir, env))
+    for _ in range(runs):
+        # Bytecode goes to a new directory, so the package is compiled
+        with tempfile.TemporaryDirectory() as pycache:
+            first_env = _environment(pycache)
+            times["first"].append(_launch(program, workdir, first_env))
+    # Untimed launch: bytecode of the package gets compiled
+    _launch(program, workdir, env)
+    for _ in range(runs):
+        times["repeated"].append(_launch(program, workdir, env))
+    return times
+
+
+def _percentile(values, share):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * share))]
+
+
+def main(argv=None):
+    """
+    Run the startup benchmark from the command line.
+
+    Args:
+        argv: List of arguments or None for sys.argv
+    """
+    parser = argparse.ArgumentParser(description="Замер времени запуска.")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--tables", type=int, default=200)
+    parser.add_argument("--command", default=DEFAULT_COMMAND)
+    args = parser.parse_args(argv)
+
+    env = _environment()
+    with tempfile.TemporaryDirectory() as workdir:
+        create_database(workdir, args.tables, env)
+        times = measure(workdir, args.command, args.runs, env)
+
+    print(f"Команда: {args.command}, таблиц: {args.tables}, запусков: {args.runs}")
+    for kind, values in times.items():
+        print(
+            f"{kind:<8} min {min(values) * 1000:8.1f} мс  "
+            f"p50 {_percentile(values, 0.5) * 1000:8.1f} мс  "
+            f"p95 {_percentile(values, 0.95) * 1000:8.1f} мс"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,648 @@
+"""Session-level catalog that keeps metadata and tables in memory."""
+
+import os
+import threading
+
+from src.primitive_db.constants import (
+    ERROR_IN_TRANSACTION,
+    ERROR_NO_TRANSACTION,
+    ERROR_TABLE_NOT_FOUND,
+    ERROR_TRANSACTION_ACTIVE,
+    METADATA_FILE,
+    VECTOR_MIN_ROWS,
+    VECTOR_MODE,
+    WAL_CHECKPOINT_ENTRIES,
+    WAL_FSYNC_BATCH,
+    WAL_MODE,
+)
+from src.primitive_db.index import (
+    build_index,
+    index_path,
+    load_indexes,
+    save_indexes,
+)
+from src.primitive_db.storage import (
+    data_path,
+    load_table,
+    open_table,
+    remove_table,
+    save_table,
+    table_row_type,
+)
+from src.primitive_db.transaction import (
+    commit_files,
+    recover_transaction,
+    staged_path,
+    write_staged,
+)
+from src.primitive_db.utils import load_metadata, save_metadata
+from src.primitive_db.vector import available, build_vectors, refresh
+from src.primitive_db.wal import (
+    WalWriter,
+    apply_entry,
+    checkpoint,
+    encode_entries,
+    read_entries,
+    recover,
+    wal_path,
+)
+
+
+def file_stamp(filepath):
+    """
+    Get modification stamp of a file.
+
+    Args:
+        filepath: Path to file
+
+    Returns:
+        Tuple (mtime_ns, size) or None if file does not exist
+    """
+    try:
+        stat = os.stat(filepath)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def table_stamp(table_name, table_meta):
+    """
+    Get combined modification stamp of table data and log files.
+
+    Args:
+        table_name: Name of the table
+        table_meta: Metadata of the table
+
+    Returns:
+        Tuple of file stamps
+    """
+    return (
+        file_stamp(data_path(table_name, table_meta)),
+        file_stamp(wal_path(table_name)),
+    )
+
+
+class Catalog:
+    """
+    Buffer manager for metadata and table data.
+
+    Each table is loaded once (base file plus replayed write-ahead log)
+    and kept in memory. Memory-mapped tables stay mapped: segmented ones
+    get the log replayed over their segments, columnar ones are
+    checkpointed right after the replay and mapped again. Tables are
+    tracked as clean or dirty and written back only when flushed. In WAL
+    mode writes are appended to the log and the base file is rewritten
+    only by checkpoints. Clean tables are reloaded if their files were
+    changed by another process (detected by mtime and size).
+
+    Between begin() and commit() nothing is flushed, whatever autocommit
+    says: the changes of all tables are written by the commit as one
+    atomic set of files (see transaction.py), or thrown away by
+    rollback().
+    """
+
+    def __init__(
+        self,
+        metadata_file=METADATA_FILE,
+        autocommit=True,
+        on_reload=None,
+        wal_mode=WAL_MODE,
+        fsync_batch=WAL_FSYNC_BATCH,
+        checkpoint_entries=WAL_CHECKPOINT_ENTRIES,
+        vector_mode=VECTOR_MODE,
+    ):
+        """
+        Initialize catalog.
+
+        Args:
+            metadata_file: Path to metadata JSON file
+            autocommit: Flush every write immediately if True
+            on_reload: Callback called with table name when a table is
+                reloaded or dropped
+            wal_mode: Append changes to the write-ahead log if True
+            fsync_batch: Number of log entries between fsync calls
+            checkpoint_entries: Log length that triggers a checkpoint
+            vector_mode: Keep NumPy arrays of numeric columns if True
+        """
+        self.metadata_file = metadata_file
+        self.autocommit = autocommit
+        self.on_reload = on_reload
+        self.wal_mode = wal_mode
+        self.fsync_batch = fsync_batch
+        self.checkpoint_entries = checkpoint_entries
+        self.vector_mode = vector_mode
+        self._metadata = None
+        self._metadata_stamp = None
+        self._metadata_dirty = False
+        self._tables = {}
+        self._writers = {}
+        self._recovered = False
+        self.in_transaction = False
+        # Guards loading of tables, indexes and arrays when the catalog
+        # is shared by threads (see server.py)
+        self._lock = threading.RLock()
+
+    def _notify(self, table_name):
+        if self.on_reload is not None:
+            self.on_reload(table_name)
+
+    def get_metadata(self):
+        """
+        Get metadata dictionary, loading it on first use.
+
+        Returns:
+            Metadata dictionary shared by the whole session
+        """
+        if not self._recovered:
+            recover_transaction(metadata_file=self.metadata_file)
+            self._recovered = True
+        stamp = file_stamp(self.metadata_file)
+        if self._metadata is None or (
+            not self._metadata_dirty and stamp != self._metadata_stamp
+        ):
+            reloaded = self._metadata is not None
+            self._metadata = load_metadata(self.metadata_file)
+            self._metadata_stamp = stamp
+            if reloaded:
+                for table_name, entry in list(self._tables.items()):
+                    if not (entry["dirty"] or entry["pending"]):
+                        self._forget(table_name)
+        return self._metadata
+
+    def _entry(self, table_name):
+        with self._lock:
+            return self._locked_entry(table_name)
+
+    def _locked_entry(self, table_name):
+        # Nothing is cached for a table missing from metadata: the entry
+        # would outlive a table created later under the same name.
+        if self._table_meta(table_name) is None:
+            raise KeyError(ERROR_TABLE_NOT_FOUND.format(table_name=table_name))
+
+        entry = self._tables.get(table_name)
+
+        if (
+            entry is not None
+            and not entry["dirty"]
+            and not entry["pending"]
+            and entry["stamp"] != table_stamp(table_name, self._table_meta(table_name))
+        ):
+            self._forget(table_name)
+            entry = None
+
+        if entry is None:
+            entry = self._load(table_name)
+            self._tables[table_name] = entry
+        return entry
+
+    def _table_meta(self, table_name):
+        return self.get_metadata().get(table_name)
+
+    def _load(self, table_name):
+        table_meta = self._table_meta(table_name)
+        recover(table_name, table_meta)
+        entries = read_entries(table_name)
+        table_data = open_table(table_name, table_meta)
+        # A mapped table that can not take changes in place is decoded
+        # to replay the log, then checkpointed below to be mapped again.
+        fold = bool(entries) and not (
+            isinstance(table_data, list) or hasattr(table_data, "replace_records")
+        )
+        if fold:
+            table_data = load_table(table_name, table_meta)
+        row_class = table_row_type(table_meta)
+        for log_entry in entries:
+            table_data = apply_entry(table_data, log_entry, row_class)
+
+        entry = {
+            "data": table_data,
+            "indexes": None,
+            "vectors": None,
+            # Index files match the base file, so they are rebuilt
+            # when the log had to be replayed or the file is missing.
+            "rebuild_indexes": bool(entries)
+            or (
+                bool(table_meta and table_meta.get("indexes"))
+                and not os.path.exists(index_path(table_name))
+            ),
+            "dirty": False,
+            "indexes_dirty": False,
+            "pending": [],
+            "wal_count": len(entries),
+            "stamp": None,
+        }
+        if fold:
+            self._checkpoint(table_name, entry)
+            entry["data"] = open_table(table_name, table_meta)
+        entry["stamp"] = table_stamp(table_name, table_meta)
+        return entry
+
+    def _forget(self, table_name):
+        writer = self._writers.pop(table_name, None)
+        if writer is not None:
+            writer.close()
+        if self._tables.pop(table_name, None) is not None:
+            self._notify(table_name)
+
+    def get_table(self, table_name, writable=False, in_place=False):
+        """
+        Get table data, loading it on first use.
+
+        Tables in formats that support memory mapping are returned as a
+        lazy read-only sequence; writable=True decodes them into a list.
+
+        Args:
+            table_name: Name of the table
+            writable: Return a mutable list if True
+            in_place: The caller changes records only with append(),
+                replace_records() and mark_deleted(), so a lazy table
+                offering them is returned instead of a list
+
+        Returns:
+            Records shared by the whole session
+
+        Raises:
+            KeyError: If the table is not in metadata
+        """
+        entry = self._entry(table_name)
+        if writable and not (in_place and hasattr(entry["data"], "replace_records")):
+            self._materialize(entry)
+        return entry["data"]
+
+    @staticmethod
+    def _materialize(entry):
+        if not isinstance(entry["data"], list):
+            entry["data"] = list(entry["data"])
+
+    def get_indexes(self, table_name):
+        """
+        Get indexes declared for a table in metadata.
+
+        Args:
+            table_name: Name of the table
+
+        Returns:
+            Dictionary of indexes (empty if table has none)
+        """
+        return self._indexes(table_name, self._entry(table_name))
+
+    def _indexes(self, table_name, entry):
+        with self._lock:
+            if entry["indexes"] is None:
+                self._load_indexes(table_name, entry)
+        return entry["indexes"]
+
+    def _load_indexes(self, table_name, entry):
+        table_meta = self.get_metadata().get(table_name, {})
+        columns = table_meta.get("indexes", [])
+        kinds = table_meta.get("index_kinds", {})
+        if entry["rebuild_indexes"]:
+            entry["indexes"] = {
+                column: build_index(entry["data"], column, kinds.get(column, "hash"))
+                for column in columns
+            }
+        else:
+            entry["indexes"] = load_indexes(table_name, columns, kinds)
+
+    def get_vectors(self, table_name):
+        """
+        Get NumPy arrays of numeric columns of a table.
+
+        Arrays follow records appended to the table; other writers keep
+        them in step through the functions of vector.py or drop them.
+
+        Args:
+            table_name: Name of the table
+
+        Returns:
+            Column arrays (see vector.build_vectors) or None if NumPy is
+            not available or the table has fewer than VECTOR_MIN_ROWS
+            records
+        """
+        if not self.vector_mode:
+            return None
+        entry = self._entry(table_name)
+        table_data = entry["data"]
+        if len(table_data) < VECTOR_MIN_ROWS or not available():
+            # Writers get no arrays to keep in step, so old ones go stale
+            entry["vectors"] = None
+            return None
+        with self._lock:
+            if not refresh(entry["vectors"], table_data):
+                table_meta = self._table_meta(table_name)
+                entry["vectors"] = build_vectors(table_data, table_meta["columns"])
+            return entry["vectors"]
+
+    def _autoflush(self):
+        if self.autocommit and not self.in_transaction:
+            self.flush()
+
+    def _no_transaction(self):
+        if self.in_transaction:
+            raise ValueError(ERROR_IN_TRANSACTION)
+
+    def write_metadata(self):
+        """Mark metadata as changed."""
+        self._metadata_dirty = True
+        self._autoflush()
+
+    def write_table(self, table_name, table_data=None, log_entries=None):
+        """
+        Mark table data (and its indexes) as changed.
+
+        Args:
+            table_name: Name of the table
+            table_data: New list of records or None if changed in place
+            log_entries: Entries describing the change for the
+                write-ahead log, or None to rewrite the whole table
+        """
+        entry = self._entry(table_name)
+        if table_data is not None:
+            entry["data"] = table_data
+        if self.wal_mode and log_entries is not None:
+            entry["pending"].extend(log_entries)
+        else:
+            entry["dirty"] = True
+        self._autoflush()
+
+    def write_indexes(self, table_name):
+        """
+        Mark table indexes as changed.
+
+        Args:
+            table_name: Name of the table
+        """
+        self._entry(table_name)["indexes_dirty"] = True
+        self._autoflush()
+
+    def drop_table(self, table_name, table_meta):
+        """
+        Forget a dropped table and delete its files.
+
+        Metadata without the table is written first; files left behind
+        would come back as rows of a table created later with the same
+        name.
+
+        Args:
+            table_name: Name of the table
+            table_meta: Metadata the table had before it was dropped
+        """
+        self._no_transaction()
+        self._forget(table_name)
+        self.flush()
+        remove_table(table_name, table_meta)
+        for path in (wal_path(table_name), index_path(table_name)):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def is_dirty(self):
+        """
+        Check whether there are unflushed changes.
+
+        Returns:
+            True if metadata or any table is dirty
+        """
+        return self._metadata_dirty or any(
+            entry["dirty"] or entry["indexes_dirty"] or entry["pending"]
+            for entry in self._tables.values()
+        )
+
+    def _checkpoint(self, table_name, entry, compact=False):
+        # Index files must match the new base file. _load() rebuilds
+        # indexes while a log or no index file is left, so the file is
+        # replaced before the checkpoint retires the log, or, with no
+        # log, removed now and written again by flush().
+        if self._indexes(table_name, entry):
+            if os.path.exists(wal_path(table_name)):
+                save_indexes(table_name, entry["indexes"], sync=True)
+                entry["indexes_dirty"] = False
+            else:
+                if os.path.exists(index_path(table_name)):
+                    os.remove(index_path(table_name))
+                entry["indexes_dirty"] = True
+        table_meta = self._table_meta(table_name)
+        checkpoint(
+            table_name,
+            table_meta,
+            entry["data"],
+            self._writers.pop(table_name, None),
+            compact,
+        )
+        entry["dirty"] = False
+        entry["wal_count"] = 0
+        entry["rebuild_indexes"] = False
+        if not isinstance(entry["data"], list):
+            # A lazy table may have been compacted into new files
+            entry["data"] = open_table(table_name, table_meta)
+            entry["vectors"] = None
+
+    def flush(self):
+        """Write metadata, dirty tables and indexes to disk."""
+        # Metadata goes first: an ID sequence saved ahead of its rows
+        # only leaves a gap after a crash, never a reused ID.
+        if self._metadata_dirty:
+            save_metadata(self.metadata_file, self._metadata)
+            self._metadata_stamp = file_stamp(self.metadata_file)
+            self._metadata_dirty = False
+
+        for table_name, entry in self._tables.items():
+            if entry["pending"]:
+                writer = self._writers.get(table_name)
+                if writer is None:
+                    writer = WalWriter(table_name, self.fsync_batch)
+                    self._writers[table_name] = writer
+                writer.append(entry["pending"])
+                entry["wal_count"] += len(entry["pending"])
+                entry["pending"] = []
+                if entry["wal_count"] >= self.checkpoint_entries:
+                    entry["dirty"] = True
+            if entry["dirty"]:
+                self._checkpoint(table_name, entry)
+            if entry["indexes_dirty"]:
+                save_indexes(table_name, entry["indexes"])
+                entry["indexes_dirty"] = False
+            entry["stamp"] = table_stamp(table_name, self._table_meta(table_name))
+
+    def begin(self):
+        """
+        Start a transaction.
+
+        Changes made so far are flushed first, so that rollback() can
+        return to what is on disk.
+        """
+        if self.in_transaction:
+            raise ValueError(ERROR_TRANSACTION_ACTIVE)
+        self.flush()
+        self.in_transaction = True
+
+    def rollback(self):
+        """Discard all changes made since begin()."""
+        if not self.in_transaction:
+            raise ValueError(ERROR_NO_TRANSACTION)
+        self.in_transaction = False
+        for table_name in list(self._tables):
+            self._forget(table_name)
+        self._metadata = None
+        self._metadata_dirty = False
+
+    def commit(self):
+        """Flush all pending changes and force the logs to disk."""
+        if self.in_transaction:
+            self._commit_transaction()
+            self.in_transaction = False
+            return
+        self.flush()
+        for writer in self._writers.values():
+            writer.sync()
+
+    def _stage_table(self, table_name, entry):
+        """
+        Stage changed files of a table for a transaction commit.
+
+        Args:
+            table_name: Name of the table
+            entry: Catalog entry of the table
+
+        Returns:
+            Pair (paths to replace, paths to remove)
+        """
+        replace, remove = [], []
+        table_meta = self._table_meta(table_name)
+        log = wal_path(table_name)
+        changed = entry["pending"] or entry["dirty"]
+        if changed:
+            # The staged log replaces the open one, so its writer goes
+            writer = self._writers.pop(table_name, None)
+            if writer is not None:
+                writer.close()
+
+        appended = entry["wal_count"] + len(entry["pending"])
+        if changed and (entry["dirty"] or appended >= self.checkpoint_entries):
+            if self._indexes(table_name, entry):
+                entry["indexes_dirty"] = True
+            base = data_path(table_name, table_meta)
+            save_table(
+                table_name,
+                table_meta,
+                entry["data"],
+                filepath=staged_path(base),
+                sync=True,
+            )
+            replace.append(base)
+            remove.append(log)
+        elif entry["pending"]:
+            try:
+                with open(log, "rb") as f:
+                    payload = f.read()
+            except FileNotFoundError:
+                payload = b""
+            payload += encode_entries(entry["pending"]).encode("utf-8")
+            write_staged(log, payload)
+            replace.append(log)
+
+        if entry["indexes_dirty"]:
+            path = index_path(table_name)
+            save_indexes(
+                table_name, entry["indexes"], filepath=staged_path(path), sync=True
+            )
+            replace.append(path)
+        return replace, remove
+
+    def _commit_transaction(self):
+        replace, remove = [], []
+        if self._metadata_dirty:
+            save_metadata(staged_path(self.metadata_file), self._metadata, sync=True)
+            replace.append(self.metadata_file)
+        rewritten = set()
+        for table_name, entry in self._tables.items():
+            table_replace, table_remove = self._stage_table(table_name, entry)
+            replace.extend(table_replace)
+            remove.extend(table_remove)
+            if table_remove:
+                rewritten.add(table_name)
+
+        commit_files(replace, remove)
+
+        self._metadata_stamp = file_stamp(self.metadata_file)
+        self._metadata_dirty = False
+        for table_name, entry in self._tables.items():
+            table_meta = self._table_meta(table_name)
+            if table_name in rewritten:
+                entry["wal_count"] = 0
+                entry["rebuild_indexes"] = False
+                if not isinstance(entry["data"], list):
+                    entry["data"] = open_table(table_name, table_meta)
+                    entry["vectors"] = None
+            else:
+                entry["wal_count"] += len(entry["pending"])
+            entry["pending"] = []
+            entry["dirty"] = False
+            entry["indexes_dirty"] = False
+            entry["stamp"] = table_stamp(table_name, table_meta)
+
+    def checkpoint(self):
+        """Flush pending changes and compact all logs into base files."""
+        self._no_transaction()
+        self.flush()
+        for table_name, entry in self._tables.items():
+            if entry["wal_count"]:
+                self._checkpoint(table_name, entry)
+        self.flush()
+
+    def vacuum(self, table_name):
+        """
+        Fold the log into the base file and drop deleted records from it.
+
+        Args:
+            table_name: Name of the table
+
+        Returns:
+            Number of deleted records removed from the files
+        """
+        self._no_transaction()
+        entry = self._entry(table_name)
+        dead = getattr(entry["data"], "dead_count", 0)
+        self.flush()
+        self._checkpoint(table_name, entry, compact=True)
+        self.flush()
+        return dead
+
+    def convert_table(self, table_name, new_format):
+        """
+        Rewrite table in another storage format.
+
+        The log is first folded into the old base file, then the new file
+        is written and only after that metadata is switched, so a crash
+        leaves either the old or the new format complete.
+
+        Args:
+            table_name: Name of the table
+            new_format: Target storage format
+        """
+        self._no_transaction()
+        entry = self._entry(table_name)
+        self._materialize(entry)
+        table_meta = self._table_meta(table_name)
+        self.flush()
+        self._checkpoint(table_name, entry)
+
+        old_meta = dict(table_meta)
+        table_meta["format"] = new_format
+        checkpoint(table_name, table_meta, entry["data"])
+        self._metadata_dirty = True
+        self.flush()
+
+        remove_table(table_name, old_meta)
+
+    def close(self):
+        """
+        Checkpoint pending changes at the end of the session.
+
+        A transaction that was not committed is rolled back.
+        """
+        if self.in_transaction:
+            self.rollback()
+        self.checkpoint()
+        for writer in self._writers.values():
+            writer.close()
+        self._writers.clear()
@@ -0,0 +1,88 @@
+"""Client of the query server.
+
+Usage:
+    python -m src.primitive_db.client [--host HOST] [--port PORT]
+
+Commands are read from standard input, one per line, and the replies
+are printed. Interactive use shows the usual prompt.
+"""
+
+import argparse
+import socket
+import sys
+
+from src.primitive_db.constants import PROMPT_COMMAND, SERVER_HOST, SERVER_PORT
+from src.primitive_db.protocol import decode_line
+
+
+class Client:
+    """Connection to the query server."""
+
+    def __init__(self, host=SERVER_HOST, port=SERVER_PORT):
+        """
+        Connect to the server.
+
+        Args:
+            host: Server address
+            port: Server port
+        """
+        self._socket = socket.create_connection((host, port))
+        self._file = self._socket.makefile("rwb")
+
+    def query(self, command):
+        """
+        Run a command on the server.
+
+        Args:
+            command: Command string
+
+        Returns:
+            Output of the command
+        """
+        self._file.write(command.encode("utf-8") + b"\n")
+        self._file.flush()
+        lines = []
+        while (line := decode_line(self._file.readline())) is not None:
+            lines.append(line)
+        return "".join(line + "\n" for line in lines)
+
+    def close(self):
+        """Close the connection."""
+        self._file.close()
+        self._socket.close()
+
+
+def main(argv=None):
+    """
+    Send commands from standard input to the server.
+
+    Args:
+        argv: List of arguments or None for sys.argv
+    """
+    parser = argparse.ArgumentParser(description="Клиент сервера базы данных.")
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    args = parser.parse_args(argv)
+
+    client = Client(args.host, args.port)
+    interactive = sys.stdin.isatty()
+    try:
+        while True:
+            try:
+                command = input(PROMPT_COMMAND if interactive else "")
+            except EOFError:
+                break
+            command = command.strip()
+            if not command:
+                continue
+            if command.lower() == "exit":
+                break
+            sys.stdout.write(client.query(command))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+"""Compact columnar binary format for table data.
+
+Layout (all numbers little-endian):
+
+    header      magic b"PDBC", version u16, column count u16, row count u64
+    columns     per column: name length u16, name (utf-8), type code u8
+    directory   per column: section offset u64, section length u64
+    sections    per column, each aligned to 8 bytes:
+                int  - row count * int64
+                bool - row count * uint8
+                str  - (row count + 1) * uint64 offsets, then utf-8 blob
+"""
+
+import mmap
+import struct
+import sys
+from array import array
+from collections.abc import Sequence
+from itertools import accumulate
+
+from src.primitive_db.constants import (
+    COLUMNAR_MAGIC,
+    COLUMNAR_VERSION,
+    ERROR_COLUMNAR_FILE,
+    ERROR_COLUMNAR_VALUE,
+    MMAP_CHUNK_ROWS,
+)
+from src.primitive_db.rows import row_type
+
+HEADER = struct.Struct("<4sHHQ")
+NAME_LEN = struct.Struct("<H")
+TYPE_CODE = struct.Struct("<B")
+SECTION = struct.Struct("<QQ")
+
+TYPE_CODES = {"int": 0, "bool": 1, "str": 2}
+CODE_TYPES = {code: name for name, code in TYPE_CODES.items()}
+
+BIG_ENDIAN = sys.byteorder == "big"
+
+
+def _to_bytes(values):
+    if BIG_ENDIAN:
+        values.byteswap()
+    return values.tobytes()
+
+
+def _from_bytes(typecode, data):
+    values = array(typecode)
+    values.frombytes(data)
+    if BIG_ENDIAN:
+        values.byteswap()
+    return values
+
+
+def _pad(size):
+    return -size % 8
+
+
+def encode_column(values, col_type, col_name):
+    """
+    Encode values of one column.
+
+    Args:
+        values: List of column values
+        col_type: Column type ("int", "bool", "str")
+        col_name: Column name (for error messages)
+
+    Returns:
+        Encoded section bytes
+    """
+    try:
+        if col_type == "int":
+            return _to_bytes(array("q", values))
+        if col_type == "bool":
+            return bytes(bytearray(values))
+        encoded = [value.encode("utf-8") for value in values]
+    except (TypeError, OverflowError, ValueError, AttributeError):
+        raise ValueError(
+            ERROR_COLUMNAR_VALUE.format(column=col_name, col_type=col_type)
+        ) from None
+
+    offsets = array("Q", [0])
+    offsets.extend(accumulate(len(item) for item in encoded))
+    return _to_bytes(offsets) + b"".join(encoded)
+
+
+def encode(table_data, columns):
+    """
+    Encode table data into columnar binary form.
+
+    Args:
+        table_data: List of records
+        columns: Column definitions from metadata
+
+    Returns:
+        Encoded bytes
+    """
+    head = [
+        HEADER.pack(
+            COLUMNAR_MAGIC, COLUMNAR_VERSION, len(columns), len(table_data)
+        )
+    ]
+    for col in columns:
+        name = col["name"].encode("utf-8")
+        head.append(NAME_LEN.pack(len(name)) + name)
+        head.append(TYPE_CODE.pack(TYPE_CODES[col["type"]]))
+
+    sections = [
+        encode_column(
+            [record[col["name"]] for record in table_data], col["type"], col["name"]
+        )
+        for col in columns
+    ]
+
+    offset = sum(len(part) for part in head) + SECTION.size * len(columns)
+    offset += _pad(offset)
+    directory = []
+    body = []
+    for section in sections:
+        directory.append(SECTION.pack(offset, len(section)))
+        body.append(section + b"\0" * _pad(len(section)))
+        offset += len(section) + _pad(len(section))
+
+    head_bytes = b"".join(head + directory)
+    return head_bytes + b"\0" * _pad(len(head_bytes)) + b"".join(body)
+
+
+def read_header(buffer):
+    """
+    Parse header, column list and section directory.
+
+    Args:
+        buffer: Bytes-like object with file contents
+
+    Returns:
+        Tuple (row count, columns, sections) where columns is a list of
+        (name, type) and sections is a list of (offset, length)
+    """
+    if len(buffer) < HEADER.size:
+        raise ValueError(ERROR_COLUMNAR_FILE)
+    magic, version, column_count, row_count = HEADER.unpack_from(buffer, 0)
+    if magic != COLUMNAR_MAGIC or version != COLUMNAR_VERSION:
+        raise ValueError(ERROR_COLUMNAR_FILE)
+
+    pos = HEADER.size
+    columns = []
+    for _ in range(column_count):
+        (name_len,) = NAME_LEN.unpack_from(buffer, pos)
+        pos += NAME_LEN.size
+        name = bytes(buffer[pos : pos + name_len]).decode("utf-8")
+        pos += name_len
+        (code,) = TYPE_CODE.unpack_from(buffer, pos)
+        pos += TYPE_CODE.size
+        columns.append((name, CODE_TYPES[code]))
+
+    sections = []
+    for _ in range(column_count):
+        sections.append(SECTION.unpack_from(buffer, pos))
+        pos += SECTION.size
+
+    return row_count, columns, sections
+
+
+def decode_rows(buffer, header, start, stop):
+    """
+    Decode a range of rows.
+
+    Only the bytes of the requested rows are touched, so this works on a
+    memory-mapped file without reading it whole.
+
+    Args:
+        buffer: Bytes-like object with file contents
+        header: Result of read_header()
+        start: Index of the first row
+        stop: Index after the last row
+
+    Returns:
+        List of records
+    """
+    row_count, columns, sections = header
+    stop = min(stop, row_count)
+    if start >= stop:
+        return []
+
+    names = []
+    values = []
+    for (name, col_type), (offset, _) in zip(columns, sections):
+        names.append(name)
+        if col_type == "int":
+            data = buffer[offset + start * 8 : offset + stop * 8]
+            values.append(_from_bytes("q", data).tolist())
+        elif col_type == "bool":
+            data = buffer[offset + start : offset + stop]
+            values.append([value != 0 for value in data])
+        else:
+            data = buffer[offset + start * 8 : offset + (stop + 1) * 8]
+            offsets = _from_bytes("Q", data)
+            blob_start = offset + (row_count + 1) * 8
+            blob = bytes(buffer[blob_start + offsets[0] : blob_start + offsets[-1]])
+            base = offsets[0]
+            values.append(
+                [
+                    blob[first - base : last - base].decode("utf-8")
+                    for first, last in zip(offsets, offsets[1:])
+                ]
+            )
+
+    row_class = row_type(names)
+    return [row_class(*row) for row in zip(*values)]
+
+
+def decode(buffer):
+    """
+    Decode columnar binary form into table data.
+
+    Args:
+        buffer: Bytes-like object with file contents
+
+    Returns:
+        List of records
+    """
+    header = read_header(buffer)
+    return decode_rows(buffer, header, 0, header[0])
+
+
+class MappedTable(Sequence):
+    """
+    Read-only table backed by a memory-mapped columnar file.
+
+    The row count comes from the header; rows are decoded only when
+    accessed, in chunks of MMAP_CHUNK_ROWS while iterating, so scanning a
+    table never holds more than one chunk of decoded records.
+    """
+
+    def __init__(self, filepath):
+        """
+        Map a columnar file into memory.
+
+        Args:
+            filepath: Path to .col file
+        """
+        with open(filepath, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._buffer = memoryview(self._map)
+        self._header = read_header(self._buffer)
+
+    def __len__(self):
+        return self._header[0]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            rows = decode_rows(self._buffer, self._header, start, stop)
+            return rows[::step] if step != 1 else rows
+
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("table index out of range")
+        return decode_rows(self._buffer, self._header, index, index + 1)[0]
+
+    def __iter__(self):
+        for start in range(0, len(self), MMAP_CHUNK_ROWS):
+            yield from decode_rows(
+                self._buffer, self._header, start, start + MMAP_CHUNK_ROWS
+            )
+
+    def numeric_column(self, name):
+        """
+        Get raw bytes of an int or bool column without decoding.
+
+        Args:
+            name: Column name
+
+        Returns:
+            Pair (type, memoryview) with little-endian int64 or uint8
+            values, or None for other columns
+        """
+        row_count, columns, sections = self._header
+        for (col_name, col_type), (offset, _) in zip(columns, sections):
+            if col_name == name and col_type in ("int", "bool"):
+                width = 8 if col_type == "int" else 1
+                return col_type, self._buffer[offset : offset + row_count * width]
+        return None
@@ -4,9 +4,86 @@
 METADATA_FILE = "db_meta.json"
 DATA_DIR = "data"
 
+# Transactions: commit record and suffix of files staged until the commit
+TRANSACTION_FILE = "db_transaction.json"
+TRANSACTION_SUFFIX = ".txn"
+
+# Select cache limits
+CACHE_MAX_ENTRIES = 128
+CACHE_MAX_ENTRY_SIZE = 16 * 1024 * 1024
+
+# Parsed plans of insert/select/update/delete kept by command text
+PLAN_CACHE_SIZE = 512
+# Longer commands (bulk inserts) are parsed every time instead of cached
+PLAN_CACHE_MAX_TEXT = 4096
+
+# Write-ahead log: append changes instead of rewriting table files
+WAL_MODE = True
+WAL_FSYNC_BATCH = 32
+WAL_CHECKPOINT_ENTRIES = 1000
+
+# Bulk load: number of rows validated at once
+LOAD_BATCH_SIZE = 10000
+
+# Storage formats of table data files
+DEFAULT_STORAGE_FORMAT = "json"
+STORAGE_FORMATS = {"json", "columnar", "segmented"}
+COLUMNAR_MAGIC = b"PDBC"
+COLUMNAR_VERSION = 1
+
+# Memory-mapped reads of columnar tables
+MMAP_READS = True
+MMAP_CHUNK_ROWS = 4096
+
+# Segmented tables: records per segment file
+SEGMENT_ROWS = 100000
+
+# Segmented tables are compacted once this share of their records is
+# deleted (0 - only by the vacuum command)
+VACUUM_DEAD_RATIO = 0.25
+
+# Parallel scans of segmented tables: worker processes (0 - one per CPU)
+# and the table size below which scans stay in the main process
+SCAN_WORKERS = 0
+PARALLEL_MIN_ROWS = 200000
+
+# Vectorized execution (needs NumPy): tables with at least VECTOR_MIN_ROWS
+# records evaluate conditions on int/bool columns as array masks
+VECTOR_MODE = True
+VECTOR_MIN_ROWS = 10000
+
+# Query server: address, threads running commands, the interval of
+# flushing buffered changes to disk (seconds) and the longest command
+# line accepted (bytes)
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 5455
+SERVER_WORKERS = 4
+SERVER_FLUSH_INTERVAL = 0.5
+SERVER_LINE_LIMIT = 16 * 1024 * 1024
+
+# Metrics: collect latency histograms and counters (see metrics.py),
+# bucket bounds in seconds, prefix of exported names and number of
+# entries in profiler reports
+METRICS_MODE = True
+LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+METRICS_PREFIX = "primitive_db"
+PROFILE_LIMIT = 30
+
+# Select output
+DISPLAY_PAGE_SIZE = 1000
+OUTPUT_FORMATS = {"table", "tsv", "jsonl"}
+
 # Valid data types
 VALID_TYPES = {"int", "str", "bool"}
 
+# Aggregate functions and column types sum/avg accept
+AGGREGATE_FUNCTIONS = {"count", "sum", "min", "max", "avg"}
+NUMERIC_TYPES = {"int", "bool"}
+
+# Index kinds and column types a sorted index can be built on
+INDEX_KINDS = {"hash", "sorted"}
+SORTED_INDEX_TYPES = {"int", "str"}
+
 # Decorator messages
 CONFIRM_DELETE_TABLE = "удаление таблицы"
 CONFIRM_DELETE_RECORD = "удаление записи"
@@ -25,25 +102,88 @@ ERROR_FILE_NOT_FOUND = (
 )
 ERROR_VALIDATION = "Ошибка валидации: {error}"
 ERROR_UNEXPECTED = "Произошла непредвиденная ошибка: {error}"
+ERROR_INDEX_EXISTS = (
+    'Индекс по столбцу "{column}" таблицы "{table_name}" уже существует.'
+)
 ERROR_INVALID_VALUE = (
     "Некорректное значение '{value}' для столбца "
     "'{column}' типа '{col_type}'."
 )
+ERROR_LOAD_FORMAT = (
+    "Неподдерживаемый формат файла '{filepath}'. "
+    "Ожидается .csv, .jsonl или .ndjson."
+)
+ERROR_LOAD_ROW = "Некорректная строка {line}: {row}"
+ERROR_LOAD_VALUE = "Строка {line}: {error}"
+ERROR_INSERT_ROW = "Набор значений {row}: {error}"
+ERROR_UNKNOWN_FORMAT = (
+    "Неизвестный формат хранения '{table_format}'. Доступные форматы: {formats}."
+)
+ERROR_SAME_FORMAT = 'Таблица "{table_name}" уже хранится в формате {table_format}.'
+ERROR_COLUMNAR_FILE = "Файл не является таблицей в колоночном формате этой версии."
+ERROR_COLUMNAR_VALUE = (
+    "Значение столбца '{column}' нельзя записать как тип '{col_type}'."
+)
+ERROR_UNKNOWN_INDEX_KIND = (
+    "Неизвестный тип индекса: {kind}. Доступные типы: {kinds}."
+)
+ERROR_SORTED_INDEX_TYPE = (
+    'Упорядоченный индекс нельзя построить по столбцу "{column}" типа {col_type}.'
+)
+ERROR_INDEX_VALUE = "Значение '{value}' нельзя сравнить со значениями индекса."
+ERROR_AGGREGATE_TYPE = (
+    'Функцию {func} нельзя применить к столбцу "{column}" типа {col_type}.'
+)
+ERROR_AGGREGATE_COLUMN = 'Столбец "{column}" должен быть указан в group by.'
+ERROR_QUERY_SYNTAX = "Ошибка в условии рядом с «{token}»."
+ERROR_QUERY_END = "Условие неожиданно закончилось."
+ERROR_LIKE_PATTERN = "Шаблон LIKE должен быть строкой."
+ERROR_UPDATE_ID = "Столбец ID нельзя изменить."
+ERROR_TRANSACTION_ACTIVE = "Транзакция уже начата."
+ERROR_NO_TRANSACTION = "Нет начатой транзакции."
+ERROR_IN_TRANSACTION = "Команду нельзя выполнить внутри транзакции."
+ERROR_SERVER_COMMAND = "Команда {command} недоступна при работе через сервер."
+ERROR_SERVER_LINE = "Ошибка: Команда длиннее {limit} байт."
+ERROR_PREPARE_STATEMENT = "Подготовить можно только insert, select, update и delete."
+ERROR_PREPARED_NOT_FOUND = 'Подготовленный запрос "{name}" не найден.'
+ERROR_PREPARED_ARGS = (
+    'Запрос "{name}" ожидает значений: {expected}, передано: {given}.'
+)
+ERROR_UNKNOWN_OUTPUT = (
+    "Неизвестный формат вывода '{output_format}'. Доступные форматы: {formats}."
+)
 
 # Success messages
 SUCCESS_TABLE_CREATED = (
     'Таблица "{table_name}" успешно создана со столбцами: {columns_str}'
 )
 SUCCESS_TABLE_DELETED = 'Таблица "{table_name}" успешно удалена.'
+SUCCESS_INDEX_CREATED = (
+    'Индекс ({kind}) по столбцу "{column}" таблицы "{table_name}" успешно создан.'
+)
 SUCCESS_RECORD_INSERTED = (
     'Запись с ID={record_id} успешно добавлена в таблицу "{table_name}".'
 )
+SUCCESS_RECORDS_INSERTED = (
+    'Добавлено записей в таблицу "{table_name}": {count} (ID={first_id}..{last_id}).'
+)
 SUCCESS_RECORD_UPDATED = (
     'Запись с ID={record_id} в таблице "{table_name}" успешно обновлена.'
 )
+SUCCESS_RECORDS_UPDATED = (
+    'Обновлено записей в таблице "{table_name}": {changed} из {matched} найденных.'
+)
 SUCCESS_RECORD_DELETED = (
     'Запись с ID={record_id} успешно удалена из таблицы "{table_name}".'
 )
+SUCCESS_RECORDS_LOADED = 'Загружено записей в таблицу "{table_name}": {count}.'
+SUCCESS_TABLE_VACUUMED = (
+    'Таблица "{table_name}" сжата, удалённых записей вычищено: {dead}.'
+)
+SUCCESS_TABLE_CONVERTED = (
+    'Таблица "{table_name}" переведена в формат {table_format} '
+    "({old_size} -> {new_size} байт)."
+)
 
 # Information messages
 INFO_NO_TABLES = "Таблицы отсутствуют."
@@ -51,12 +191,27 @@ INFO_NO_DATA = "Нет данных для отображения."
 INFO_NO_RECORDS_FOUND = "Записи не найдены."
 INFO_OPERATION_CANCELLED = "Операция отменена."
 INFO_NO_UPDATES = "Записи для обновления не найдены."
+INFO_NO_CHANGES = "Найдено записей: {matched}, новые значения совпадают с текущими."
 INFO_NO_DELETIONS = "Записи для удаления не найдены."
+INFO_CHANGES_COMMITTED = "Изменения записаны на диск."
+INFO_TRANSACTION_STARTED = "Транзакция начата."
+INFO_TRANSACTION_ROLLED_BACK = "Транзакция отменена, изменения отброшены."
+INFO_CHECKPOINT_DONE = "Журнал изменений перенесён в файлы таблиц."
+INFO_SERVER_STARTED = "Сервер слушает {host}:{port}."
+INFO_SERVER_STOPPED = "Сервер остановлен."
+INFO_STATEMENT_PREPARED = 'Запрос "{name}" подготовлен, параметров: {params}.'
+INFO_OUTPUT_FORMAT = "Формат вывода: {output_format}."
 INFO_INVALID_COMMAND = "Функции {command} нет. Попробуйте снова."
 INFO_INVALID_VALUE = "Некорректное значение. Попробуйте снова."
 
-# Timing
-TIMING_FORMAT = "Функция {func_name} выполнилась за {elapsed_time:.3f} секунд."
+# Cache statistics
+INFO_CACHE_STATS = (
+    "Кэш: записей {entries}, попаданий {hits}, промахов {misses}, "
+    "вытеснений {evictions}, не закэшировано (слишком большие) {skipped}"
+)
+
+# Metrics
+INFO_NO_METRICS = "Метрики ещё не собраны."
 
 # Prompt messages
 PROMPT_COMMAND = ">>>Введите команду: "
@@ -1,25 +1,76 @@
 """Core logic for table and data management."""
 
-from prettytable import PrettyTable
+import heapq
+import json
+import sys
+from bisect import bisect_left
+from itertools import islice
+from operator import itemgetter
 
 from src.decorators import confirm_action, handle_db_errors, log_time
+from src.primitive_db import metrics, parallel
+from src.primitive_db.aggregate import compile_aggregates, finish, index_only
 from src.primitive_db.constants import (
     CONFIRM_DELETE_RECORD,
     CONFIRM_DELETE_TABLE,
+    DEFAULT_STORAGE_FORMAT,
+    DISPLAY_PAGE_SIZE,
+    ERROR_AGGREGATE_COLUMN,
+    ERROR_AGGREGATE_TYPE,
+    ERROR_COLUMN_NOT_FOUND,
+    ERROR_INDEX_EXISTS,
+    ERROR_INSERT_ROW,
     ERROR_INVALID_VALUE,
+    ERROR_LOAD_ROW,
+    ERROR_LOAD_VALUE,
+    ERROR_SAME_FORMAT,
+    ERROR_SORTED_INDEX_TYPE,
     ERROR_TABLE_EXISTS,
     ERROR_TABLE_NOT_FOUND,
+    ERROR_UNKNOWN_FORMAT,
+    ERROR_UNKNOWN_INDEX_KIND,
+    ERROR_UPDATE_ID,
+    INDEX_KINDS,
+    INFO_NO_CHANGES,
     INFO_NO_DATA,
     INFO_NO_DELETIONS,
     INFO_NO_TABLES,
     INFO_NO_UPDATES,
+    LOAD_BATCH_SIZE,
+    NUMERIC_TYPES,
+    SORTED_INDEX_TYPES,
+    STORAGE_FORMATS,
+    SUCCESS_INDEX_CREATED,
     SUCCESS_RECORD_DELETED,
     SUCCESS_RECORD_INSERTED,
     SUCCESS_RECORD_UPDATED,
+    SUCCESS_RECORDS_INSERTED,
+    SUCCESS_RECORDS_LOADED,
+    SUCCESS_RECORDS_UPDATED,
     SUCCESS_TABLE_CREATED,
     SUCCESS_TABLE_DELETED,
     VALID_TYPES,
 )
+from src.primitive_db.index import (
+    add_record,
+    build_index,
+    find_record,
+    is_sorted,
+    lookup,
+    lookup_equal,
+    ordered_ids,
+    remove_record,
+)
+from src.primitive_db.query import compile_where, normalize_where, record_class
+from src.primitive_db.rows import schema_row_type
+from src.primitive_db.vector import (
+    aggregate_groups,
+    assign,
+    discard,
+    drop,
+    matching_positions,
+    remove,
+)
 
 
 @handle_db_errors
@@ -53,7 +104,9 @@ def create_table(metadata, table_name, columns):
         parsed_columns.append((col_name, col_type))
 
     metadata[table_name] = {
-        "columns": [{"name": name, "type": typ} for name, typ in parsed_columns]
+        "columns": [{"name": name, "type": typ} for name, typ in parsed_columns],
+        "sequence": 0,
+        "format": DEFAULT_STORAGE_FORMAT,
     }
 
     columns_str = ", ".join([f"{name}:{typ}" for name, typ in parsed_columns])
@@ -104,6 +157,119 @@ def list_tables(metadata):
         print(f"- {table_name}")
 
 
+@handle_db_errors
+def create_index(metadata, table_name, column, table_data, indexes, kind="hash"):
+    """
+    Create index on a table column.
+
+    Args:
+        metadata: Metadata dictionary
+        table_name: Name of the table
+        column: Column to index
+        table_data: Table data
+        indexes: Current table indexes
+        kind: "hash" for equality lookups or "sorted" for ranges and
+            ordering
+
+    Returns:
+        Updated indexes or None if error
+    """
+    if table_name not in metadata:
+        raise KeyError(ERROR_TABLE_NOT_FOUND.format(table_name=table_name))
+
+    if kind not in INDEX_KINDS:
+        raise ValueError(
+            ERROR_UNKNOWN_INDEX_KIND.format(
+                kind=kind, kinds=", ".join(sorted(INDEX_KINDS))
+            )
+        )
+
+    column_types = {col["name"]: col["type"] for col in metadata[table_name]["columns"]}
+    if column not in column_types:
+        raise KeyError(ERROR_COLUMN_NOT_FOUND.format(column=column))
+
+    if kind == "sorted" and column_types[column] not in SORTED_INDEX_TYPES:
+        raise ValueError(
+            ERROR_SORTED_INDEX_TYPE.format(
+                column=column, col_type=column_types[column]
+            )
+        )
+
+    indexed = metadata[table_name].setdefault("indexes", [])
+    if column in indexed:
+        raise ValueError(
+            ERROR_INDEX_EXISTS.format(column=column, table_name=table_name)
+        )
+
+    indexes[column] = build_index(table_data, column, kind)
+    indexed.append(column)
+    if kind != "hash":
+        metadata[table_name].setdefault("index_kinds", {})[column] = kind
+    print(
+        SUCCESS_INDEX_CREATED.format(
+            kind=kind, column=column, table_name=table_name
+        )
+    )
+
+    return indexes
+
+
+def next_id(table_meta, table_data):
+    """
+    Get next auto-increment ID of a table.
+
+    The last issued ID is kept in metadata, so allocation does not scan
+    the table and IDs are never reused after deletes. Tables created
+    before the counter existed fall back to a one-time scan.
+
+    Args:
+        table_meta: Metadata of the table
+        table_data: Table data
+
+    Returns:
+        Next ID
+    """
+    sequence = table_meta.get("sequence")
+    if sequence is None:
+        sequence = max((record["ID"] for record in table_data), default=0)
+    return sequence + 1
+
+
+@handle_db_errors
+def convert_table(metadata, table_name, table_format):
+    """
+    Check that a table can be converted to another storage format.
+
+    Args:
+        metadata: Metadata dictionary
+        table_name: Name of the table
+        table_format: Target storage format
+
+    Returns:
+        Target format or None if error
+    """
+    if table_name not in metadata:
+        raise KeyError(ERROR_TABLE_NOT_FOUND.format(table_name=table_name))
+
+    if table_format not in STORAGE_FORMATS:
+        raise ValueError(
+            ERROR_UNKNOWN_FORMAT.format(
+                table_format=table_format,
+                formats=", ".join(sorted(STORAGE_FORMATS)),
+            )
+        )
+
+    current = metadata[table_name].get("format", DEFAULT_STORAGE_FORMAT)
+    if current == table_format:
+        raise ValueError(
+            ERROR_SAME_FORMAT.format(
+                table_name=table_name, table_format=table_format
+            )
+        )
+
+    return table_format
+
+
 def validate_value(value, expected_type):
     """
     Validate value type.
@@ -135,9 +301,182 @@ def validate_value(value, expected_type):
     return None
 
 
+def _validate_row(values, columns):
+    """Validate one row value by value, raising on the first bad one."""
+    if len(values) != len(columns):
+        raise ValueError(f"Ожидается {len(columns)} значений, получено {len(values)}.")
+
+    row_values = []
+    for value, col in zip(values, columns):
+        col_type = col["type"]
+        validated_value = validate_value(value, col_type)
+        if validated_value is None and col_type != "str":
+            raise ValueError(
+                ERROR_INVALID_VALUE.format(
+                    value=value, column=col["name"], col_type=col_type
+                )
+            )
+        row_values.append(validated_value)
+    return tuple(row_values)
+
+
+def _typed_literal(value, column, column_types):
+    """Convert a literal of a condition to the type of its column."""
+    col_type = column_types[column]
+    validated_value = validate_value(value, col_type)
+    if validated_value is None:
+        raise ValueError(
+            ERROR_INVALID_VALUE.format(value=value, column=column, col_type=col_type)
+        )
+    return validated_value
+
+
+def _typed_node(node, column_types):
+    kind = node[0]
+    if kind in ("and", "or", "not"):
+        return (kind, *(_typed_node(child, column_types) for child in node[1:]))
+    if kind == "cmp":
+        _, op, column, value = node
+        return ("cmp", op, column, _typed_literal(value, column, column_types))
+    if kind == "in":
+        _, column, values = node
+        return (
+            "in",
+            column,
+            [_typed_literal(value, column, column_types) for value in values],
+        )
+    return node
+
+
+@handle_db_errors
+def typed_where(metadata, table_name, where_clause):
+    """
+    Check a condition against the table schema.
+
+    Literals are converted to the types of their columns, so "30" matches
+    30 in an int column and indexes are searched with comparable values.
+
+    Args:
+        metadata: Metadata dictionary
+        table_name: Name of the table
+        where_clause: Condition tree from parse_where()
+
+    Returns:
+        Condition tree with typed literals or None if it is invalid
+    """
+    column_types = {col["name"]: col["type"] for col in metadata[table_name]["columns"]}
+    return _typed_node(normalize_where(where_clause), column_types)
+
+
+BOOL_VALUES = {"true": True, "1": True, "false": False, "0": False}
+
+# Expressions converting a valid value like validate_value does; invalid
+# values make them raise
+_CONVERT_SOURCES = {
+    "int": "({v} if type({v}) is int else int({v}))",
+    "str": "str({v})",
+    "bool": "({v} if type({v}) is bool else _bool[str({v}).lower()])",
+}
+
+_row_validators = {}
+
+
+def row_validator(columns):
+    """
+    Get a function validating the values of one row.
+
+    The function is generated once per schema (column names and types)
+    and cached, so a changed schema gets a new one. It converts all
+    values in one expression and falls back to validate_value only to
+    report a bad value.
+
+    Args:
+        columns: Column definitions without ID
+
+    Returns:
+        Function taking a list of values and returning a tuple of
+        validated values; it raises ValueError for a wrong number of
+        values or an invalid value
+    """
+    schema = tuple((col["name"], col["type"]) for col in columns)
+    validator = _row_validators.get(schema)
+    if validator is not None:
+        return validator
+
+    if all(col_type in _CONVERT_SOURCES for _, col_type in schema):
+        names = [f"v{i}" for i in range(len(schema))]
+        converted = "".join(
+            _CONVERT_SOURCES[col_type].format(v=name) + ", "
+            for name, (_, col_type) in zip(names, schema)
+        )
+        source = (
+            "def validate(values):\n"
+            "    try:\n"
+            f"        ({''.join(name + ', ' for name in names)}) = values\n"
+            f"        return ({converted})\n"
+            "    except (ValueError, TypeError, KeyError):\n"
+            "        return _validate_row(values, _columns)\n"
+        )
+        scope = {
+            "_bool": BOOL_VALUES,
+            "_validate_row": _validate_row,
+            "_columns": [dict(col) for col in columns],
+        }
+        exec(source, scope)
+        validator = scope["validate"]
+    else:
+        frozen = [dict(col) for col in columns]
+
+        def validator(values):
+            return _validate_row(values, frozen)
+
+    _row_validators[schema] = validator
+    return validator
+
+
+def _insert_rows(metadata, table_name, rows, table_data, indexes):
+    if table_name not in metadata:
+        raise KeyError(ERROR_TABLE_NOT_FOUND.format(table_name=table_name))
+
+    table_meta = metadata[table_name]
+    validate = row_validator(table_meta["columns"][1:])
+    validated = []
+    for number, values in enumerate(rows, start=1):
+        try:
+            validated.append(validate(values))
+        except ValueError as e:
+            if len(rows) == 1:
+                raise
+            raise ValueError(ERROR_INSERT_ROW.format(row=number, error=e)) from None
+
+    row_class = schema_row_type(table_meta["columns"])
+    first_id = next_id(table_meta, table_data)
+    for new_id, values in enumerate(validated, start=first_id):
+        record = row_class(new_id, *values)
+        table_data.append(record)
+        if indexes:
+            add_record(indexes, record)
+
+    last_id = first_id + len(validated) - 1
+    if validated:
+        table_meta["sequence"] = last_id
+    if len(validated) == 1:
+        print(SUCCESS_RECORD_INSERTED.format(record_id=first_id, table_name=table_name))
+    else:
+        print(
+            SUCCESS_RECORDS_INSERTED.format(
+                table_name=table_name,
+                count=len(validated),
+                first_id=first_id,
+                last_id=last_id,
+            )
+        )
+    return table_data
+
+
 @handle_db_errors
 @log_time
-def insert(metadata, table_name, values, table_data):
+def insert(metadata, table_name, values, table_data, indexes=None):
     """
     Insert a new record into table.
 
@@ -146,159 +485,591 @@ def insert(metadata, table_name, values, table_data):
         table_name: Name of the table
         values: List of values (without ID)
         table_data: Current table data
+        indexes: Table indexes to keep up to date or None
 
     Returns:
         Updated table data or None if error
     """
-    if table_name not in metadata:
-        raise KeyError(ERROR_TABLE_NOT_FOUND.format(table_name=table_name))
+    return _insert_rows(metadata, table_name, [values], table_data, indexes)
 
-    columns = metadata[table_name]["columns"]
 
-    if len(values) != len(columns) - 1:
-        raise ValueError(
-            f"Ожидается {len(columns) - 1} значений, получено {len(values)}."
-        )
+@handle_db_errors
+@log_time
+def insert_many(metadata, table_name, rows, table_data, indexes=None):
+    """
+    Insert several records into table at once.
 
-    if table_data:
-        new_id = max(record["ID"] for record in table_data) + 1
-    else:
-        new_id = 1
+    All rows are validated before any is added, so nothing is inserted
+    unless every row is valid. One message is printed for the batch.
 
-    record = {"ID": new_id}
+    Args:
+        metadata: Metadata dictionary
+        table_name: Name of the table
+        rows: List of rows (lists of values without ID)
+        table_data: Current table data
+        indexes: Table indexes to keep up to date or None
 
-    for i, value in enumerate(values):
-        col = columns[i + 1]
-        col_name = col["name"]
-        col_type = col["type"]
+    Returns:
+        Updated table data or None if error
+    """
+    return _insert_rows(metadata, table_name, rows, table_data, indexes)
 
-        validated_value = validate_value(value, col_type)
-        if validated_value is None and col_type != "str":
+
+# Converters that match validate_value for valid input and raise otherwise
+FAST_CONVERTERS = {
+    "int": int,
+    "str": str,
+    "bool": lambda value: BOOL_VALUES[str(value).lower()],
+}
+
+
+def validate_batch(batch, columns, lines):
+    """
+    Validate a batch of rows column by column.
+
+    Args:
+        batch: List of rows (lists of values without ID)
+        columns: Column definitions without ID
+        lines: Line numbers of the rows in the file (for error messages)
+
+    Returns:
+        List of validated value tuples
+    """
+    for offset, row in enumerate(batch):
+        if len(row) != len(columns):
             raise ValueError(
-                ERROR_INVALID_VALUE.format(
-                    value=value, column=col_name, col_type=col_type
-                )
+                ERROR_LOAD_ROW.format(line=lines[offset], row=row)
             )
 
-        record[col_name] = validated_value
+    validated_columns = []
+    for col, values in zip(columns, zip(*batch)):
+        col_type = col["type"]
+        validated = None
+        # Fast path: convert the whole column with a builtin, falling back
+        # to validate_value to locate the bad value.
+        if col_type in FAST_CONVERTERS:
+            try:
+                validated = list(map(FAST_CONVERTERS[col_type], values))
+            except (ValueError, TypeError, KeyError):
+                validated = None
+        if validated is None:
+            validated = [validate_value(value, col_type) for value in values]
+        if col_type != "str" and None in validated:
+            offset = validated.index(None)
+            error = ERROR_INVALID_VALUE.format(
+                value=values[offset], column=col["name"], col_type=col_type
+            )
+            raise ValueError(
+                ERROR_LOAD_VALUE.format(line=lines[offset], error=error)
+            )
+        validated_columns.append(validated)
 
-    table_data.append(record)
-    print(
-        SUCCESS_RECORD_INSERTED.format(
-            record_id=new_id, table_name=table_name
-        )
-    )
+    return list(zip(*validated_columns))
+
+
+@handle_db_errors
+@log_time
+def load_rows(metadata, table_name, rows, table_data, indexes=None):
+    """
+    Bulk insert rows into table.
+
+    Rows are validated in batches of LOAD_BATCH_SIZE. Nothing is inserted
+    unless every row is valid; IDs are allocated in one go.
+
+    Args:
+        metadata: Metadata dictionary
+        table_name: Name of the table
+        rows: Iterable of pairs (line number in the file, list of values
+            without ID), as yielded by the readers of loader.py
+        table_data: Current table data
+        indexes: Table indexes to keep up to date or None
+
+    Returns:
+        Updated table data or None if error
+    """
+    if table_name not in metadata:
+        raise KeyError(ERROR_TABLE_NOT_FOUND.format(table_name=table_name))
+
+    table_meta = metadata[table_name]
+    columns = table_meta["columns"][1:]
+    row_class = schema_row_type(table_meta["columns"])
+
+    validated = []
+    rows = iter(rows)
+    while batch := list(islice(rows, LOAD_BATCH_SIZE)):
+        lines, values = zip(*batch)
+        validated.extend(validate_batch(values, columns, lines))
+
+    first_id = next_id(table_meta, table_data)
+    for new_id, values in enumerate(validated, start=first_id):
+        record = row_class(new_id, *values)
+        table_data.append(record)
+        if indexes:
+            add_record(indexes, record)
+
+    if validated:
+        table_meta["sequence"] = first_id + len(validated) - 1
+    print(SUCCESS_RECORDS_LOADED.format(table_name=table_name, count=len(validated)))
 
     return table_data
 
 
+def _counted(records):
+    """Iterate records, adding the number visited to rows_scanned."""
+    visited = 0
+    try:
+        for record in records:
+            visited += 1
+            yield record
+    finally:
+        metrics.add("rows_scanned", visited)
+
+
+def _matching(table_data, where_clause, indexes, vectors, stop=None):
+    """
+    Iterate over records matching a condition.
+
+    An equality on a hash index is used first, then column masks of the
+    vectorized path, then a parallel scan of a large segmented table,
+    then a sorted index range; whatever is left of the condition is
+    checked with a compiled predicate. stop limits how many matches the
+    parallel scan looks for; a scan stopped early by its caller counts
+    only the records it visited in rows_scanned.
+    """
+    candidates = lookup_equal(indexes, table_data, where_clause)
+    if candidates is None and where_clause is not None:
+        if vectors is not None:
+            positions = matching_positions(vectors, table_data, where_clause)
+            if positions is not None:
+                metrics.add("rows_scanned", len(table_data))
+                return map(table_data.__getitem__, positions.tolist())
+        if parallel.can_scan(table_data):
+            positions = parallel.matching_positions(table_data, where_clause, stop)
+            return map(table_data.__getitem__, positions)
+    if candidates is None:
+        candidates = lookup(indexes, table_data, where_clause)
+    if candidates is None:
+        candidates = table_data
+    predicate = compile_where(where_clause, record_class(candidates))
+    if metrics.enabled:
+        candidates = _counted(candidates)
+    if where_clause is None:
+        return candidates
+    return filter(predicate, candidates)
+
+
+def _select_ordered(
+    table_data, where_clause, indexes, order_by, offset, stop, vectors=None
+):
+    """
+    Select matching records sorted by a column.
+
+    A sorted index on the column is walked in order (only over the range
+    allowed by the condition), so with limit only the first records are
+    looked at and the records are produced lazily. Otherwise the matches
+    are sorted, keeping just the top offset + limit of them when limit is
+    given.
+    """
+    column, descending = order_by
+    index = indexes.get(column) if indexes else None
+
+    if (
+        index is not None
+        and is_sorted(index)
+        and lookup_equal(indexes, table_data, where_clause) is None
+    ):
+        predicate = compile_where(where_clause, record_class(table_data))
+        records = (
+            find_record(table_data, record_id)
+            for record_id in ordered_ids(index, where_clause, column, descending)
+        )
+        matches = (
+            record
+            for record in records
+            if record is not None and predicate(record)
+        )
+        return islice(matches, offset, stop)
+
+    matches = _matching(table_data, where_clause, indexes, vectors)
+
+    def sort_key(record):
+        return record[column], record["ID"]
+
+    if stop is not None:
+        top = heapq.nlargest if descending else heapq.nsmallest
+        ordered = top(stop, matches, key=sort_key)
+    else:
+        ordered = sorted(matches, key=sort_key, reverse=descending)
+    return ordered[offset:stop]
+
+
 @handle_db_errors
 @log_time
-def select(table_data, where_clause=None):
+def select(
+    table_data,
+    where_clause=None,
+    indexes=None,
+    limit=None,
+    offset=0,
+    order_by=None,
+    vectors=None,
+    stream=False,
+):
     """
     Select records from table.
 
+    With limit the scan stops as soon as enough records are found.
+    With stream the matches are returned as an iterator, so a caller that
+    only displays them never holds the whole result.
+
     Args:
         table_data: Table data
-        where_clause: Dictionary like {'age': 28} or None for all records
+        where_clause: Condition tree from parse_where() or None for all
+            records
+        indexes: Table indexes or None
+        limit: Maximum number of records or None for all
+        offset: Number of matching records to skip
+        order_by: Pair (column, descending) or None for table order
+        vectors: Column arrays from Catalog.get_vectors() or None
+        stream: Return an iterator instead of a list where the matches
+            are not in a list already
 
     Returns:
-        List of matching records
+        List (or iterator with stream) of matching records
     """
-    if where_clause is None:
-        return table_data
+    stop = None if limit is None else offset + limit
 
-    result = []
-    for record in table_data:
-        match = True
-        for key, value in where_clause.items():
-            if key not in record or record[key] != value:
-                match = False
-                break
-        if match:
-            result.append(record)
+    if order_by is not None:
+        ordered = _select_ordered(
+            table_data, where_clause, indexes, order_by, offset, stop, vectors
+        )
+        return ordered if stream or isinstance(ordered, list) else list(ordered)
 
-    return result
+    if where_clause is None:
+        if limit is None and not offset:
+            return table_data
+        return table_data[offset:stop]
+
+    matches = _matching(table_data, where_clause, indexes, vectors, stop)
+    records = islice(matches, offset, stop)
+    return records if stream else list(records)
 
 
 @handle_db_errors
-def update(table_name, table_data, set_clause, where_clause):
+@log_time
+def aggregate(
+    metadata,
+    table_name,
+    table_data,
+    aggregates,
+    where_clause=None,
+    indexes=None,
+    group_by=None,
+    vectors=None,
+):
     """
-    Update records in table.
+    Compute aggregates over table records in one pass.
+
+    count(*) over the whole table is taken from the table length,
+    queries on one column with a sorted index read only the index and,
+    without group by, int and bool columns are reduced as arrays.
 
     Args:
+        metadata: Metadata dictionary
         table_name: Name of the table
         table_data: Table data
-        set_clause: Dictionary like {'age': 29}
-        where_clause: Dictionary like {'name': 'Sergei'}
+        aggregates: List of (function, column) pairs from
+            parse_select_list()
+        where_clause: Condition tree or None for all records
+        indexes: Table indexes or None
+        group_by: Column to group by or None
+        vectors: Column arrays from Catalog.get_vectors() or None
 
     Returns:
-        Updated table data
+        List of result records, one per group, ordered by group value
     """
-    updated_count = 0
+    if table_name not in metadata:
+        raise KeyError(ERROR_TABLE_NOT_FOUND.format(table_name=table_name))
 
-    for record in table_data:
-        match = True
-        for key, value in where_clause.items():
-            if key not in record or record[key] != value:
-                match = False
-                break
+    column_types = {col["name"]: col["type"] for col in metadata[table_name]["columns"]}
+    if group_by is not None and group_by not in column_types:
+        raise KeyError(group_by)
+    for func, column in aggregates:
+        if column is not None and column not in column_types:
+            raise KeyError(column)
+        if func is None and column != group_by:
+            raise ValueError(ERROR_AGGREGATE_COLUMN.format(column=column))
+        if func in ("sum", "avg") and column_types[column] not in NUMERIC_TYPES:
+            raise ValueError(
+                ERROR_AGGREGATE_TYPE.format(
+                    func=func, column=column, col_type=column_types[column]
+                )
+            )
 
-        if match:
-            for key, value in set_clause.items():
-                if key in record and key != "ID":
-                    record[key] = value
-                    updated_count += 1
+    if (
+        where_clause is None
+        and group_by is None
+        and all(func == "count" for func, _ in aggregates)
+    ):
+        count = len(table_data)
+        groups = {None: [count] + [None] * len(aggregates)} if count else {}
+    else:
+        groups = index_only(
+            indexes, aggregates, where_clause, group_by, column_types
+        )
 
-    if updated_count > 0:
-        for record in table_data:
-            match = True
-            for key, value in where_clause.items():
-                if key not in record or record[key] != value:
-                    match = False
-                    break
-            if match:
-                print(
-                    SUCCESS_RECORD_UPDATED.format(
-                        record_id=record["ID"], table_name=table_name
-                    )
+    if groups is None and vectors is not None and group_by is None:
+        groups = aggregate_groups(vectors, table_data, aggregates, where_clause)
+        if groups is not None:
+            metrics.add("rows_scanned", len(table_data))
+
+    if groups is None and parallel.can_scan(table_data) and (
+        where_clause is None or lookup_equal(indexes, table_data, where_clause) is None
+    ):
+        groups = parallel.aggregate_groups(
+            table_data, aggregates, where_clause, group_by
+        )
+        metrics.add("rows_scanned", len(table_data))
+
+    if groups is None:
+        records = _matching(table_data, where_clause, indexes, vectors)
+        run = compile_aggregates(aggregates, group_by, record_class(table_data))
+        groups = run(records)
+
+    if group_by is None:
+        return [finish(aggregates, None, groups.get(None))]
+    return [
+        finish(aggregates, key, groups[key]) for key in sorted(groups)
+    ]
+
+
+@handle_db_errors
+@log_time
+def update(
+    metadata,
+    table_name,
+    table_data,
+    set_clause,
+    where_clause,
+    indexes=None,
+    vectors=None,
+):
+    """
+    Update records in table in one pass over the matching records.
+
+    New values are validated against the schema first. Records whose
+    values are already equal to them are left alone: they are neither
+    reindexed nor reported as changed.
+
+    Args:
+        metadata: Metadata dictionary
+        table_name: Name of the table
+        table_data: Table data
+        set_clause: Dictionary like {'age': 29, 'name': 'Ivan'}
+        where_clause: Condition tree from parse_where()
+        indexes: Table indexes to keep up to date or None
+        vectors: Column arrays to keep up to date or None
+
+    Returns:
+        Dictionary with lists of IDs of matched and changed records and
+        the validated values, like
+        {'matched': [1, 2], 'changed': [2], 'set': {'age': 29}},
+        or None if error
+    """
+    if table_name not in metadata:
+        raise KeyError(ERROR_TABLE_NOT_FOUND.format(table_name=table_name))
+
+    column_types = {col["name"]: col["type"] for col in metadata[table_name]["columns"]}
+    new_values = {}
+    for column, value in set_clause.items():
+        if column not in column_types:
+            raise KeyError(column)
+        if column == "ID":
+            raise ValueError(ERROR_UPDATE_ID)
+        col_type = column_types[column]
+        validated = validate_value(value, col_type)
+        if validated is None and col_type != "str":
+            raise ValueError(
+                ERROR_INVALID_VALUE.format(
+                    value=value, column=column, col_type=col_type
                 )
-                break
+            )
+        new_values[column] = validated
+
+    # Lazy tables hand out decoded copies of their records, which are
+    # given back through replace_records(), so positions are needed
+    in_place = hasattr(table_data, "replace_records")
+    positions = None
+    if in_place:
+        positions = _matching_positions(table_data, where_clause, indexes, vectors)
+    elif vectors is not None and (
+        lookup_equal(indexes, table_data, where_clause) is None
+    ):
+        found = matching_positions(vectors, table_data, where_clause)
+        if found is not None:
+            positions = found.tolist()
+    if positions is not None:
+        matches = [table_data[pos] for pos in positions]
+    else:
+        # Matches are collected first: reindexing changes what the
+        # index lookups iterate over.
+        matches = list(_matching(table_data, where_clause, indexes, None))
+
+    assignments = list(new_values.items())
+    matched = []
+    changed = []
+    replaced = []
+    for number, record in enumerate(matches):
+        matched.append(record["ID"])
+        if all(record[column] == value for column, value in assignments):
+            continue
+        if indexes:
+            remove_record(indexes, record)
+        for column, value in assignments:
+            record[column] = value
+        if indexes:
+            add_record(indexes, record)
+        changed.append(record["ID"])
+        if in_place:
+            replaced.append(number)
+
+    if replaced:
+        table_data.replace_records(
+            [positions[number] for number in replaced],
+            [matches[number] for number in replaced],
+        )
+
+    if vectors is not None and changed:
+        if positions is not None:
+            assign(vectors, positions, new_values)
+        elif any(column in vectors["types"] for column in new_values):
+            drop(vectors)
+
+    if len(changed) == 1:
+        print(
+            SUCCESS_RECORD_UPDATED.format(record_id=changed[0], table_name=table_name)
+        )
+    elif changed:
+        print(
+            SUCCESS_RECORDS_UPDATED.format(
+                table_name=table_name, changed=len(changed), matched=len(matched)
+            )
+        )
+    elif matched:
+        print(INFO_NO_CHANGES.format(matched=len(matched)))
     else:
         print(INFO_NO_UPDATES)
 
-    return table_data
+    return {"matched": matched, "changed": changed, "set": new_values}
+
+
+def _matching_positions(table_data, where_clause, indexes, vectors):
+    """
+    Find table positions of records matching a condition.
+
+    Uses the same access paths as _matching(); records found through an
+    index are located by binary search on their IDs.
+    """
+    candidates = lookup_equal(indexes, table_data, where_clause)
+    if candidates is None and vectors is not None:
+        positions = matching_positions(vectors, table_data, where_clause)
+        if positions is not None:
+            metrics.add("rows_scanned", len(table_data))
+            return positions.tolist()
+    if candidates is None and parallel.can_scan(table_data):
+        return parallel.matching_positions(table_data, where_clause)
+    if candidates is None:
+        candidates = lookup(indexes, table_data, where_clause)
+    metrics.add(
+        "rows_scanned", len(table_data) if candidates is None else len(candidates)
+    )
+
+    predicate = compile_where(where_clause, record_class(table_data))
+    if candidates is None:
+        return [pos for pos, record in enumerate(table_data) if predicate(record)]
+    ids = sorted(record["ID"] for record in candidates if predicate(record))
+    get_id = itemgetter("ID")
+    return [bisect_left(table_data, record_id, key=get_id) for record_id in ids]
 
 
 @confirm_action(CONFIRM_DELETE_RECORD)
 @handle_db_errors
-def delete(table_name, table_data, where_clause):
+@log_time
+def delete(table_name, table_data, where_clause, indexes=None, vectors=None):
     """
     Delete records from table.
 
     Args:
         table_name: Name of the table
         table_data: Table data
-        where_clause: Dictionary like {'ID': 1}
+        where_clause: Condition tree from parse_where()
+        indexes: Table indexes to keep up to date or None
+        vectors: Column arrays to keep up to date or None
 
     Returns:
-        Updated table data or None if cancelled
+        Dictionary with the new table data and IDs of deleted records,
+        like {'data': [...], 'deleted': [3, 7]}, or None if cancelled
     """
     deleted_ids = []
 
-    new_data = []
-    for record in table_data:
-        match = True
-        for key, value in where_clause.items():
-            if key not in record or record[key] != value:
-                match = False
-                break
-
-        if match:
+    if hasattr(table_data, "mark_deleted"):
+        # Tables with tombstones lose records in place, O(deleted)
+        positions = _matching_positions(table_data, where_clause, indexes, vectors)
+        for pos in positions:
+            record = table_data[pos]
+            deleted_ids.append(record["ID"])
+            if indexes:
+                remove_record(indexes, record)
+        if positions:
+            if vectors is not None:
+                discard(vectors, positions)
+            table_data.mark_deleted(positions)
+        _report_deleted(table_name, deleted_ids)
+        return {"data": table_data, "deleted": deleted_ids}
+
+    positions = None
+    candidates = lookup_equal(indexes, table_data, where_clause)
+    if candidates is None and vectors is not None:
+        positions = matching_positions(vectors, table_data, where_clause)
+    if candidates is None and positions is None:
+        candidates = lookup(indexes, table_data, where_clause)
+
+    if positions is not None:
+        for pos in positions.tolist():
+            record = table_data[pos]
             deleted_ids.append(record["ID"])
-        else:
-            new_data.append(record)
+            if indexes:
+                remove_record(indexes, record)
+        new_data = remove(vectors, table_data, positions) if deleted_ids else table_data
+    elif candidates is not None:
+        predicate = compile_where(where_clause, record_class(candidates))
+        for record in candidates:
+            if predicate(record):
+                deleted_ids.append(record["ID"])
+                remove_record(indexes, record)
+
+        deleted = set(deleted_ids)
+        new_data = (
+            [record for record in table_data if record["ID"] not in deleted]
+            if deleted
+            else table_data
+        )
+    else:
+        predicate = compile_where(where_clause, record_class(table_data))
+        new_data = []
+        for record in table_data:
+            if predicate(record):
+                deleted_ids.append(record["ID"])
+                if indexes:
+                    remove_record(indexes, record)
+            else:
+                new_data.append(record)
+
+    _report_deleted(table_name, deleted_ids)
+    return {"data": new_data, "deleted": deleted_ids}
+
 
+def _report_deleted(table_name, deleted_ids):
     if deleted_ids:
         for deleted_id in deleted_ids:
             print(
@@ -309,30 +1080,75 @@ def delete(table_name, table_data, where_clause):
     else:
         print(INFO_NO_DELETIONS)
 
-    return new_data
+
+def _escape_tsv(value):
+    return (
+        str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n")
+    )
 
 
-def display_table(table_data, columns):
+def _render_page(page, column_names, output_format):
+    if output_format == "jsonl":
+        return "".join(
+            json.dumps(
+                {col: record.get(col, "") for col in column_names},
+                ensure_ascii=False,
+            )
+            + "\n"
+            for record in page
+        )
+
+    if output_format == "tsv":
+        return "".join(
+            "\t".join(_escape_tsv(record.get(col, "")) for col in column_names)
+            + "\n"
+            for record in page
+        )
+
+    # Imported here so that commands without table output start faster
+    from prettytable import PrettyTable
+
+    table = PrettyTable()
+    table.field_names = column_names
+    for record in page:
+        table.add_row([record.get(col, "") for col in column_names])
+    return table.get_string() + "\n"
+
+
+def display_table(table_data, columns, output_format="table"):
     """
-    Display table data using PrettyTable.
+    Display table data page by page.
+
+    Records are rendered in pages of DISPLAY_PAGE_SIZE rows and written to
+    stdout as soon as each page is ready, so the first rows appear without
+    waiting for the whole result to be rendered.
 
     Args:
-        table_data: List of records
+        table_data: Iterable of records
         columns: List of column definitions
-    """
-    if not table_data:
-        print(INFO_NO_DATA)
-        return
+        output_format: "table" (PrettyTable), "tsv" or "jsonl"
 
-    table = PrettyTable()
+    Returns:
+        Number of displayed records
+    """
     column_names = [col["name"] for col in columns]
-    table.field_names = column_names
+    records = iter(table_data)
+
+    page = list(islice(records, DISPLAY_PAGE_SIZE))
+    if not page:
+        print(INFO_NO_DATA)
+        return 0
 
-    for record in table_data:
-        row = [record.get(col, "") for col in column_names]
-        table.add_row(row)
+    if output_format == "tsv":
+        sys.stdout.write("\t".join(column_names) + "\n")
 
-    print(table)
+    count = 0
+    while page:
+        sys.stdout.write(_render_page(page, column_names, output_format))
+        sys.stdout.flush()
+        count += len(page)
+        page = list(islice(records, DISPLAY_PAGE_SIZE))
+    return count
 
 
 @handle_db_errors
@@ -351,7 +1167,10 @@ def show_table_info(metadata, table_name, table_data):
     columns = metadata[table_name]["columns"]
     columns_str = ", ".join([f"{col['name']}:{col['type']}" for col in columns])
 
+    table_format = metadata[table_name].get("format", DEFAULT_STORAGE_FORMAT)
+
     print(f"Таблица: {table_name}")
     print(f"Столбцы: {columns_str}")
+    print(f"Формат хранения: {table_format}")
     print(f"Количество записей: {len(table_data)}")
 
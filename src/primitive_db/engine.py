@@ -1,41 +1,97 @@
 """Engine module for handling user interaction and commands."""
 
-import shlex
-
-import prompt
+import sys
+from itertools import chain
 
 from src.decorators import create_cacher
+from src.primitive_db import metrics
+from src.primitive_db.aggregate import aggregate_name
+from src.primitive_db.catalog import Catalog
 from src.primitive_db.constants import (
+    ERROR_COLUMN_NOT_FOUND,
+    ERROR_IN_TRANSACTION,
+    ERROR_PREPARE_STATEMENT,
+    ERROR_PREPARED_ARGS,
+    ERROR_PREPARED_NOT_FOUND,
+    ERROR_UNKNOWN_OUTPUT,
+    INFO_CACHE_STATS,
+    INFO_CHANGES_COMMITTED,
+    INFO_CHECKPOINT_DONE,
     INFO_INVALID_VALUE,
-    METADATA_FILE,
+    INFO_NO_METRICS,
+    INFO_OUTPUT_FORMAT,
+    INFO_STATEMENT_PREPARED,
+    INFO_TRANSACTION_ROLLED_BACK,
+    INFO_TRANSACTION_STARTED,
+    OUTPUT_FORMATS,
+    PLAN_CACHE_MAX_TEXT,
+    PLAN_CACHE_SIZE,
     PROMPT_COMMAND,
+    SUCCESS_TABLE_CONVERTED,
+    SUCCESS_TABLE_VACUUMED,
 )
 from src.primitive_db.core import (
+    aggregate,
+    convert_table,
+    create_index,
     create_table,
     delete,
     display_table,
     drop_table,
-    insert,
+    insert_many,
     list_tables,
+    load_rows,
     select,
     show_table_info,
+    typed_where,
     update,
 )
+from src.primitive_db.loader import read_rows
 from src.primitive_db.parser import (
-    parse_set_clause,
+    EXECUTE_RE,
+    PREPARE_RE,
+    bind_params,
+    parse_statement,
     parse_values,
-    parse_where_clause,
-)
-from src.primitive_db.utils import (
-    load_metadata,
-    load_table_data,
-    save_metadata,
-    save_table_data,
 )
+from src.primitive_db.storage import table_size
 
 # Initialize cacher for select operations
 cacher = create_cacher()
 
+# Parsed plans of data statements by command text
+plan_cacher = create_cacher(max_entries=PLAN_CACHE_SIZE)
+
+# Commands run through parsed plans
+DATA_STATEMENTS = ("insert into ", "select ", "update ", "delete from ")
+
+# Session settings changed by commands and command line flags; the
+# server keeps the same settings for each client
+settings = {
+    "output_format": "table",
+    "assume_yes": False,
+    "metrics_file": None,
+    "prepared": {},
+}
+
+# Per-table generation counters, bumped by every write command
+table_generations = {}
+
+
+def bump_generation(table_name):
+    """
+    Mark table as changed and drop its cached select results.
+
+    Args:
+        table_name: Name of the changed table
+    """
+    table_generations[table_name] = table_generations.get(table_name, 0) + 1
+    cacher.invalidate(table_name)
+
+
+# Session catalog: tables are loaded once and kept in memory
+catalog = Catalog(on_reload=bump_generation)
+
 
 def print_help():
     """Print the help message."""
@@ -46,228 +102,655 @@ def print_help():
         "- создать запись."
     )
     print(
-        "mmand> select from <имя_таблицы> where <столбец> = <значение> "
-        "- прочитать записи по условию."
+        "mmand> insert into <имя_таблицы> values (...), (...), ... "
+        "- создать несколько записей."
+    )
+    print(
+        "mmand> select from <имя_таблицы> where <условие> "
+        "- прочитать записи по условию (=, !=, <, >, in, like, and, or, not)."
     )
     print("mmand> select from <имя_таблицы> - прочитать все записи.")
     print(
-        "mmand> update <имя_таблицы> set <столбец1> = <новое_значение1> "
-        "where <столбец_условия> = <значение_условия> - обновить запись."
+        "mmand> select count(*), sum(<столбец>), min(...), max(...), avg(...) "
+        "from <имя_таблицы> [where ...] [group by <столбец>] - агрегаты."
+    )
+    print(
+        "mmand> select from <имя_таблицы> [where ...] [order by <столбец> [desc]] "
+        "[limit <N>] [offset <M>] - прочитать записи по порядку или часть записей."
     )
     print(
-        "mmand> delete from <имя_таблицы> where <столбец> = <значение> "
+        "mmand> prepare <имя> as <insert|select|update|delete с ? вместо значений> "
+        "- подготовить запрос."
+    )
+    print(
+        "mmand> execute <имя> (<значение1>, <значение2>, ...) "
+        "- выполнить подготовленный запрос."
+    )
+    print(
+        "mmand> output <table|tsv|jsonl> "
+        "- формат вывода select (tsv и jsonl удобны для конвейеров)."
+    )
+    print(
+        "mmand> update <имя_таблицы> set <столбец1> = <новое_значение1>, .. "
+        "where <условие> - обновить записи."
+    )
+    print(
+        "mmand> delete from <имя_таблицы> where <условие> "
         "- удалить запись."
     )
+    print(
+        "mmand> load <имя_таблицы> from <файл.csv|файл.jsonl> "
+        "- загрузить записи из файла."
+    )
     print("mmand> info <имя_таблицы> - вывести информацию о таблице.")
+    print(
+        "mmand> vacuum <имя_таблицы> "
+        "- вычистить удалённые записи из файлов таблицы."
+    )
+    print(
+        "mmand> convert_table <имя_таблицы> <json|columnar|segmented> "
+        "- сменить формат хранения таблицы."
+    )
     print(
         "mmand> create_table <имя_таблицы> <столбец1:тип> .. - создать таблицу"
     )
     print("mmand> list_tables - показать список всех таблиц")
+    print("mmand> cache_stats - статистика кэша select-запросов")
+    print("mmand> stats - время операций, просмотренные записи, ввод-вывод")
     print("mmand> drop_table <имя_таблицы> - удалить таблицу")
+    print(
+        "mmand> create_index <имя_таблицы> <столбец> [hash|sorted] "
+        "- создать индекс по столбцу (sorted - для диапазонов и order by)"
+    )
     print("\nОбщие команды:")
+    print("mmand> begin - начать транзакцию")
+    print("mmand> commit - записать изменения (завершить транзакцию)")
+    print("mmand> rollback - отменить изменения транзакции")
+    print("mmand> checkpoint - перенести журнал изменений в файлы таблиц")
     print("mmand> exit - выход из программы")
     print("mmand> help - справочная информация\n")
 
 
-def run():
-    """Run the main database engine loop."""
-    print_help()
+def script_lines(lines):
+    """
+    Turn lines of a command script into commands.
 
-    while True:
-        try:
-            user_input = prompt.string(PROMPT_COMMAND).strip()
-
-            if not user_input:
-                continue
-
-            user_lower = user_input.lower()
-
-            if user_lower == "exit":
-                print("Выход из программы.")
-                break
-
-            elif user_lower == "help":
-                print_help()
-
-            elif user_lower == "list_tables":
-                metadata = load_metadata(METADATA_FILE)
-                list_tables(metadata)
-
-            elif user_lower.startswith("create_table "):
-                args = shlex.split(user_input)
-                metadata = load_metadata(METADATA_FILE)
-                if len(args) < 2:
-                    print(INFO_INVALID_VALUE)
-                    continue
-                table_name = args[1]
-                columns = args[2:] if len(args) > 2 else []
-                metadata = create_table(metadata, table_name, columns)
-                save_metadata(METADATA_FILE, metadata)
-
-            elif user_lower.startswith("drop_table "):
-                args = shlex.split(user_input)
-                metadata = load_metadata(METADATA_FILE)
-                if len(args) < 2:
-                    print(INFO_INVALID_VALUE)
-                    continue
-                table_name = args[1]
-                metadata = drop_table(metadata, table_name)
-                if metadata is not None:
-                    save_metadata(METADATA_FILE, metadata)
-
-            elif user_lower.startswith("insert into "):
-                args = shlex.split(user_input)
-                metadata = load_metadata(METADATA_FILE)
-
-                if "values" not in user_lower:
-                    print(INFO_INVALID_VALUE)
-                    continue
-
-                table_name = args[2]
-                values_start = next(
-                    (i for i, a in enumerate(args) if a.lower() == "values"),
-                    None,
-                )
+    Empty lines and comments starting with "--" or "#" are skipped, a
+    trailing ";" is dropped.
 
-                if values_start is None:
-                    print(INFO_INVALID_VALUE)
-                    continue
+    Args:
+        lines: Iterable of text lines
 
-                values_str = " ".join(args[values_start + 1 :])
-                values = parse_values(values_str)
+    Yields:
+        Command strings
+    """
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith(("--", "#")):
+            continue
+        yield line.removesuffix(";").rstrip()
 
-                table_data = load_table_data(table_name)
-                table_data = insert(metadata, table_name, values, table_data)
 
-                if table_data is not None:
-                    save_table_data(table_name, table_data)
+def _prompt_lines():
+    import prompt
 
-            elif user_lower.startswith("select from "):
-                args = shlex.split(user_input)
-                metadata = load_metadata(METADATA_FILE)
-
-                table_name = args[2]
-
-                if table_name not in metadata:
-                    print(f'Ошибка: Таблица "{table_name}" не существует.')
-                    continue
-
-                table_data = load_table_data(table_name)
-
-                where_clause = None
-                if "where" in user_lower:
-                    where_idx = next(
-                        (i for i, a in enumerate(args) if a.lower() == "where"),
-                        None,
-                    )
-                    if where_idx is not None:
-                        where_str = " ".join(args[where_idx + 1 :])
-                        where_clause = parse_where_clause(where_str)
-
-                # Use cacher for select results
-                cache_key = f"{table_name}:{where_clause}"
-                result = cacher(
-                    cache_key, lambda: select(table_data, where_clause)
+    while True:
+        yield prompt.string(PROMPT_COMMAND)
+
+
+def split_args(user_input):
+    """
+    Split a command into shell-like words.
+
+    shlex is imported on first use, as only table management commands
+    need it.
+
+    Args:
+        user_input: Command string
+
+    Returns:
+        List of words with quotes removed
+    """
+    import shlex
+
+    return shlex.split(user_input)
+
+
+def cache_counters():
+    """
+    Get select and plan cache counters for the metrics output.
+
+    Returns:
+        Dictionary like {'cache_hits': 3, 'plan_cache_hits': 7, ...}
+    """
+    counters = {}
+    for prefix, cache in (("cache", cacher), ("plan_cache", plan_cacher)):
+        stats = cache.stats()
+        for name in ("hits", "misses", "evictions", "skipped"):
+            counters[f"{prefix}_{name}"] = stats[name]
+    return counters
+
+
+def dump_metrics():
+    """Write metrics to the Prometheus text file if one is configured."""
+    if settings["metrics_file"]:
+        metrics.write_prometheus(settings["metrics_file"], cache_counters())
+
+
+def close_session():
+    """Write pending changes, rolling back an unfinished transaction."""
+    if catalog.in_transaction:
+        print(INFO_TRANSACTION_ROLLED_BACK)
+    catalog.close()
+    dump_metrics()
+
+
+def _cacheable(records, max_size):
+    """
+    Read records into a list while it is small enough to be cached.
+
+    Args:
+        records: Iterable of records
+        max_size: Maximum estimated size of a cached list in bytes
+
+    Returns:
+        List of all records, or an iterator over all of them if they do
+        not fit, so a large result is displayed without being held whole
+    """
+    if isinstance(records, list):
+        return records
+    records = iter(records)
+    head = []
+    size = sys.getsizeof(head)
+    for record in records:
+        head.append(record)
+        # A list slot plus the record, as estimate_size() counts them
+        size += 8 + sys.getsizeof(record)
+        if size > max_size:
+            return chain(head, records)
+    return head
+
+
+def run_plan(plan, session):
+    """
+    Execute a parsed data statement.
+
+    Args:
+        plan: Result of parse_statement() without placeholders
+        session: Settings of the session running the statement
+    """
+    op = plan["op"]
+    if op == "invalid":
+        print(INFO_INVALID_VALUE)
+        return
+
+    metadata = catalog.get_metadata()
+    table_name = plan["table"]
+
+    if table_name not in metadata:
+        print(f'Ошибка: Таблица "{table_name}" не существует.')
+        return
+
+    if op == "insert":
+        table_data = catalog.get_table(table_name, writable=True, in_place=True)
+        indexes = catalog.get_indexes(table_name)
+        rows = plan["rows"]
+        table_data = insert_many(metadata, table_name, rows, table_data, indexes)
+
+        if table_data is not None:
+            catalog.write_metadata()
+            catalog.write_table(
+                table_name,
+                table_data,
+                [
+                    {"op": "insert", "row": dict(record)}
+                    for record in table_data[len(table_data) - len(rows) :]
+                ],
+            )
+            bump_generation(table_name)
+        return
+
+    where_clause = plan["where"]
+    if where_clause is not None:
+        where_clause = typed_where(metadata, table_name, where_clause)
+        if where_clause is None:
+            return
+
+    if op == "select":
+        order_by, limit, offset = plan["order_by"], plan["limit"], plan["offset"]
+        columns = metadata[table_name]["columns"]
+        if order_by and order_by[0] not in [col["name"] for col in columns]:
+            print(ERROR_COLUMN_NOT_FOUND.format(column=order_by[0]))
+            return
+
+        table_data = catalog.get_table(table_name)
+        indexes = catalog.get_indexes(table_name)
+        vectors = catalog.get_vectors(table_name)
+
+        # Use cacher for select results
+        generation = table_generations.get(table_name, 0)
+        cache_key = (
+            f"{table_name}:{generation}:{where_clause}:{order_by}:"
+            f"{limit}:{offset}"
+        )
+        result = cacher.get(cache_key)
+        if result is None:
+            matches = select(
+                table_data,
+                where_clause,
+                indexes,
+                limit,
+                offset,
+                order_by,
+                vectors,
+                stream=True,
+            )
+            if matches is None:
+                return
+            result = _cacheable(matches, cacher.max_entry_size)
+            if isinstance(result, list):
+                cacher.put(cache_key, result, tag=table_name)
+            else:
+                cacher.skip()
+        shown = display_table(result, columns, session["output_format"])
+        metrics.add("rows_returned", shown)
+
+    elif op == "aggregate":
+        aggregates, group_by = plan["aggregates"], plan["group_by"]
+        table_data = catalog.get_table(table_name)
+        indexes = catalog.get_indexes(table_name)
+        vectors = catalog.get_vectors(table_name)
+
+        generation = table_generations.get(table_name, 0)
+        cache_key = (
+            f"{table_name}:{generation}:{aggregates}:{where_clause}:"
+            f"{group_by}"
+        )
+        result = cacher(
+            cache_key,
+            lambda: aggregate(
+                metadata,
+                table_name,
+                table_data,
+                aggregates,
+                where_clause,
+                indexes,
+                group_by,
+                vectors,
+            ),
+            tag=table_name,
+        )
+        if result is not None:
+            columns = [
+                {"name": aggregate_name(func, column)}
+                for func, column in aggregates
+            ]
+            metrics.add("rows_returned", len(result))
+            display_table(result, columns, session["output_format"])
+
+    elif op == "update":
+        table_data = catalog.get_table(table_name, writable=True, in_place=True)
+        indexes = catalog.get_indexes(table_name)
+        vectors = catalog.get_vectors(table_name)
+        result = update(
+            metadata,
+            table_name,
+            table_data,
+            plan["set"],
+            where_clause,
+            indexes,
+            vectors,
+        )
+        # Records are changed in place; the log gets their IDs
+        # instead of the condition, so replay does not rescan.
+        if result is not None and result["changed"]:
+            metrics.add("rows_updated", len(result["changed"]))
+            catalog.write_table(
+                table_name,
+                None,
+                [
+                    {
+                        "op": "update",
+                        "ids": result["changed"],
+                        "set": result["set"],
+                    }
+                ],
+            )
+            bump_generation(table_name)
+
+    elif op == "delete":
+        table_data = catalog.get_table(table_name, writable=True, in_place=True)
+        indexes = catalog.get_indexes(table_name)
+        vectors = catalog.get_vectors(table_name)
+        result = delete(
+            table_name,
+            table_data,
+            where_clause,
+            indexes,
+            vectors,
+            confirmed=session["assume_yes"],
+        )
+        # Проверяем подтверждение (если None, пользователь отказал)
+        if result is not None and result["deleted"]:
+            metrics.add("rows_deleted", len(result["deleted"]))
+            catalog.write_table(
+                table_name,
+                result["data"],
+                [{"op": "delete", "ids": result["deleted"]}],
+            )
+            bump_generation(table_name)
+
+
+def execute(user_input, session=None):
+    """
+    Execute one command.
+
+    Args:
+        user_input: Command string
+        session: Settings of the session running the command (output
+            format, confirmations), the module settings if None
+
+    Returns:
+        False if the command ends the session, True otherwise
+    """
+    if session is None:
+        session = settings
+
+    user_input = user_input.strip()
+    if not user_input:
+        return True
+
+    user_lower = user_input.lower()
+
+    if user_lower.startswith(DATA_STATEMENTS):
+        # Repeated commands skip tokenizing and parsing
+        if len(user_input) > PLAN_CACHE_MAX_TEXT:
+            plan = parse_statement(user_input)
+        else:
+            plan = plan_cacher(user_input, lambda: parse_statement(user_input))
+        run_plan(plan, session)
+
+    elif user_lower == "exit":
+        close_session()
+        print("Выход из программы.")
+        return False
+
+    elif user_lower == "begin":
+        catalog.begin()
+        print(INFO_TRANSACTION_STARTED)
+
+    elif user_lower == "rollback":
+        catalog.rollback()
+        print(INFO_TRANSACTION_ROLLED_BACK)
+
+    elif user_lower == "commit":
+        catalog.commit()
+        print(INFO_CHANGES_COMMITTED)
+
+    elif user_lower == "checkpoint":
+        catalog.checkpoint()
+        print(INFO_CHECKPOINT_DONE)
+
+    elif user_lower == "help":
+        print_help()
+
+    elif user_lower == "cache_stats":
+        print(INFO_CACHE_STATS.format(**cacher.stats()))
+
+    elif user_lower == "stats":
+        lines = metrics.stats_lines(cache_counters()) if metrics.enabled else []
+        print("\n".join(lines) if lines else INFO_NO_METRICS)
+        dump_metrics()
+
+    elif user_lower.startswith("output "):
+        args = user_lower.split()
+        output_format = args[1] if len(args) == 2 else ""
+        if output_format not in OUTPUT_FORMATS:
+            print(
+                ERROR_UNKNOWN_OUTPUT.format(
+                    output_format=output_format,
+                    formats=", ".join(sorted(OUTPUT_FORMATS)),
                 )
-                columns = metadata[table_name]["columns"]
-                display_table(result, columns)
-
-            elif user_lower.startswith("update "):
-                args = shlex.split(user_input)
-                metadata = load_metadata(METADATA_FILE)
-
-                if "set" not in user_lower or "where" not in user_lower:
-                    print(INFO_INVALID_VALUE)
-                    continue
-
-                table_name = args[1]
-
-                if table_name not in metadata:
-                    print(f'Ошибка: Таблица "{table_name}" не существует.')
-                    continue
-
-                set_idx = next(
-                    (i for i, a in enumerate(args) if a.lower() == "set"), None
+            )
+            return True
+        session["output_format"] = output_format
+        print(INFO_OUTPUT_FORMAT.format(output_format=output_format))
+
+    elif user_lower == "list_tables":
+        metadata = catalog.get_metadata()
+        list_tables(metadata)
+
+    elif user_lower.startswith("create_table "):
+        args = split_args(user_input)
+        metadata = catalog.get_metadata()
+        if len(args) < 2:
+            print(INFO_INVALID_VALUE)
+            return True
+        table_name = args[1]
+        columns = args[2:] if len(args) > 2 else []
+        metadata = create_table(metadata, table_name, columns)
+        if metadata is not None:
+            catalog.write_metadata()
+            bump_generation(table_name)
+
+    elif user_lower.startswith("drop_table "):
+        args = split_args(user_input)
+        metadata = catalog.get_metadata()
+        if len(args) < 2:
+            print(INFO_INVALID_VALUE)
+            return True
+        table_name = args[1]
+        # Deleted files can not be brought back by rollback
+        if catalog.in_transaction:
+            raise ValueError(ERROR_IN_TRANSACTION)
+        table_meta = metadata.get(table_name)
+        metadata = drop_table(
+            metadata, table_name, confirmed=session["assume_yes"]
+        )
+        if metadata is not None:
+            catalog.write_metadata()
+            catalog.drop_table(table_name, table_meta)
+            bump_generation(table_name)
+
+    elif user_lower.startswith("prepare "):
+        match = PREPARE_RE.match(user_input)
+        if match is None:
+            print(INFO_INVALID_VALUE)
+            return True
+
+        name, statement = match.groups()
+        plan = parse_statement(statement.strip(), params=True)
+        if plan is None:
+            raise ValueError(ERROR_PREPARE_STATEMENT)
+        if plan["op"] == "invalid":
+            print(INFO_INVALID_VALUE)
+            return True
+        session["prepared"][name] = plan
+        print(INFO_STATEMENT_PREPARED.format(name=name, params=plan["params"]))
+
+    elif user_lower.startswith("execute "):
+        match = EXECUTE_RE.match(user_input)
+        if match is None:
+            print(INFO_INVALID_VALUE)
+            return True
+
+        name, args_str = match.groups()
+        plan = session["prepared"].get(name)
+        if plan is None:
+            raise ValueError(ERROR_PREPARED_NOT_FOUND.format(name=name))
+        args = parse_values(args_str) if args_str else []
+        if len(args) != plan["params"]:
+            raise ValueError(
+                ERROR_PREPARED_ARGS.format(
+                    name=name, expected=plan["params"], given=len(args)
                 )
-                where_idx = next(
-                    (i for i, a in enumerate(args) if a.lower() == "where"),
-                    None,
+            )
+        run_plan(bind_params(plan, args), session)
+
+    elif user_lower.startswith("load "):
+        args = split_args(user_input)
+        metadata = catalog.get_metadata()
+
+        if len(args) != 4 or args[2].lower() != "from":
+            print(INFO_INVALID_VALUE)
+            return True
+
+        table_name, filepath = args[1], args[3]
+
+        if table_name not in metadata:
+            print(f'Ошибка: Таблица "{table_name}" не существует.')
+            return True
+
+        column_names = [
+            col["name"] for col in metadata[table_name]["columns"][1:]
+        ]
+        table_data = catalog.get_table(table_name, writable=True)
+        indexes = catalog.get_indexes(table_name)
+        table_data = load_rows(
+            metadata,
+            table_name,
+            read_rows(filepath, column_names),
+            table_data,
+            indexes,
+        )
+
+        if table_data is not None:
+            catalog.write_metadata()
+            catalog.write_table(table_name, table_data)
+            bump_generation(table_name)
+
+    elif user_lower.startswith("create_index "):
+        args = split_args(user_input)
+        metadata = catalog.get_metadata()
+
+        if len(args) < 3:
+            print(INFO_INVALID_VALUE)
+            return True
+
+        table_name, column = args[1], args[2]
+        kind = args[3].lower() if len(args) > 3 else "hash"
+        if table_name not in metadata:
+            print(f'Ошибка: Таблица "{table_name}" не существует.')
+            return True
+
+        table_data = catalog.get_table(table_name)
+        indexes = create_index(
+            metadata,
+            table_name,
+            column,
+            table_data,
+            catalog.get_indexes(table_name),
+            kind,
+        )
+        if indexes is not None:
+            catalog.write_indexes(table_name)
+            catalog.write_metadata()
+
+    elif user_lower.startswith("convert_table "):
+        args = split_args(user_input)
+        metadata = catalog.get_metadata()
+
+        if len(args) != 3:
+            print(INFO_INVALID_VALUE)
+            return True
+
+        table_name = args[1]
+        table_format = convert_table(metadata, table_name, args[2].lower())
+        if table_format is not None:
+            table_meta = metadata[table_name]
+            old_size = table_size(table_name, table_meta)
+            catalog.convert_table(table_name, table_format)
+            print(
+                SUCCESS_TABLE_CONVERTED.format(
+                    table_name=table_name,
+                    table_format=table_format,
+                    old_size=old_size,
+                    new_size=table_size(table_name, table_meta),
                 )
+            )
 
-                if set_idx is None or where_idx is None:
-                    print(INFO_INVALID_VALUE)
-                    continue
+    elif user_lower.startswith("vacuum "):
+        args = split_args(user_input)
+        metadata = catalog.get_metadata()
 
-                set_str = " ".join(args[set_idx + 1 : where_idx])
-                where_str = " ".join(args[where_idx + 1 :])
+        if len(args) != 2:
+            print(INFO_INVALID_VALUE)
+            return True
 
-                set_clause = parse_set_clause(set_str)
-                where_clause = parse_where_clause(where_str)
+        table_name = args[1]
+        if table_name not in metadata:
+            print(f'Ошибка: Таблица "{table_name}" не существует.')
+            return True
 
-                if not set_clause or not where_clause:
-                    print(INFO_INVALID_VALUE)
-                    continue
+        dead = catalog.vacuum(table_name)
+        print(SUCCESS_TABLE_VACUUMED.format(table_name=table_name, dead=dead))
 
-                table_data = load_table_data(table_name)
-                table_data = update(
-                    table_name, table_data, set_clause, where_clause
-                )
-                save_table_data(table_name, table_data)
-
-            elif user_lower.startswith("delete from "):
-                args = shlex.split(user_input)
-                metadata = load_metadata(METADATA_FILE)
+    elif user_lower.startswith("info "):
+        args = split_args(user_input)
+        metadata = catalog.get_metadata()
 
-                if "where" not in user_lower:
-                    print(INFO_INVALID_VALUE)
-                    continue
+        if len(args) < 2:
+            print(INFO_INVALID_VALUE)
+            return True
 
-                table_name = args[2]
+        table_name = args[1]
+        if table_name not in metadata:
+            print(f'Ошибка: Таблица "{table_name}" не существует.')
+            return True
 
-                if table_name not in metadata:
-                    print(f'Ошибка: Таблица "{table_name}" не существует.')
-                    continue
-
-                where_idx = next(
-                    (i for i, a in enumerate(args) if a.lower() == "where"),
-                    None,
-                )
+        table_data = catalog.get_table(table_name)
+        show_table_info(metadata, table_name, table_data)
 
-                if where_idx is None:
-                    print(INFO_INVALID_VALUE)
-                    continue
+    else:
+        print(f"Функции {user_lower.split()[0]} нет. Попробуйте снова.")
 
-                where_str = " ".join(args[where_idx + 1 :])
-                where_clause = parse_where_clause(where_str)
+    return True
 
-                if not where_clause:
-                    print(INFO_INVALID_VALUE)
-                    continue
 
-                table_data = load_table_data(table_name)
-                table_data = delete(table_name, table_data, where_clause)
-                # Проверяем подтверждение (если None, пользователь отказал)
-                if table_data is not None:
-                    save_table_data(table_name, table_data)
+def run(commands=None, assume_yes=False, profile=None):
+    """
+    Run the main database engine loop.
 
-            elif user_lower.startswith("info "):
-                args = shlex.split(user_input)
-                metadata = load_metadata(METADATA_FILE)
+    In batch mode commands run back to back without prompts, and changes
+    are written to disk only by commit and at the end of the input.
 
-                if len(args) < 2:
-                    print(INFO_INVALID_VALUE)
-                    continue
-
-                table_name = args[1]
-                table_data = load_table_data(table_name)
-                show_table_info(metadata, table_name, table_data)
-
-            else:
-                print(f"Функции {user_lower.split()[0]} нет. Попробуйте снова.")
+    Args:
+        commands: Iterable of commands for batch mode, or None to read
+            them interactively
+        assume_yes: Confirm dangerous operations without asking
+        profile: "cpu" or "memory" to profile command execution and
+            print the report to standard error at the end, or None
+    """
+    settings["assume_yes"] = assume_yes
+    profiler = metrics.Profiler(profile) if profile else None
+    if commands is None:
+        print_help()
+        lines = _prompt_lines()
+    else:
+        catalog.autocommit = False
+        lines = iter(commands)
 
+    while True:
+        try:
+            user_input = next(lines, None)
+            if user_input is None:
+                close_session()
+                break
+            if profiler is not None:
+                profiler.enable()
+            try:
+                keep_running = execute(user_input)
+            finally:
+                if profiler is not None:
+                    profiler.disable()
+            if not keep_running:
+                break
         except (KeyboardInterrupt, EOFError):
+            close_session()
             print("\nВыход из программы.")
             break
         except Exception as e:
             print(f"Ошибка: {e}")
 
+    if profiler is not None:
+        profiler.report()
@@ -0,0 +1,441 @@
+"""Indexes on table columns.
+
+Two kinds of index are supported:
+
+- "hash" - dictionary from value to record IDs, answers = and IN;
+- "sorted" - parallel lists of values and record IDs ordered by
+  (value, ID), answers = and IN as well as ranges (<, <=, >, >=) and
+  ORDER BY without sorting.
+"""
+
+import json
+import os
+from bisect import bisect_left, bisect_right
+
+from src.primitive_db.constants import DATA_DIR, ERROR_INDEX_VALUE
+from src.primitive_db.query import conjuncts
+
+
+def index_path(table_name):
+    """
+    Build path to the index file of a table.
+
+    Args:
+        table_name: Name of the table
+
+    Returns:
+        Path like "data/users.index.json"
+    """
+    return f"{DATA_DIR}/{table_name}.index.json"
+
+
+def index_key(value):
+    """
+    Convert a column value into a hashable index key.
+
+    Bools are stored as ints so that lookups follow the same equality
+    rules as the full scan (True == 1).
+
+    Args:
+        value: Column value
+
+    Returns:
+        String key
+    """
+    if isinstance(value, bool):
+        value = int(value)
+    return json.dumps(value, ensure_ascii=False)
+
+
+def empty_index(kind="hash"):
+    """
+    Create an empty index.
+
+    Args:
+        kind: Index kind ("hash" or "sorted")
+
+    Returns:
+        Empty index
+    """
+    if kind == "sorted":
+        return {"kind": "sorted", "keys": [], "ids": []}
+    return {}
+
+
+def is_sorted(index):
+    """
+    Check whether an index is a sorted index.
+
+    Args:
+        index: Index
+
+    Returns:
+        True for a sorted index
+    """
+    return index.get("kind") == "sorted"
+
+
+def load_indexes(table_name, columns, kinds=None):
+    """
+    Load indexes of a table from disk.
+
+    Args:
+        table_name: Name of the table
+        columns: List of indexed column names
+        kinds: Dictionary of index kinds by column, hash if not listed
+
+    Returns:
+        Dictionary like {'age': {'28': [1, 5]}} or empty dict
+    """
+    if not columns:
+        return {}
+
+    kinds = kinds or {}
+    try:
+        with open(index_path(table_name), "r", encoding="utf-8") as f:
+            stored = json.load(f)
+    except FileNotFoundError:
+        stored = {}
+
+    return {
+        column: stored.get(column) or empty_index(kinds.get(column, "hash"))
+        for column in columns
+    }
+
+
+def save_indexes(table_name, indexes, filepath=None, sync=False):
+    """
+    Save indexes of a table to disk.
+
+    The file is written next to the target and renamed over it, so a
+    crash leaves either the old or the new indexes, never a torn file.
+
+    Args:
+        table_name: Name of the table
+        indexes: Dictionary of indexes
+        filepath: Target path, defaults to the table index file
+        sync: Call fsync before returning if True
+    """
+    os.makedirs(DATA_DIR, exist_ok=True)
+
+    if filepath is None:
+        filepath = index_path(table_name)
+    tmp = filepath + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(indexes, f, ensure_ascii=False, separators=(",", ":"))
+        if sync:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp, filepath)
+
+
+def build_index(table_data, column, kind="hash"):
+    """
+    Build index for a column.
+
+    Args:
+        table_data: List of records
+        column: Column name
+        kind: Index kind ("hash" or "sorted")
+
+    Returns:
+        Dictionary mapping index keys to lists of record IDs, or a
+        sorted index
+    """
+    if kind == "sorted":
+        values = [record[column] for record in table_data]
+        ids = [record["ID"] for record in table_data]
+        # Stable sort of positions: records are in ascending ID order, so
+        # equal values stay ordered by ID.
+        order = sorted(range(len(values)), key=values.__getitem__)
+        return {
+            "kind": "sorted",
+            "keys": [values[pos] for pos in order],
+            "ids": [ids[pos] for pos in order],
+        }
+
+    index = {}
+    for record in table_data:
+        index.setdefault(index_key(record[column]), []).append(record["ID"])
+    return index
+
+
+def _sorted_position(index, value, record_id):
+    keys = index["keys"]
+    lo = bisect_left(keys, value)
+    hi = bisect_right(keys, value, lo)
+    return bisect_left(index["ids"], record_id, lo, hi)
+
+
+def add_record(indexes, record):
+    """
+    Add record to all indexes.
+
+    Args:
+        indexes: Dictionary of indexes
+        record: Record to add
+    """
+    for column, index in indexes.items():
+        if is_sorted(index):
+            pos = _sorted_position(index, record[column], record["ID"])
+            index["keys"].insert(pos, record[column])
+            index["ids"].insert(pos, record["ID"])
+        else:
+            index.setdefault(index_key(record[column]), []).append(record["ID"])
+
+
+def remove_record(indexes, record):
+    """
+    Remove record from all indexes.
+
+    Args:
+        indexes: Dictionary of indexes
+        record: Record to remove
+    """
+    for column, index in indexes.items():
+        if is_sorted(index):
+            pos = _sorted_position(index, record[column], record["ID"])
+            ids = index["ids"]
+            if pos < len(ids) and ids[pos] == record["ID"]:
+                del index["keys"][pos]
+                del ids[pos]
+            continue
+
+        key = index_key(record[column])
+        ids = index.get(key)
+        if not ids:
+            continue
+        try:
+            ids.remove(record["ID"])
+        except ValueError:
+            continue
+        if not ids:
+            del index[key]
+
+
+def find_position(table_data, record_id):
+    """
+    Find position of a record by ID.
+
+    Records are kept in ascending ID order, so binary search is used.
+    Falls back to a linear scan if the order was broken externally.
+
+    Args:
+        table_data: List of records
+        record_id: ID to find
+
+    Returns:
+        Position or None if not found
+    """
+    pos = bisect_left(table_data, record_id, key=lambda record: record["ID"])
+    if pos < len(table_data) and table_data[pos]["ID"] == record_id:
+        return pos
+
+    for pos, record in enumerate(table_data):
+        if record["ID"] == record_id:
+            return pos
+    return None
+
+
+def find_record(table_data, record_id):
+    """
+    Find record by ID.
+
+    Args:
+        table_data: List of records
+        record_id: ID to find
+
+    Returns:
+        Record or None if not found
+    """
+    pos = find_position(table_data, record_id)
+    return table_data[pos] if pos is not None else None
+
+
+def _check_comparable(value, other):
+    # Strings and numbers can not be ordered against each other
+    if isinstance(value, str) != isinstance(other, str):
+        raise ValueError(ERROR_INDEX_VALUE.format(value=value))
+
+
+def sorted_range(index, low=None, high=None):
+    """
+    Get bounds of a value range in a sorted index.
+
+    Args:
+        index: Sorted index
+        low: Pair (value, inclusive) for the lower bound or None
+        high: Pair (value, inclusive) for the upper bound or None
+
+    Returns:
+        Pair (start, stop) of positions in the index lists
+
+    Raises:
+        ValueError: If a bound can not be compared with the index values
+    """
+    keys = index["keys"]
+    start, stop = 0, len(keys)
+    if keys:
+        for bound in (low, high):
+            if bound is not None:
+                _check_comparable(bound[0], keys[0])
+    if low is not None:
+        value, inclusive = low
+        start = (bisect_left if inclusive else bisect_right)(keys, value)
+    if high is not None:
+        value, inclusive = high
+        stop = (bisect_right if inclusive else bisect_left)(keys, value)
+    return start, max(start, stop)
+
+
+def _sorted_ids(index, values):
+    ids = []
+    for value in values:
+        start, stop = sorted_range(index, (value, True), (value, True))
+        ids.extend(index["ids"][start:stop])
+    return ids
+
+
+def _tighter_low(low, bound):
+    # At equal values an exclusive bound (>) is tighter than >=
+    if low is None or (bound[0], not bound[1]) > (low[0], not low[1]):
+        return bound
+    return low
+
+
+def _tighter_high(high, bound):
+    if high is None or (bound[0], bound[1]) < (high[0], high[1]):
+        return bound
+    return high
+
+
+def range_bounds(where_clause, column):
+    """
+    Collect range and equality conditions on a column from the top level
+    AND chain.
+
+    Args:
+        where_clause: Condition tree or None
+        column: Column name
+
+    Returns:
+        Pair (low, high) of bounds for sorted_range(), None if there are
+        no such conditions on the column
+
+    Raises:
+        ValueError: If the values of the conditions can not be compared
+            with each other
+    """
+    low = high = None
+    found = False
+    for node in conjuncts(where_clause):
+        if node[0] != "cmp" or node[2] != column or node[1] == "!=":
+            continue
+        op, value = node[1], node[3]
+        if found:
+            _check_comparable(value, (low or high)[0])
+        found = True
+        bound = (value, op in ("=", "<=", ">="))
+        if op in ("=", ">", ">="):
+            low = _tighter_low(low, bound)
+        if op in ("=", "<", "<="):
+            high = _tighter_high(high, bound)
+    return (low, high) if found else None
+
+
+def _records(table_data, ids):
+    records = (find_record(table_data, record_id) for record_id in ids)
+    return [record for record in records if record is not None]
+
+
+def lookup_equal(indexes, table_data, where_clause):
+    """
+    Find candidate records for equality and IN conditions using indexes.
+
+    Args:
+        indexes: Dictionary of indexes
+        table_data: List of records
+        where_clause: Condition tree
+
+    Returns:
+        List of candidate records in table order or None if no index can
+        be used
+    """
+    if not indexes or not where_clause:
+        return None
+
+    for node in conjuncts(where_clause):
+        if node[0] == "cmp" and node[1] == "=":
+            column, values = node[2], [node[3]]
+        elif node[0] == "in":
+            column, values = node[1], list(node[2])
+        else:
+            continue
+        if column not in indexes:
+            continue
+        index = indexes[column]
+        if is_sorted(index):
+            ids = _sorted_ids(index, values)
+        else:
+            ids = []
+            for value in values:
+                ids.extend(index.get(index_key(value), []))
+        return _records(table_data, sorted(set(ids)))
+
+    return None
+
+
+def lookup(indexes, table_data, where_clause):
+    """
+    Find candidate records for WHERE clause using indexes.
+
+    Equality and IN conditions in the top level AND chain are answered by
+    any index, range conditions by a sorted index. The full condition
+    still has to be checked on the candidates.
+
+    Args:
+        indexes: Dictionary of indexes
+        table_data: List of records
+        where_clause: Condition tree
+
+    Returns:
+        List of candidate records in table order or None if no index can
+        be used
+    """
+    candidates = lookup_equal(indexes, table_data, where_clause)
+    if candidates is not None or not indexes or not where_clause:
+        return candidates
+
+    for column, index in indexes.items():
+        if not is_sorted(index):
+            continue
+        bounds = range_bounds(where_clause, column)
+        if bounds is not None:
+            start, stop = sorted_range(index, *bounds)
+            return _records(table_data, sorted(index["ids"][start:stop]))
+
+    return None
+
+
+def ordered_ids(index, where_clause, column, descending=False):
+    """
+    Iterate record IDs in the order of a sorted index.
+
+    Range conditions on the same column limit the part of the index
+    that is walked.
+
+    Args:
+        index: Sorted index
+        where_clause: Condition tree or None
+        column: Indexed column
+        descending: Walk from the largest value if True
+
+    Yields:
+        Record IDs ordered by (value, ID), reversed if descending
+    """
+    bounds = range_bounds(where_clause, column) or (None, None)
+    start, stop = sorted_range(index, *bounds)
+    ids = index["ids"]
+    positions = range(stop - 1, start - 1, -1) if descending else range(start, stop)
+    for pos in positions:
+        yield ids[pos]
@@ -0,0 +1,107 @@
+"""Readers for bulk loading CSV and JSON Lines files."""
+
+import csv
+import json
+
+from src.primitive_db.constants import ERROR_LOAD_FORMAT, ERROR_LOAD_ROW
+
+
+def read_csv_rows(filepath, column_names):
+    """
+    Stream rows of a CSV file.
+
+    If the first line contains all column names it is treated as a header
+    and values are matched by name (an ID column is ignored). Otherwise
+    values are taken in column order.
+
+    Args:
+        filepath: Path to CSV file
+        column_names: Names of table columns without ID
+
+    Yields:
+        Pairs (line number, list of raw string values in column order);
+        a row spanning several lines gets the number of its last line
+    """
+    with open(filepath, "r", encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        first = next(reader, None)
+        if first is None:
+            return
+
+        header = [name.strip() for name in first]
+        if set(column_names) <= set(header):
+            positions = [header.index(name) for name in column_names]
+            if positions == list(range(len(header))):
+                yield from ((reader.line_num, row) for row in reader if row)
+                return
+            for row in reader:
+                if not row:
+                    continue
+                try:
+                    yield reader.line_num, [row[pos] for pos in positions]
+                except IndexError:
+                    raise ValueError(
+                        ERROR_LOAD_ROW.format(line=reader.line_num, row=row)
+                    ) from None
+        else:
+            yield reader.line_num, first
+            for row in reader:
+                if row:
+                    yield reader.line_num, row
+
+
+def read_jsonl_rows(filepath, column_names):
+    """
+    Stream rows of a JSON Lines file.
+
+    Each line is either an object keyed by column names or an array of
+    values in column order.
+
+    Args:
+        filepath: Path to JSON Lines file
+        column_names: Names of table columns without ID
+
+    Yields:
+        Pairs (line number, list of values in column order)
+    """
+    with open(filepath, "r", encoding="utf-8") as f:
+        for line_num, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError:
+                raise ValueError(
+                    ERROR_LOAD_ROW.format(line=line_num, row=line)
+                ) from None
+            if isinstance(item, dict):
+                try:
+                    yield line_num, [item[name] for name in column_names]
+                except KeyError:
+                    raise ValueError(
+                        ERROR_LOAD_ROW.format(line=line_num, row=line)
+                    ) from None
+            elif isinstance(item, list):
+                yield line_num, item
+            else:
+                raise ValueError(ERROR_LOAD_ROW.format(line=line_num, row=line))
+
+
+def read_rows(filepath, column_names):
+    """
+    Stream rows of a CSV or JSON Lines file chosen by extension.
+
+    Args:
+        filepath: Path to .csv, .jsonl or .ndjson file
+        column_names: Names of table columns without ID
+
+    Returns:
+        Iterator of pairs (line number, list of values in column order)
+    """
+    lower = filepath.lower()
+    if lower.endswith(".csv"):
+        return read_csv_rows(filepath, column_names)
+    if lower.endswith((".jsonl", ".ndjson")):
+        return read_jsonl_rows(filepath, column_names)
+    raise ValueError(ERROR_LOAD_FORMAT.format(filepath=filepath))
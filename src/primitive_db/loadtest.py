@@ -0,0 +1,103 @@
+"""Load test of the query server.
+
+Usage:
+    python -m src.primitive_db.loadtest --clients 8 --requests 200 \\
+        --command "select count(*) from users"
+
+Opens the given number of connections to a running server, sends the
+commands from each of them in turn as fast as replies come back and
+prints throughput and latency percentiles.
+"""
+
+import argparse
+import asyncio
+import time
+
+from src.primitive_db.constants import SERVER_HOST, SERVER_LINE_LIMIT, SERVER_PORT
+from src.primitive_db.protocol import decode_line
+
+
+async def _client(host, port, commands, requests, latencies):
+    reader, writer = await asyncio.open_connection(
+        host, port, limit=SERVER_LINE_LIMIT
+    )
+    try:
+        for number in range(requests):
+            command = commands[number % len(commands)]
+            start = time.perf_counter()
+            writer.write(command.encode("utf-8") + b"\n")
+            await writer.drain()
+            while decode_line(await reader.readline()) is not None:
+                pass
+            latencies.append(time.perf_counter() - start)
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+
+async def run_load(host, port, clients, requests, commands):
+    """
+    Send commands from concurrent connections.
+
+    Args:
+        host: Server address
+        port: Server port
+        clients: Number of connections
+        requests: Number of commands sent by each connection
+        commands: Commands sent in turn
+
+    Returns:
+        Dictionary with elapsed seconds and sorted latencies
+    """
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(
+            _client(host, port, commands, requests, latencies)
+            for _ in range(clients)
+        )
+    )
+    return {"elapsed": time.perf_counter() - start, "latencies": sorted(latencies)}
+
+
+def _percentile(values, share):
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+def main(argv=None):
+    """
+    Run the load test and print its results.
+
+    Args:
+        argv: List of arguments or None for sys.argv
+    """
+    parser = argparse.ArgumentParser(description="Нагрузочный тест сервера.")
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument(
+        "--command",
+        action="append",
+        required=True,
+        help="команда для отправки (можно указать несколько раз)",
+    )
+    args = parser.parse_args(argv)
+
+    result = asyncio.run(
+        run_load(args.host, args.port, args.clients, args.requests, args.command)
+    )
+    latencies = result["latencies"]
+    total = len(latencies)
+    print(f"Клиентов: {args.clients}, запросов: {total}")
+    print(f"Время: {result['elapsed']:.3f} с, {total / result['elapsed']:.1f} запр/с")
+    print(
+        "Задержка, мс: "
+        f"p50 {_percentile(latencies, 0.5) * 1000:.2f}, "
+        f"p95 {_percentile(latencies, 0.95) * 1000:.2f}, "
+        f"max {latencies[-1] * 1000:.2f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
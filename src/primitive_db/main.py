@@ -1,14 +1,97 @@
 #!/usr/bin/env python3
 """Main entry point for the primitive database application."""
 
-from src.primitive_db.engine import run
+import argparse
+import sys
 
+from src.primitive_db.constants import SERVER_HOST, SERVER_PORT
+from src.primitive_db.engine import run, script_lines, settings
 
-def main():
-    """Run the main application."""
-    run()
+
+def parse_args(argv=None):
+    """
+    Parse command line arguments.
+
+    Args:
+        argv: List of arguments or None for sys.argv
+
+    Returns:
+        Parsed arguments namespace
+    """
+    parser = argparse.ArgumentParser(
+        prog="project",
+        description="Примитивная база данных.",
+    )
+    parser.add_argument(
+        "mode",
+        nargs="?",
+        choices=["serve"],
+        help="serve - запустить сервер для клиентов по TCP",
+    )
+    parser.add_argument("--host", default=SERVER_HOST, help="адрес сервера")
+    parser.add_argument("--port", type=int, default=SERVER_PORT, help="порт сервера")
+    parser.add_argument(
+        "-c",
+        "--command",
+        help="выполнить одну команду и выйти",
+    )
+    parser.add_argument(
+        "-f",
+        "--file",
+        help="выполнить команды из файла (по одной в строке) и выйти",
+    )
+    parser.add_argument(
+        "--metrics-file",
+        help="записывать метрики в этот файл в текстовом формате Prometheus",
+    )
+    parser.add_argument(
+        "--profile",
+        choices=["cpu", "memory"],
+        help="профилировать выполнение команд (cProfile или tracemalloc)",
+    )
+    parser.add_argument(
+        "-y",
+        "--yes",
+        action="store_true",
+        help="не спрашивать подтверждение удаления",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """
+    Run the main application.
+
+    "project serve" runs the query server. Otherwise the command given
+    with -c is run, or commands are read from --file, from standard input
+    when it is not a terminal (a pipe or a redirected file), or
+    interactively.
+
+    Args:
+        argv: List of arguments or None for sys.argv
+    """
+    args = parse_args(argv)
+    settings["metrics_file"] = args.metrics_file
+    if args.mode == "serve":
+        # asyncio and the thread pool are only needed by the server
+        from src.primitive_db.server import serve
+
+        serve(args.host, args.port)
+    elif args.command is not None:
+        run(script_lines([args.command]), assume_yes=args.yes, profile=args.profile)
+    elif args.file:
+        with open(args.file, "r", encoding="utf-8") as f:
+            run(script_lines(f), assume_yes=args.yes, profile=args.profile)
+    elif not sys.stdin.isatty():
+        # readline keeps confirmation answers in the same stream
+        run(
+            script_lines(iter(sys.stdin.readline, "")),
+            assume_yes=args.yes,
+            profile=args.profile,
+        )
+    else:
+        run(assume_yes=args.yes, profile=args.profile)
 
 
 if __name__ == "__main__":
     main()
-
@@ -0,0 +1,269 @@
+"""Registry of runtime metrics and an opt-in profiler.
+
+Operations decorated with log_time record their latency in histograms
+with fixed buckets; other modules add to counters (records scanned and
+returned, bytes read and written). The registry is process-wide and
+can be shared by threads. With METRICS_MODE off (or enable(False))
+every call returns right after checking a flag.
+
+The collected values are shown by the stats command and can be written
+as a Prometheus text exposition file.
+"""
+
+import os
+import sys
+import threading
+from bisect import bisect_left
+
+from src.primitive_db.constants import (
+    LATENCY_BUCKETS,
+    METRICS_MODE,
+    METRICS_PREFIX,
+    PROFILE_LIMIT,
+)
+
+enabled = METRICS_MODE
+
+_lock = threading.Lock()
+_histograms = {}
+_counters = {}
+
+
+def enable(flag=True):
+    """
+    Turn collection on or off.
+
+    Args:
+        flag: Collect metrics if True
+    """
+    global enabled
+    enabled = flag
+
+
+def observe(name, seconds):
+    """
+    Record latency of one call of an operation.
+
+    Args:
+        name: Operation name like "select"
+        seconds: Duration of the call
+    """
+    if not enabled:
+        return
+    bucket = bisect_left(LATENCY_BUCKETS, seconds)
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = {
+                "buckets": [0] * (len(LATENCY_BUCKETS) + 1),
+                "count": 0,
+                "sum": 0.0,
+                "max": 0.0,
+            }
+        histogram["buckets"][bucket] += 1
+        histogram["count"] += 1
+        histogram["sum"] += seconds
+        if seconds > histogram["max"]:
+            histogram["max"] = seconds
+
+
+def add(name, amount=1):
+    """
+    Add to a counter.
+
+    Args:
+        name: Counter name like "rows_scanned"
+        amount: Value to add
+    """
+    if not enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+def reset():
+    """Drop all collected values."""
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+
+
+def snapshot():
+    """
+    Copy collected values.
+
+    Returns:
+        Dictionary {'histograms': {...}, 'counters': {...}}
+    """
+    with _lock:
+        return {
+            "histograms": {
+                name: dict(histogram, buckets=list(histogram["buckets"]))
+                for name, histogram in _histograms.items()
+            },
+            "counters": dict(_counters),
+        }
+
+
+def quantile(histogram, share):
+    """
+    Estimate a latency quantile from histogram buckets.
+
+    Args:
+        histogram: Histogram from snapshot()
+        share: Quantile like 0.99
+
+    Returns:
+        Upper bound of the bucket holding the quantile, or the maximum
+        seen for the last bucket
+    """
+    rank = share * histogram["count"]
+    seen = 0
+    for bound, count in zip(LATENCY_BUCKETS, histogram["buckets"]):
+        seen += count
+        if seen >= rank:
+            return min(bound, histogram["max"])
+    return histogram["max"]
+
+
+def stats_lines(extra=None):
+    """
+    Describe collected values for the stats command.
+
+    Args:
+        extra: Additional counters (e.g. cache statistics) or None
+
+    Returns:
+        List of text lines
+    """
+    data = snapshot()
+    lines = []
+    for name, histogram in sorted(data["histograms"].items()):
+        count = histogram["count"]
+        lines.append(
+            f"{name}: вызовов {count}, "
+            f"среднее {histogram['sum'] / count * 1000:.3f} мс, "
+            f"p50 <= {quantile(histogram, 0.5) * 1000:.3f} мс, "
+            f"p99 <= {quantile(histogram, 0.99) * 1000:.3f} мс, "
+            f"макс {histogram['max'] * 1000:.3f} мс"
+        )
+    counters = {**data["counters"], **(extra or {})}
+    lines.extend(f"{name}: {value}" for name, value in sorted(counters.items()))
+    return lines
+
+
+def prometheus_text(extra=None):
+    """
+    Render collected values in the Prometheus text format.
+
+    Args:
+        extra: Additional counters (e.g. cache statistics) or None
+
+    Returns:
+        Text of the exposition
+    """
+    data = snapshot()
+    name = f"{METRICS_PREFIX}_operation_seconds"
+    lines = [
+        f"# HELP {name} Latency of database operations.",
+        f"# TYPE {name} histogram",
+    ]
+    for operation, histogram in sorted(data["histograms"].items()):
+        label = f'operation="{operation}"'
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS, histogram["buckets"]):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{label},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{label},le="+Inf"}} {histogram["count"]}')
+        lines.append(f"{name}_sum{{{label}}} {histogram['sum']}")
+        lines.append(f"{name}_count{{{label}}} {histogram['count']}")
+
+    counters = {**data["counters"], **(extra or {})}
+    for counter, value in sorted(counters.items()):
+        metric = f"{METRICS_PREFIX}_{counter}_total"
+        lines.append(f"# TYPE {metric} counter")
+        lines.append(f"{metric} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(filepath, extra=None):
+    """
+    Write the Prometheus text exposition to a file atomically.
+
+    Args:
+        filepath: Path to the file
+        extra: Additional counters or None
+    """
+    tmp = filepath + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(prometheus_text(extra))
+    os.replace(tmp, filepath)
+
+
+class Profiler:
+    """
+    Opt-in profiler enabled around each executed command.
+
+    "cpu" collects call statistics with cProfile, "memory" traces
+    allocations with tracemalloc from the first command on. The
+    profiling modules are imported only when a profiler is created.
+    """
+
+    def __init__(self, kind, limit=PROFILE_LIMIT):
+        """
+        Create a profiler.
+
+        Args:
+            kind: "cpu" or "memory"
+            limit: Number of entries in the report
+        """
+        self.kind = kind
+        self.limit = limit
+        self._profile = None
+        if kind == "cpu":
+            import cProfile
+
+            self._profile = cProfile.Profile()
+
+    def enable(self):
+        """Start collecting."""
+        if self._profile is not None:
+            self._profile.enable()
+            return
+        import tracemalloc
+
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def disable(self):
+        """Pause collecting."""
+        if self._profile is not None:
+            self._profile.disable()
+
+    def report(self, stream=None):
+        """
+        Print the collected profile.
+
+        Args:
+            stream: Output stream, standard error if None
+        """
+        stream = stream or sys.stderr
+        if self._profile is not None:
+            import pstats
+
+            stats = pstats.Stats(self._profile, stream=stream)
+            stats.sort_stats("cumulative").print_stats(self.limit)
+            return
+        import tracemalloc
+
+        if not tracemalloc.is_tracing():
+            return
+        current, peak = tracemalloc.get_traced_memory()
+        top = tracemalloc.take_snapshot().statistics("lineno")[: self.limit]
+        tracemalloc.stop()
+        print(
+            f"Память: сейчас {current / 1024:.1f} КБ, пик {peak / 1024:.1f} КБ",
+            file=stream,
+        )
+        for statistic in top:
+            print(statistic, file=stream)
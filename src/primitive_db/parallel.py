@@ -0,0 +1,149 @@
+"""Parallel scans of segmented tables over a process pool.
+
+A table opened from segment files (see segments.py) is scanned by
+sending each segment path to a worker process, which maps the file,
+compiles the condition itself and evaluates it (or the aggregates) over
+its records. Only the condition and the small results travel between
+processes: positions of matching records or aggregate states, which the
+main process merges in segment order.
+
+Scans of tables with fewer than PARALLEL_MIN_ROWS records, or with a
+single worker, stay in the main process.
+"""
+
+import os
+from itertools import islice
+
+from src.primitive_db import metrics
+from src.primitive_db.aggregate import compile_aggregates, merge_groups
+from src.primitive_db.columnar import MappedTable
+from src.primitive_db.constants import PARALLEL_MIN_ROWS, SCAN_WORKERS
+from src.primitive_db.query import compile_where, record_class
+
+_executor = None
+
+
+def scan_workers():
+    """
+    Get number of worker processes for parallel scans.
+
+    Returns:
+        SCAN_WORKERS or the number of CPUs if it is 0
+    """
+    return SCAN_WORKERS or os.cpu_count() or 1
+
+
+def _pool():
+    global _executor
+    if _executor is None:
+        # Imported here: multiprocessing is only needed by large scans
+        from concurrent.futures import ProcessPoolExecutor
+
+        _executor = ProcessPoolExecutor(max_workers=scan_workers())
+    return _executor
+
+
+def can_scan(table_data):
+    """
+    Check whether a scan of a table is worth spreading across processes.
+
+    Args:
+        table_data: Table data
+
+    Returns:
+        True for segmented tables of at least PARALLEL_MIN_ROWS records
+        with more than one segment and more than one worker
+    """
+    files = getattr(table_data, "segment_files", None)
+    return (
+        files is not None
+        and len(files) > 1
+        and len(table_data) >= PARALLEL_MIN_ROWS
+        and scan_workers() > 1
+    )
+
+
+def _live_records(path, deleted):
+    """Records of a segment without tombstoned ones."""
+    records = MappedTable(path)
+    if not deleted:
+        return records, record_class(records)
+    dead = set(deleted)
+    live = (record for pos, record in enumerate(records) if pos not in dead)
+    return live, record_class(records)
+
+
+def _match_segment(path, deleted, where_clause, stop):
+    records, row_class = _live_records(path, deleted)
+    predicate = compile_where(where_clause, row_class)
+    matches = (pos for pos, record in enumerate(records) if predicate(record))
+    positions = list(islice(matches, stop))
+    # The scan ends at the last match once stop matches are found
+    if stop is not None and len(positions) == stop:
+        return positions, positions[-1] + 1 if positions else 0
+    return positions, len(records)
+
+
+def _aggregate_segment(path, deleted, aggregates, where_clause, group_by):
+    records, row_class = _live_records(path, deleted)
+    run = compile_aggregates(aggregates, group_by, row_class)
+    if where_clause is None:
+        return run(records)
+    return run(filter(compile_where(where_clause, row_class), records))
+
+
+def matching_positions(table_data, where_clause, stop=None):
+    """
+    Find positions of records matching a condition in parallel.
+
+    Args:
+        table_data: Segmented table (see can_scan())
+        where_clause: Condition tree
+        stop: Number of first matches needed or None for all
+
+    Returns:
+        List of positions in ascending order
+    """
+    futures = [
+        _pool().submit(_match_segment, path, deleted, where_clause, stop)
+        for path, _, deleted in table_data.segment_files
+    ]
+    positions = []
+    scanned = 0
+    for (_, first, _), future in zip(table_data.segment_files, futures):
+        segment_positions, segment_scanned = future.result()
+        positions.extend(first + pos for pos in segment_positions)
+        scanned += segment_scanned
+        if stop is not None and len(positions) >= stop:
+            for pending in futures:
+                pending.cancel()
+            metrics.add("rows_scanned", scanned)
+            return positions[:stop]
+    metrics.add("rows_scanned", scanned)
+    return positions
+
+
+def aggregate_groups(table_data, aggregates, where_clause, group_by):
+    """
+    Compute aggregates over a table in parallel.
+
+    Args:
+        table_data: Segmented table (see can_scan())
+        aggregates: List of (func, column) pairs
+        where_clause: Condition tree or None
+        group_by: Column to group by or None
+
+    Returns:
+        Dictionary from group key to state list, like the function made
+        by aggregate.compile_aggregates() returns
+    """
+    futures = [
+        _pool().submit(
+            _aggregate_segment, path, deleted, aggregates, where_clause, group_by
+        )
+        for path, _, deleted in table_data.segment_files
+    ]
+    groups = {}
+    for future in futures:
+        merge_groups(aggregates, groups, future.result())
+    return groups
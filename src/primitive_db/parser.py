@@ -1,43 +1,329 @@
 """Parser for SQL-like commands."""
 
+import re
+
+from src.primitive_db.constants import (
+    AGGREGATE_FUNCTIONS,
+    ERROR_LIKE_PATTERN,
+    ERROR_QUERY_END,
+    ERROR_QUERY_SYNTAX,
+)
+
+TOKEN_RE = re.compile(
+    r"""\s*(?:
+        (?P<str>"[^"]*"|'[^']*')
+        | (?P<op><=|>=|!=|<>|=|<|>)
+        | (?P<punct>[(),])
+        | (?P<word>[^\s(),=<>!'"]+)
+    )""",
+    re.VERBOSE,
+)
+NUMBER_RE = re.compile(r"-?\d+")
+
+# insert into <table> values (...)
+INSERT_RE = re.compile(
+    r"\s*insert\s+into\s+(\S+)\s+values\b(.*)", re.IGNORECASE | re.DOTALL
+)
+# prepare <name> as <statement>
+PREPARE_RE = re.compile(r"\s*prepare\s+(\S+)\s+as\s+(.+)", re.IGNORECASE | re.DOTALL)
+# execute <name> [(<value1>, <value2>, ...)]
+EXECUTE_RE = re.compile(
+    r"\s*execute\s+([^\s(]+)\s*(\(.*\))?\s*$", re.IGNORECASE | re.DOTALL
+)
+
+# Comparison operators and their canonical form
+OPERATORS = {
+    "=": "=",
+    "!=": "!=",
+    "<>": "!=",
+    "<": "<",
+    "<=": "<=",
+    ">": ">",
+    ">=": ">=",
+}
+
+# Words with special meaning inside a WHERE clause
+CONDITION_WORDS = {"and", "or", "not", "in", "like"}
+
+# Keywords that split select, update and aggregate commands into clauses
+SELECT_CLAUSES = {"where", "order", "limit", "offset"}
+UPDATE_CLAUSES = {"set", "where"}
+AGGREGATE_CLAUSES = {"where", "group"}
+
+# Parts of a VALUES list: quoted strings, commas and everything else
+VALUE_PART_RE = re.compile(r""""[^"]*"?|'[^']*'?|,|[^,"']+""")
+
+# Parts of a list of rows: quoted strings, parentheses, commas and the rest
+ROW_PART_RE = re.compile(r""""[^"]*"?|'[^']*'?|[(),]|[^(),"']+""")
+
+# Plan of a statement that could not be parsed
+INVALID_PLAN = {"op": "invalid", "params": 0}
+
+
+class Param:
+    """Placeholder "?" of a prepared statement."""
+
+    __slots__ = ("index",)
+
+    def __init__(self, index):
+        """
+        Create a placeholder.
+
+        Args:
+            index: Position of the placeholder in the statement, from 0
+        """
+        self.index = index
+
+    def __repr__(self):
+        return f"?{self.index + 1}"
+
+
+def tokenize(text, params=False):
+    """
+    Split a command into tokens.
+
+    Args:
+        text: String like "age >= 28 and name = 'Sergei'"
+        params: Turn unquoted "?" into placeholders of kind "param"
+
+    Returns:
+        List of (kind, value) pairs where kind is "str", "number", "name",
+        "op" or "punct", like [('name', 'age'), ('op', '>='), ('number', 28)]
+    """
+    tokens = []
+    placeholders = 0
+    pos = 0
+    text = text.rstrip()
+    while pos < len(text):
+        match = TOKEN_RE.match(text, pos)
+        if match is None:
+            raise ValueError(ERROR_QUERY_SYNTAX.format(token=text[pos:].strip()))
+        pos = match.end()
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == "str":
+            value = value[1:-1]
+        elif kind == "word":
+            if NUMBER_RE.fullmatch(value):
+                kind, value = "number", int(value)
+            elif params and value == "?":
+                kind, value = "param", Param(placeholders)
+                placeholders += 1
+            else:
+                kind = "name"
+        tokens.append((kind, value))
+    return tokens
+
+
+def table_word(word):
+    """
+    Get the table name written as one word of a command.
+
+    Quotes are removed as in the tokens of a statement, so "users" and
+    users name the same table.
+
+    Args:
+        word: Word like 'users' or '"users"'
+
+    Returns:
+        Table name
+    """
+    try:
+        tokens = tokenize(word)
+    except ValueError:
+        return word
+    return str(tokens[0][1]) if tokens else word
+
+
+def _is_word(token, word):
+    return token[0] == "name" and token[1].lower() == word
+
+
+def _token_text(token):
+    kind, value = token
+    return f'"{value}"' if kind == "str" else str(value)
+
+
+def _syntax_error(token):
+    return ValueError(ERROR_QUERY_SYNTAX.format(token=_token_text(token)))
+
+
+def _expect(tokens, pos):
+    if pos >= len(tokens):
+        raise ValueError(ERROR_QUERY_END)
+    return tokens[pos]
+
+
+def _literal(token):
+    """Convert a value token into a Python value."""
+    kind, value = token
+    if kind == "name":
+        if value.lower() in CONDITION_WORDS:
+            raise ValueError(ERROR_QUERY_SYNTAX.format(token=value))
+        lowered = value.lower()
+        if lowered == "true":
+            return True
+        if lowered == "false":
+            return False
+        # Unquoted words are strings, as in: where name = Sergei
+        return value
+    if kind in ("str", "number", "param"):
+        return value
+    raise _syntax_error(token)
+
+
+def _parse_condition(tokens, pos):
+    token = _expect(tokens, pos)
+    if token[0] != "name" or token[1].lower() in CONDITION_WORDS:
+        raise _syntax_error(token)
+    column = token[1]
+    pos += 1
+
+    negate = False
+    token = _expect(tokens, pos)
+    if _is_word(token, "not"):
+        negate = True
+        pos += 1
+        token = _expect(tokens, pos)
+
+    if _is_word(token, "in"):
+        pos += 1
+        if _expect(tokens, pos) != ("punct", "("):
+            raise _syntax_error(tokens[pos])
+        values = []
+        while True:
+            pos += 1
+            values.append(_literal(_expect(tokens, pos)))
+            pos += 1
+            token = _expect(tokens, pos)
+            if token == ("punct", ")"):
+                break
+            if token != ("punct", ","):
+                raise _syntax_error(token)
+        node = ("in", column, tuple(values))
+    elif _is_word(token, "like"):
+        pattern = _expect(tokens, pos + 1)
+        if pattern[0] != "str":
+            raise ValueError(ERROR_LIKE_PATTERN)
+        node = ("like", column, pattern[1])
+    elif token[0] == "op" and not negate:
+        value = _literal(_expect(tokens, pos + 1))
+        node = ("cmp", OPERATORS[token[1]], column, value)
+    else:
+        raise _syntax_error(token)
+
+    pos += 1 if node[0] == "in" else 2
+    return (("not", node) if negate else node), pos
+
+
+def _parse_primary(tokens, pos):
+    token = _expect(tokens, pos)
+    if _is_word(token, "not"):
+        node, pos = _parse_primary(tokens, pos + 1)
+        return ("not", node), pos
+    if token == ("punct", "("):
+        node, pos = _parse_or(tokens, pos + 1)
+        token = _expect(tokens, pos)
+        if token != ("punct", ")"):
+            raise _syntax_error(token)
+        return node, pos + 1
+    return _parse_condition(tokens, pos)
+
+
+def _parse_and(tokens, pos):
+    nodes = []
+    while True:
+        node, pos = _parse_primary(tokens, pos)
+        nodes.append(node)
+        if pos < len(tokens) and _is_word(tokens[pos], "and"):
+            pos += 1
+        else:
+            break
+    return (nodes[0] if len(nodes) == 1 else ("and", *nodes)), pos
+
+
+def _parse_or(tokens, pos):
+    nodes = []
+    while True:
+        node, pos = _parse_and(tokens, pos)
+        nodes.append(node)
+        if pos < len(tokens) and _is_word(tokens[pos], "or"):
+            pos += 1
+        else:
+            break
+    return (nodes[0] if len(nodes) == 1 else ("or", *nodes)), pos
+
+
+def parse_where(tokens):
+    """
+    Parse tokens of a WHERE clause into a condition tree.
+
+    Supported: comparisons (=, !=, <>, <, <=, >, >=), [NOT] IN (...),
+    [NOT] LIKE with % and _ wildcards, AND, OR, NOT and parentheses.
+    AND binds tighter than OR.
+
+    Args:
+        tokens: Result of tokenize()
+
+    Returns:
+        Condition tree made of tuples:
+        ('cmp', op, column, value), ('in', column, values),
+        ('like', column, pattern), ('not', node), ('and', *nodes),
+        ('or', *nodes)
+    """
+    node, pos = _parse_or(tokens, 0)
+    if pos != len(tokens):
+        raise _syntax_error(tokens[pos])
+    return node
+
 
 def parse_where_clause(where_str):
     """
-    Parse WHERE clause into dictionary.
+    Parse WHERE clause into condition tree.
 
     Args:
-        where_str: String like "age = 28" or "name = \"Sergei\""
+        where_str: String like "age > 28 and name != 'Sergei'"
 
     Returns:
-        Dictionary like {'age': 28} or {'name': 'Sergei'}
+        Condition tree (see parse_where) or None if the clause is empty
     """
-    if not where_str:
+    tokens = tokenize(where_str or "")
+    if not tokens:
         return None
+    return parse_where(tokens)
 
-    parts = where_str.split("=", 1)
-    if len(parts) != 2:
-        return None
 
-    column = parts[0].strip()
-    value_str = parts[1].strip()
-
-    # Remove quotes if present
-    if (value_str.startswith('"') and value_str.endswith('"')) or (
-        value_str.startswith("'") and value_str.endswith("'")
-    ):
-        value = value_str[1:-1]
-    elif value_str.lower() == "true":
-        value = True
-    elif value_str.lower() == "false":
-        value = False
-    else:
-        # Try to convert to int
+def parse_set(tokens):
+    """
+    Parse tokens of a SET clause.
+
+    Args:
+        tokens: Tokens like [('name', 'age'), ('op', '='), ('number', 29)],
+            several assignments are separated by commas
+
+    Returns:
+        Dictionary like {'age': 29, 'name': 'Ivan'} or None if invalid
+    """
+    set_clause = {}
+    for start in range(0, len(tokens), 4):
+        assignment = tokens[start : start + 3]
+        if (
+            len(assignment) != 3
+            or assignment[0][0] != "name"
+            or assignment[1] != ("op", "=")
+            or assignment[0][1] in set_clause
+        ):
+            return None
+        separator = tokens[start + 3 : start + 4]
+        if separator and separator[0] != ("punct", ","):
+            return None
+        if separator and start + 4 == len(tokens):
+            return None
         try:
-            value = int(value_str)
+            set_clause[assignment[0][1]] = _literal(assignment[2])
         except ValueError:
-            value = value_str
-
-    return {column: value}
+            return None
+    return set_clause or None
 
 
 def parse_set_clause(set_str):
@@ -45,20 +331,91 @@ def parse_set_clause(set_str):
     Parse SET clause into dictionary.
 
     Args:
-        set_str: String like "age = 29" or "name = \"Ivan\""
+        set_str: String like "age = 29" or "name = \"Ivan\", age = 29"
+
+    Returns:
+        Dictionary like {'age': 29} or {'name': 'Ivan', 'age': 29}
+    """
+    return parse_set(tokenize(set_str))
+
+
+def parse_insert(command, params=False):
+    """
+    Split an insert command into table name and rows of values.
+
+    Args:
+        command: String like 'insert into users values ("Ivan", 28), ("Anna", 31)'
+        params: Turn unquoted "?" values into placeholders
 
     Returns:
-        Dictionary like {'age': 29} or {'name': 'Ivan'}
+        Pair (table name, list of rows) or None if invalid
     """
-    return parse_where_clause(set_str)
+    match = INSERT_RE.match(command)
+    if match is None:
+        return None
+    rows = parse_rows(match.group(2), params)
+    if rows is None:
+        return None
+    return match.group(1), rows
 
 
-def parse_values(values_str):
+def parse_rows(values_str, params=False):
+    """
+    Parse a VALUES clause with one or more parenthesized rows.
+
+    Args:
+        values_str: String like '("Sergei", 28), ("Anna", 31)'
+        params: Turn unquoted "?" values into placeholders, numbered
+            through all rows
+
+    Returns:
+        List of rows like [['Sergei', 28], ['Anna', 31]] or None if the
+        parentheses do not match
+    """
+    values_str = values_str.strip()
+    if not values_str.startswith("("):
+        return [parse_values(values_str, params)]
+
+    bodies = []
+    depth = 0
+    start = 0
+    # Rows must be separated by exactly one comma
+    separated = True
+    for match in ROW_PART_RE.finditer(values_str):
+        piece = match.group()
+        if depth:
+            if piece == "(":
+                depth += 1
+            elif piece == ")":
+                depth -= 1
+                if not depth:
+                    bodies.append(values_str[start : match.start()])
+        elif piece == "(" and separated:
+            depth, start, separated = 1, match.end(), False
+        elif piece == "," and not separated:
+            separated = True
+        elif piece.strip():
+            return None
+    if depth or separated:
+        return None
+
+    rows = [parse_values(body, params) for body in bodies]
+    if params:
+        placeholders = [
+            value for row in rows for value in row if isinstance(value, Param)
+        ]
+        for number, param in enumerate(placeholders):
+            param.index = number
+    return rows
+
+
+def parse_values(values_str, params=False):
     """
     Parse VALUES clause into list.
 
     Args:
         values_str: String like "(\"Sergei\", 28, true)"
+        params: Turn unquoted "?" values into placeholders
 
     Returns:
         List like ['Sergei', 28, True]
@@ -68,31 +425,21 @@ def parse_values(values_str):
     if values_str.startswith("(") and values_str.endswith(")"):
         values_str = values_str[1:-1]
 
-    # Split by comma
+    # Split by commas outside quotes
     parts = []
-    current = ""
-    in_quotes = False
-    quote_char = None
-
-    for char in values_str:
-        if char in ('"', "'") and not in_quotes:
-            in_quotes = True
-            quote_char = char
-        elif char == quote_char and in_quotes:
-            in_quotes = False
-            quote_char = None
-        elif char == "," and not in_quotes:
-            parts.append(current.strip())
-            current = ""
-            continue
-
-        current += char
-
+    current = []
+    for piece in VALUE_PART_RE.findall(values_str):
+        if piece == ",":
+            parts.append("".join(current))
+            current = []
+        else:
+            current.append(piece)
     if current:
-        parts.append(current.strip())
+        parts.append("".join(current))
 
     # Convert values
     result = []
+    placeholders = 0
     for part in parts:
         part = part.strip()
 
@@ -101,6 +448,9 @@ def parse_values(values_str):
             part.startswith("'") and part.endswith("'")
         ):
             result.append(part[1:-1])
+        elif params and part == "?":
+            result.append(Param(placeholders))
+            placeholders += 1
         elif part.lower() == "true":
             result.append(True)
         elif part.lower() == "false":
@@ -114,3 +464,277 @@ def parse_values(values_str):
 
     return result
 
+
+def split_clauses(tokens, keywords):
+    """
+    Split command tokens into clauses.
+
+    Args:
+        tokens: Tokens of the command after the table name
+        keywords: Set of lowercase clause keywords
+
+    Returns:
+        Dictionary mapping keywords to their tokens, like
+        {'where': [('name', 'age'), ('op', '='), ('number', 28)],
+        'limit': [('number', 10)]}
+    """
+    clauses = {}
+    current = None
+    for token in tokens:
+        if token[0] == "name" and token[1].lower() in keywords:
+            current = token[1].lower()
+            clauses[current] = []
+        elif current is not None:
+            clauses[current].append(token)
+    return clauses
+
+
+def parse_count(tokens):
+    """
+    Parse LIMIT/OFFSET value.
+
+    Args:
+        tokens: Tokens of the clause like [('number', 10)]
+
+    Returns:
+        Non-negative integer or False if invalid
+    """
+    if len(tokens) != 1 or tokens[0][0] != "number" or tokens[0][1] < 0:
+        return False
+    return tokens[0][1]
+
+
+def parse_order(tokens):
+    """
+    Parse ORDER BY clause.
+
+    Args:
+        tokens: Tokens of the clause like [('name', 'by'), ('name', 'age'),
+            ('name', 'desc')]
+
+    Returns:
+        Pair (column, descending) or False if invalid
+    """
+    if len(tokens) not in (2, 3) or not _is_word(tokens[0], "by"):
+        return False
+    if tokens[1][0] != "name":
+        return False
+    descending = False
+    if len(tokens) == 3:
+        if _is_word(tokens[2], "desc"):
+            descending = True
+        elif not _is_word(tokens[2], "asc"):
+            return False
+    return tokens[1][1], descending
+
+
+def parse_group(tokens):
+    """
+    Parse GROUP BY clause.
+
+    Args:
+        tokens: Tokens of the clause like [('name', 'by'), ('name', 'age')]
+
+    Returns:
+        Column name or False if invalid
+    """
+    if len(tokens) != 2 or not _is_word(tokens[0], "by") or tokens[1][0] != "name":
+        return False
+    return tokens[1][1]
+
+
+def parse_select_list(tokens):
+    """
+    Parse the list of aggregates between SELECT and FROM.
+
+    Args:
+        tokens: Tokens like those of "age, count(*), avg(score)"
+
+    Returns:
+        List of (function, column) pairs like [(None, 'age'),
+        ('count', None), ('avg', 'score')] or False if invalid
+    """
+    items = []
+    pos = 0
+    while pos < len(tokens):
+        token = tokens[pos]
+        if token[0] != "name":
+            return False
+        func = token[1].lower()
+        if pos + 1 < len(tokens) and tokens[pos + 1] == ("punct", "("):
+            if (
+                func not in AGGREGATE_FUNCTIONS
+                or pos + 3 >= len(tokens)
+                or tokens[pos + 2][0] != "name"
+                or tokens[pos + 3] != ("punct", ")")
+            ):
+                return False
+            column = tokens[pos + 2][1]
+            if column == "*":
+                if func != "count":
+                    return False
+                column = None
+            items.append((func, column))
+            pos += 4
+        else:
+            items.append((None, token[1]))
+            pos += 1
+        if pos < len(tokens):
+            if tokens[pos] != ("punct", ",") or pos + 1 == len(tokens):
+                return False
+            pos += 1
+    return items or False
+
+
+def _count_params(tokens):
+    return sum(1 for token in tokens if token[0] == "param")
+
+
+def _plan_insert(text, params):
+    parsed = parse_insert(text, params)
+    if parsed is None:
+        return INVALID_PLAN
+    table_name, rows = parsed
+    return {
+        "op": "insert",
+        "table": table_word(table_name),
+        "rows": rows,
+        "params": sum(
+            1 for values in rows for value in values if isinstance(value, Param)
+        ),
+    }
+
+
+def _plan_select(tokens):
+    if len(tokens) < 3:
+        return INVALID_PLAN
+
+    clauses = split_clauses(tokens[3:], SELECT_CLAUSES)
+    where_clause = None
+    if "where" in clauses:
+        where_clause = parse_where(clauses["where"])
+    order_by = parse_order(clauses["order"]) if "order" in clauses else None
+    limit = parse_count(clauses["limit"]) if "limit" in clauses else None
+    offset = parse_count(clauses["offset"]) if "offset" in clauses else 0
+
+    if limit is False or offset is False or order_by is False:
+        return INVALID_PLAN
+    return {
+        "op": "select",
+        "table": str(tokens[2][1]),
+        "where": where_clause,
+        "order_by": order_by,
+        "limit": limit,
+        "offset": offset,
+        "params": _count_params(tokens),
+    }
+
+
+def _plan_aggregate(tokens):
+    from_pos = next(
+        (i for i, token in enumerate(tokens) if _is_word(token, "from")), None
+    )
+    aggregates = parse_select_list(tokens[1:from_pos])
+    if from_pos is None or from_pos + 1 >= len(tokens) or not aggregates:
+        return INVALID_PLAN
+
+    clauses = split_clauses(tokens[from_pos + 2 :], AGGREGATE_CLAUSES)
+    where_clause = None
+    if "where" in clauses:
+        where_clause = parse_where(clauses["where"])
+    group_by = parse_group(clauses["group"]) if "group" in clauses else None
+    if group_by is False:
+        return INVALID_PLAN
+    return {
+        "op": "aggregate",
+        "table": str(tokens[from_pos + 1][1]),
+        "aggregates": aggregates,
+        "where": where_clause,
+        "group_by": group_by,
+        "params": _count_params(tokens),
+    }
+
+
+def _plan_update(tokens):
+    clauses = split_clauses(tokens[2:], UPDATE_CLAUSES)
+    if len(tokens) < 2 or "set" not in clauses or "where" not in clauses:
+        return INVALID_PLAN
+
+    set_clause = parse_set(clauses["set"])
+    where_clause = parse_where(clauses["where"])
+    if not set_clause:
+        return INVALID_PLAN
+    return {
+        "op": "update",
+        "table": str(tokens[1][1]),
+        "set": set_clause,
+        "where": where_clause,
+        "params": _count_params(tokens),
+    }
+
+
+def _plan_delete(tokens):
+    clauses = split_clauses(tokens[3:], {"where"})
+    if len(tokens) < 3 or "where" not in clauses:
+        return INVALID_PLAN
+    return {
+        "op": "delete",
+        "table": str(tokens[2][1]),
+        "where": parse_where(clauses["where"]),
+        "params": _count_params(tokens),
+    }
+
+
+def parse_statement(text, params=False):
+    """
+    Parse a data statement into a plan that can be run many times.
+
+    Only the text is looked at, so checks against the metadata (does the
+    table or the column exist) are left to the execution.
+
+    Args:
+        text: Insert, select, update or delete command
+        params: Turn unquoted "?" values into placeholders
+
+    Returns:
+        Plan dictionary with "op" ("insert", "select", "aggregate",
+        "update", "delete" or "invalid"), "table", "params" (number of
+        placeholders) and the parsed clauses, or None if the text is not
+        a data statement
+    """
+    lowered = text.lower()
+    if lowered.startswith("insert into "):
+        return _plan_insert(text, params)
+    if not lowered.startswith(("select ", "update ", "delete from ")):
+        return None
+
+    tokens = tokenize(text, params)
+    if lowered.startswith("select from "):
+        return _plan_select(tokens)
+    if lowered.startswith("select "):
+        return _plan_aggregate(tokens)
+    if lowered.startswith("update "):
+        return _plan_update(tokens)
+    return _plan_delete(tokens)
+
+
+def bind_params(node, args):
+    """
+    Put argument values in place of the placeholders of a plan.
+
+    Args:
+        node: Plan or any part of it
+        args: List of values, one per placeholder
+
+    Returns:
+        Copy of the node with the placeholders replaced
+    """
+    if isinstance(node, Param):
+        return args[node.index]
+    if isinstance(node, tuple):
+        return tuple(bind_params(item, args) for item in node)
+    if isinstance(node, list):
+        return [bind_params(item, args) for item in node]
+    if isinstance(node, dict):
+        return {key: bind_params(value, args) for key, value in node.items()}
+    return node
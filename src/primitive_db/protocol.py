@@ -0,0 +1,47 @@
+"""Line protocol of the query server.
+
+A client sends one command per line (UTF-8). The server answers with
+the output of the command, line by line, followed by a line with a
+single dot. Output lines that start with a dot get one more dot in
+front, so the end marker cannot be confused with output.
+"""
+
+REPLY_END = b".\n"
+
+
+def encode_reply(text):
+    """
+    Frame command output as a reply.
+
+    Args:
+        text: Output of the command
+
+    Returns:
+        Reply bytes ending with the end marker
+    """
+    lines = [
+        "." + line if line.startswith(".") else line for line in text.splitlines()
+    ]
+    payload = "".join(line + "\n" for line in lines).encode("utf-8")
+    return payload + REPLY_END
+
+
+def decode_line(line):
+    """
+    Decode one line of a reply.
+
+    Args:
+        line: Line bytes as read from the connection
+
+    Returns:
+        Output line without the line break, or None for the end marker
+
+    Raises:
+        ConnectionError: If the connection was closed mid-reply
+    """
+    if not line:
+        raise ConnectionError("connection closed")
+    if line == REPLY_END:
+        return None
+    text = line.decode("utf-8").rstrip("\n")
+    return text[1:] if text.startswith(".") else text
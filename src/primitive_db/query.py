@@ -0,0 +1,157 @@
+"""Compilation of WHERE conditions into predicates.
+
+select, update, delete and log replay all evaluate conditions through
+compile_where(). The condition tree produced by parser.parse_where() is
+turned once per command into the source of a single Python function,
+so matching a record costs one call instead of walking the tree.
+"""
+
+import re
+
+from src.primitive_db.constants import ERROR_LIKE_PATTERN, ERROR_QUERY_SYNTAX
+
+# Python operators for comparison nodes
+PY_OPERATORS = {"=": "==", "!=": "!=", "<": "<", "<=": "<=", ">": ">", ">=": ">="}
+
+
+def normalize_where(where_clause):
+    """
+    Convert a legacy {column: value} clause into a condition tree.
+
+    Log files written before conditions were parsed into trees store the
+    WHERE clause as a dictionary of equalities.
+
+    Args:
+        where_clause: Condition tree or dictionary like {'age': 28}
+
+    Returns:
+        Condition tree
+    """
+    if not isinstance(where_clause, dict):
+        return where_clause
+    nodes = [("cmp", "=", column, value) for column, value in where_clause.items()]
+    return nodes[0] if len(nodes) == 1 else ("and", *nodes)
+
+
+def like_regex(pattern):
+    """
+    Translate a LIKE pattern into a regular expression.
+
+    Args:
+        pattern: Pattern with % (any string) and _ (any character)
+
+    Returns:
+        Compiled regular expression matching the whole value
+    """
+    if not isinstance(pattern, str):
+        raise ValueError(ERROR_LIKE_PATTERN)
+    parts = []
+    for char in pattern:
+        if char == "%":
+            parts.append(".*")
+        elif char == "_":
+            parts.append(".")
+        else:
+            parts.append(re.escape(char))
+    return re.compile("".join(parts), re.DOTALL)
+
+
+def accessor(column, row_class):
+    """
+    Build Python expression reading a column of record r.
+
+    Args:
+        column: Column name
+        row_class: Class of the records or None
+
+    Returns:
+        Expression like "r.c2" for generated rows or "r['age']"
+    """
+    slot = getattr(row_class, "_slot_of", {}).get(column)
+    if slot is not None:
+        return f"r.{slot}"
+    return f"r[{column!r}]"
+
+
+def _source(node, row_class, constants):
+    """Build Python expression for a condition node."""
+
+    def constant(value):
+        constants.append(value)
+        return f"_c{len(constants) - 1}"
+
+    kind = node[0]
+    if kind in ("and", "or"):
+        parts = [_source(child, row_class, constants) for child in node[1:]]
+        return "(" + f" {kind} ".join(parts) + ")"
+    if kind == "not":
+        return f"(not {_source(node[1], row_class, constants)})"
+    if kind == "cmp":
+        _, op, column, value = node
+        value_name = constant(value)
+        return f"({accessor(column, row_class)} {PY_OPERATORS[op]} {value_name})"
+    if kind == "in":
+        _, column, values = node
+        return f"({accessor(column, row_class)} in {constant(frozenset(values))})"
+    if kind == "like":
+        _, column, pattern = node
+        match = constant(like_regex(pattern).fullmatch)
+        return f"({match}(str({accessor(column, row_class)})) is not None)"
+    raise ValueError(ERROR_QUERY_SYNTAX.format(token=kind))
+
+
+def compile_where(where_clause, row_class=None):
+    """
+    Compile a WHERE condition into a predicate function.
+
+    Args:
+        where_clause: Condition tree (or legacy dictionary), None matches
+            every record
+        row_class: Class of the records, used to read columns of
+            generated rows directly from their slots
+
+    Returns:
+        Function taking a record and returning True if it matches
+    """
+    if where_clause is None:
+        return lambda record: True
+
+    constants = []
+    expression = _source(normalize_where(where_clause), row_class, constants)
+    scope = {f"_c{i}": value for i, value in enumerate(constants)}
+    exec(f"def predicate(r):\n    return {expression}\n", scope)
+    return scope["predicate"]
+
+
+def record_class(table_data):
+    """
+    Get class of the records of a table.
+
+    Args:
+        table_data: Sequence of records
+
+    Returns:
+        Class of the first record or None if the table is empty
+    """
+    return type(table_data[0]) if len(table_data) else None
+
+
+def conjuncts(where_clause):
+    """
+    Split a condition into the conditions of its top level AND chain.
+
+    Every record matching the whole condition matches each of them, so
+    they can be answered by indexes.
+
+    Args:
+        where_clause: Condition tree or None
+
+    Returns:
+        List of condition nodes
+    """
+    where_clause = normalize_where(where_clause)
+    if where_clause is None:
+        return []
+    if where_clause[0] == "and":
+        return [node for child in where_clause[1:] for node in conjuncts(child)]
+    return [where_clause]
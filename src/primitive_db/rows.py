@@ -0,0 +1,158 @@
+"""Compact schema-driven row representation.
+
+A record stored as a dict keeps a hash table with an entry per column in
+every row. Rows built here use a class generated once per schema with
+__slots__, so a row only holds one pointer per value. Rows keep the
+mapping interface the rest of the code relies on (row["age"],
+row.get(...), "age" in row, dict(row)).
+"""
+
+_row_classes = {}
+
+
+def _rebuild_row(names, values):
+    return row_type(names)(*values)
+
+
+class RowBase:
+    """Common mapping interface of generated row classes."""
+
+    __slots__ = ()
+    _names = ()
+    _slot_of = {}
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, self._slot_of[key])
+        except KeyError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key, value):
+        try:
+            setattr(self, self._slot_of[key], value)
+        except KeyError:
+            raise KeyError(key) from None
+
+    def __contains__(self, key):
+        return key in self._slot_of
+
+    def __iter__(self):
+        return iter(self._names)
+
+    def __len__(self):
+        return len(self._names)
+
+    def __eq__(self, other):
+        if isinstance(other, RowBase):
+            return self._names == other._names and self.values() == other.values()
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(self.to_dict())
+
+    def __reduce__(self):
+        return _rebuild_row, (self._names, self.values())
+
+    def get(self, key, default=None):
+        """
+        Get value of a column.
+
+        Args:
+            key: Column name
+            default: Value returned if there is no such column
+
+        Returns:
+            Column value or default
+        """
+        slot = self._slot_of.get(key)
+        if slot is None:
+            return default
+        return getattr(self, slot)
+
+    def keys(self):
+        """Get column names."""
+        return self._names
+
+    def values(self):
+        """Get values in column order."""
+        return tuple(getattr(self, slot) for slot in self.__slots__)
+
+    def items(self):
+        """Get (column, value) pairs in column order."""
+        return zip(self._names, self.values())
+
+    def to_dict(self):
+        """
+        Convert row to a plain dictionary.
+
+        Returns:
+            Dictionary like {'ID': 1, 'name': 'Sergei'}
+        """
+        return dict(zip(self._names, self.values()))
+
+
+def row_type(names):
+    """
+    Get row class for a list of column names.
+
+    Classes are generated once per schema and cached.
+
+    Args:
+        names: Column names in schema order
+
+    Returns:
+        Row class whose constructor takes values in column order
+    """
+    names = tuple(names)
+    row_class = _row_classes.get(names)
+    if row_class is None:
+        slots = tuple(f"c{i}" for i in range(len(names)))
+        namespace = {
+            "__slots__": slots,
+            "_names": names,
+            "_slot_of": dict(zip(names, slots)),
+        }
+        init_args = ", ".join(slots)
+        init_body = "".join(f"    self.{slot} = {slot}\n" for slot in slots)
+        source = f"def __init__(self, {init_args}):\n{init_body or '    pass'}"
+        scope = {}
+        exec(source, scope)
+        namespace["__init__"] = scope["__init__"]
+        row_class = type("Row", (RowBase,), namespace)
+        _row_classes[names] = row_class
+    return row_class
+
+
+def schema_row_type(columns):
+    """
+    Get row class for column definitions from metadata.
+
+    Args:
+        columns: List of column definitions
+
+    Returns:
+        Row class
+    """
+    return row_type(col["name"] for col in columns)
+
+
+def row_from_dict(row_class, record):
+    """
+    Build a row from a dictionary.
+
+    Missing columns are set to None.
+
+    Args:
+        row_class: Row class or None to keep the dictionary
+        record: Dictionary like {'ID': 1, 'name': 'Sergei'}
+
+    Returns:
+        Row
+    """
+    if row_class is None:
+        return record
+    return row_class(*(record.get(name) for name in row_class._names))
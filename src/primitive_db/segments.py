@@ -0,0 +1,529 @@
+"""Segmented storage: a table as a directory of columnar chunks.
+
+Layout of a table stored in the "segmented" format:
+
+    data/<table>/manifest.json   generation and list of segment files
+    data/<table>/<gen>-<n>.col   up to SEGMENT_ROWS records each, in the
+                                 columnar format (see columnar.py)
+
+Every save writes segment files of a new generation and then the
+manifest, which is the file the write-ahead log checkpoint replaces
+atomically. Segments no longer listed by either the old or the new
+manifest are removed on the next save.
+
+Deleted records are not cut out of the segments: the manifest lists
+their positions per segment (tombstones) and readers skip them. Updated
+records are kept in memory over the segment they belong to, and
+inserted ones after the last segment. Saving such a table writes new
+files only for the segments with updated records and for the last
+segment together with the inserted records; a table that only had
+records deleted gets just a new manifest. Segments are compacted when
+the share of deleted records reaches VACUUM_DEAD_RATIO or on the vacuum
+command.
+
+Segments can be scanned independently, which is what the parallel scan
+executor (see parallel.py) relies on.
+"""
+
+import json
+import os
+import shutil
+from bisect import bisect_left, bisect_right, insort
+from collections.abc import Sequence
+
+from src.primitive_db import columnar
+from src.primitive_db.constants import DATA_DIR, SEGMENT_ROWS, VACUUM_DEAD_RATIO
+
+MANIFEST_FILE = "manifest.json"
+
+
+def segment_dir(table_name):
+    """
+    Build path to the segment directory of a table.
+
+    Args:
+        table_name: Name of the table
+
+    Returns:
+        Path like "data/users"
+    """
+    return f"{DATA_DIR}/{table_name}"
+
+
+def manifest_path(table_name):
+    """
+    Build path to the manifest of a segmented table.
+
+    Args:
+        table_name: Name of the table
+
+    Returns:
+        Path like "data/users/manifest.json"
+    """
+    return f"{segment_dir(table_name)}/{MANIFEST_FILE}"
+
+
+def read_manifest(filepath):
+    """
+    Read a segment manifest.
+
+    Args:
+        filepath: Path to manifest file
+
+    Returns:
+        Manifest dictionary or None if the file does not exist
+    """
+    try:
+        with open(filepath, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def segment_files(table_name):
+    """
+    List segment files of a table in table order.
+
+    Args:
+        table_name: Name of the table
+
+    Returns:
+        List of (path, row count, deleted positions) tuples, empty if the
+        table has no manifest
+    """
+    manifest = read_manifest(manifest_path(table_name))
+    if manifest is None:
+        return []
+    directory = segment_dir(table_name)
+    return [
+        (
+            f"{directory}/{segment['file']}",
+            segment["rows"],
+            segment.get("deleted", []),
+        )
+        for segment in manifest["segments"]
+    ]
+
+
+def load_segments(table_name, table_meta):
+    """
+    Decode all segments of a table.
+
+    Args:
+        table_name: Name of the table
+        table_meta: Metadata of the table
+
+    Returns:
+        List of records or empty list if the table has no manifest
+    """
+    table_data = []
+    for path, _, deleted in segment_files(table_name):
+        with open(path, "rb") as f:
+            records = columnar.decode(f.read())
+        if deleted:
+            dead = set(deleted)
+            records = [
+                record for pos, record in enumerate(records) if pos not in dead
+            ]
+        table_data.extend(records)
+    return table_data
+
+
+def open_segments(table_name, table_meta):
+    """
+    Memory-map all segments of a table.
+
+    Args:
+        table_name: Name of the table
+        table_meta: Metadata of the table
+
+    Returns:
+        SegmentedTable or empty list if the table has no manifest
+    """
+    files = segment_files(table_name)
+    if not files:
+        return []
+    return SegmentedTable(files)
+
+
+def _write_file(filepath, payload, sync):
+    with open(filepath, "wb") as f:
+        f.write(payload)
+        if sync:
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def _needs_compaction(data):
+    dead = data.dead_count
+    return dead and VACUUM_DEAD_RATIO and dead >= VACUUM_DEAD_RATIO * (
+        len(data) + dead
+    )
+
+
+def _write_segments(directory, generation, first_number, records, columns, sync):
+    """Write records as segment files, returning their manifest entries."""
+    segments = []
+    for offset, start in enumerate(range(0, len(records), SEGMENT_ROWS)):
+        chunk = records[start : start + SEGMENT_ROWS]
+        name = f"{generation:06d}-{first_number + offset:05d}.col"
+        payload = columnar.encode(chunk, columns)
+        _write_file(f"{directory}/{name}", payload, sync)
+        segments.append({"file": name, "rows": len(chunk)})
+    return segments
+
+
+def _changed_segments(data, current, directory, columns, sync):
+    """
+    Write the segments of a SegmentedTable that changed in memory.
+
+    Returns:
+        Pair (generation, manifest entries of all segments)
+    """
+    segments = data.manifest_segments()
+    touched = set(data.touched_segments())
+    tail = list(data.tail)
+    if not touched and not tail:
+        return current["generation"], segments
+
+    generation = current["generation"] + 1
+    if tail and segments:
+        # The last segment is filled up before new ones are started
+        last = len(segments) - 1
+        records = data.segment_records(last)
+        if len(records) < SEGMENT_ROWS:
+            tail = records + tail
+            touched.discard(last)
+            segments.pop()
+    for number in sorted(touched):
+        segments[number] = _write_segments(
+            directory, generation, number, data.segment_records(number), columns, sync
+        )[0]
+    segments.extend(
+        _write_segments(directory, generation, len(segments), tail, columns, sync)
+    )
+    return generation, segments
+
+
+def _remove_unused(directory, segments, current):
+    # Segments of the manifest being replaced are still needed until the
+    # new one is in place, everything older can go.
+    keep = {segment["file"] for segment in segments}
+    if current:
+        keep.update(segment["file"] for segment in current["segments"])
+    for name in os.listdir(directory):
+        if name.endswith(".col") and name not in keep:
+            os.remove(f"{directory}/{name}")
+
+
+def save_segments(
+    table_name, table_meta, data, filepath=None, sync=False, compact=False
+):
+    """
+    Write table data as segments.
+
+    A SegmentedTable still backed by the current segment files keeps
+    them: only the segments with updated records and the last one with
+    the inserted records are written again, next to the manifest with
+    the tombstones, unless compaction is due. Anything else is written
+    as a new generation of segments, slice by slice.
+
+    Args:
+        table_name: Name of the table
+        table_meta: Metadata of the table
+        data: List of records or SegmentedTable
+        filepath: Target manifest path, defaults to the table manifest
+        sync: Call fsync before returning if True
+        compact: Rewrite segments without deleted records even if the
+            share of them is below VACUUM_DEAD_RATIO
+    """
+    directory = segment_dir(table_name)
+    os.makedirs(directory, exist_ok=True)
+    if filepath is None:
+        filepath = manifest_path(table_name)
+
+    current = read_manifest(manifest_path(table_name))
+    if (
+        isinstance(data, SegmentedTable)
+        and current is not None
+        and data.files == [segment["file"] for segment in current["segments"]]
+        and not (compact and data.dead_count)
+        and not _needs_compaction(data)
+    ):
+        generation, segments = _changed_segments(
+            data, current, directory, table_meta["columns"], sync
+        )
+        manifest = dict(current, generation=generation, segments=segments)
+        _write_file(filepath, json.dumps(manifest).encode("utf-8"), sync)
+        _remove_unused(directory, segments, current)
+        return
+
+    generation = current["generation"] + 1 if current else 1
+    segments = _write_segments(
+        directory, generation, 0, data, table_meta["columns"], sync
+    )
+    manifest = {"generation": generation, "segments": segments}
+    _write_file(filepath, json.dumps(manifest).encode("utf-8"), sync)
+    _remove_unused(directory, segments, current)
+
+
+def remove_segments(table_name):
+    """
+    Delete the segment directory of a table.
+
+    Args:
+        table_name: Name of the table
+    """
+    shutil.rmtree(segment_dir(table_name), ignore_errors=True)
+
+
+def segments_size(table_name):
+    """
+    Get total size of the segment files of a table.
+
+    Args:
+        table_name: Name of the table
+
+    Returns:
+        Size in bytes (0 if the table has no segments)
+    """
+    return sum(os.path.getsize(path) for path, _, _ in segment_files(table_name))
+
+
+def compact_segments(table_name, table_meta, data, filepath=None, sync=False):
+    """
+    Write table data as new segments without deleted records.
+
+    Args:
+        table_name: Name of the table
+        table_meta: Metadata of the table
+        data: List of records or SegmentedTable
+        filepath: Target manifest path, defaults to the table manifest
+        sync: Call fsync before returning if True
+    """
+    save_segments(table_name, table_meta, data, filepath, sync, compact=True)
+
+
+class SegmentedTable(Sequence):
+    """
+    Table made of memory-mapped segments.
+
+    Records are decoded lazily by the segments (see columnar.MappedTable)
+    and records at tombstoned positions are skipped, so positions in the
+    table count live records only. Writers never touch the segment
+    files: mark_deleted() adds tombstones, replace_records() keeps
+    updated records over their segment and append() keeps inserted ones
+    after the last segment, until save_segments() writes them.
+    segment_files lists paths, first positions and tombstones so that
+    scans can be spread across processes; it is None while there are
+    changes that only live in memory.
+    """
+
+    def __init__(self, files):
+        """
+        Map segment files into memory.
+
+        Args:
+            files: List of (path, row count, deleted positions) tuples in
+                table order
+        """
+        self._paths = [path for path, _, _ in files]
+        self._segments = [columnar.MappedTable(path) for path in self._paths]
+        self._dead = [sorted(deleted) for _, _, deleted in files]
+        # Updated records by physical position, per segment
+        self._changed = [{} for _ in files]
+        self.tail = []
+        self.files = [os.path.basename(path) for path in self._paths]
+        self._count()
+
+    def _count(self):
+        self._starts = []
+        start = 0
+        for segment, dead in zip(self._segments, self._dead):
+            self._starts.append(start)
+            start += len(segment) - len(dead)
+        self._stored = start
+        self.dead_count = sum(len(dead) for dead in self._dead)
+        if self.tail or any(self._changed):
+            self.segment_files = None
+        else:
+            self.segment_files = list(zip(self._paths, self._starts, self._dead))
+
+    def __len__(self):
+        return self._stored + len(self.tail)
+
+    def _locate(self, index):
+        """Map a table position to (segment number, position in segment)."""
+        number = bisect_right(self._starts, index) - 1
+        dead = self._dead[number]
+        pos = index - self._starts[number]
+        if not dead:
+            return number, pos
+        # Skip as many physical rows as there are tombstones up to them
+        physical = pos
+        while True:
+            shifted = pos + bisect_right(dead, physical)
+            if shifted == physical:
+                return number, physical
+            physical = shifted
+
+    def _live(self, number, start, stop):
+        """Decode live records between physical positions of a segment."""
+        rows = self._segments[number][start:stop]
+        for pos, record in self._changed[number].items():
+            if start <= pos < stop:
+                rows[pos - start] = record
+        dead = self._dead[number]
+        first = bisect_left(dead, start)
+        last = bisect_left(dead, stop)
+        if first == last:
+            return rows
+        skip = {pos - start for pos in dead[first:last]}
+        return [row for pos, row in enumerate(rows) if pos not in skip]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            rows = self._stored_slice(start, min(stop, self._stored))
+            if stop > self._stored:
+                first = max(start, self._stored) - self._stored
+                rows.extend(self.tail[first : stop - self._stored])
+            return rows[::step] if step != 1 else rows
+
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("table index out of range")
+        if index >= self._stored:
+            return self.tail[index - self._stored]
+        number, pos = self._locate(index)
+        record = self._changed[number].get(pos)
+        return record if record is not None else self._segments[number][pos]
+
+    def _stored_slice(self, start, stop):
+        """Records at table positions start..stop of the segments."""
+        rows = []
+        if start < stop:
+            first_number, first_pos = self._locate(start)
+            last_number, last_pos = self._locate(stop - 1)
+            for number in range(first_number, last_number + 1):
+                low = first_pos if number == first_number else 0
+                high = (
+                    last_pos + 1
+                    if number == last_number
+                    else len(self._segments[number])
+                )
+                rows.extend(self._live(number, low, high))
+        return rows
+
+    def __iter__(self):
+        for number, segment in enumerate(self._segments):
+            if self._dead[number] or self._changed[number]:
+                yield from self._live(number, 0, len(segment))
+            else:
+                yield from segment
+        yield from self.tail
+
+    def append(self, record):
+        """
+        Insert a record after the last one.
+
+        Args:
+            record: Record with an ID above all IDs of the table
+        """
+        self.tail.append(record)
+        self.segment_files = None
+
+    def replace_records(self, positions, records):
+        """
+        Replace records with their updated versions.
+
+        Args:
+            positions: Table positions of the records
+            records: New records in the same order
+        """
+        for index, record in zip(positions, records):
+            if index >= self._stored:
+                self.tail[index - self._stored] = record
+            else:
+                number, pos = self._locate(index)
+                self._changed[number][pos] = record
+        self._count()
+
+    def mark_deleted(self, positions):
+        """
+        Delete records by adding tombstones.
+
+        Args:
+            positions: Table positions of the records
+        """
+        stored = [index for index in positions if index < self._stored]
+        located = [self._locate(index) for index in stored]
+        # Inserted records are not in any segment yet: they just go
+        for index in sorted(set(positions) - set(stored), reverse=True):
+            del self.tail[index - self._stored]
+        for number, pos in located:
+            insort(self._dead[number], pos)
+            self._changed[number].pop(pos, None)
+        self._count()
+
+    def touched_segments(self):
+        """
+        List segments with updated records.
+
+        Returns:
+            Segment numbers in table order
+        """
+        return [number for number, changed in enumerate(self._changed) if changed]
+
+    def segment_records(self, number):
+        """
+        Decode the live records of a segment, with updates applied.
+
+        Args:
+            number: Segment number
+
+        Returns:
+            List of records
+        """
+        return self._live(number, 0, len(self._segments[number]))
+
+    def manifest_segments(self):
+        """
+        Describe segments with their tombstones for the manifest.
+
+        Returns:
+            List of dictionaries like
+            {'file': '000001-00000.col', 'rows': 100000, 'deleted': [5]}
+        """
+        return [
+            {"file": name, "rows": len(segment), "deleted": dead}
+            for name, segment, dead in zip(self.files, self._segments, self._dead)
+        ]
+
+    def numeric_column(self, name):
+        """
+        Get raw bytes of the live values of an int or bool column.
+
+        Args:
+            name: Column name
+
+        Returns:
+            Pair (type, bytes) like MappedTable.numeric_column() or None
+            for other columns
+        """
+        if self.tail or any(self._changed):
+            return None
+        parts = [segment.numeric_column(name) for segment in self._segments]
+        if not parts or any(part is None for part in parts):
+            return None
+        col_type = parts[0][0]
+        width = 8 if col_type == "int" else 1
+        pieces = []
+        for (_, data), dead in zip(parts, self._dead):
+            start = 0
+            for pos in dead:
+                pieces.append(data[start * width : pos * width])
+                start = pos + 1
+            pieces.append(data[start * width :])
+        return col_type, b"".join(pieces)
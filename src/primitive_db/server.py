@@ -0,0 +1,331 @@
+"""Query server: many clients sharing one in-memory catalog.
+
+The server accepts connections with asyncio and speaks the line
+protocol of protocol.py. Commands are run by engine.execute() in a pool
+of threads against the session catalog of engine.py, so tables are
+loaded once for all clients.
+
+Each table has a reader/writer lock: select and info share it, insert,
+update, delete, load and create_index take it exclusively. Commands
+that change the set of tables or touch the files of all of them
+(create_table, drop_table, convert_table, vacuum, commit, checkpoint)
+take the catalog lock exclusively; all other commands hold it shared.
+Statements prepared by a client belong to its connection, and execute
+takes the lock of the table of the prepared statement.
+
+Writes are buffered by the catalog and flushed to disk every
+SERVER_FLUSH_INTERVAL seconds with one fsync per log, instead of on
+every command. Transactions (begin/rollback) belong to the whole
+catalog and are not available to clients.
+"""
+
+import asyncio
+import io
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from src.primitive_db import engine
+from src.primitive_db.constants import (
+    ERROR_SERVER_COMMAND,
+    ERROR_SERVER_LINE,
+    INFO_SERVER_STARTED,
+    INFO_SERVER_STOPPED,
+    SERVER_FLUSH_INTERVAL,
+    SERVER_HOST,
+    SERVER_LINE_LIMIT,
+    SERVER_PORT,
+    SERVER_WORKERS,
+)
+from src.primitive_db.parser import table_word
+from src.primitive_db.protocol import encode_reply
+
+# First words of commands by the lock they need
+TABLE_READS = {"select", "info"}
+TABLE_WRITES = {"insert", "update", "delete", "load", "create_index"}
+CATALOG_READS = {"list_tables", "help", "output", "cache_stats", "stats", "prepare"}
+# Lock modes of the operations of prepared statements
+PLAN_LOCKS = {
+    "select": "read",
+    "aggregate": "read",
+    "insert": "write",
+    "update": "write",
+    "delete": "write",
+}
+SERVER_UNSUPPORTED = {"begin", "rollback"}
+
+
+class RWLock:
+    """
+    Reader/writer lock that lets any number of readers or one writer in.
+
+    Waiting writers block new readers, so a steady stream of selects
+    cannot starve writes.
+    """
+
+    def __init__(self):
+        """Initialize an unlocked lock."""
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+
+    @contextmanager
+    def read(self):
+        """Hold the lock shared."""
+        with self._cond:
+            while self._writer or self._waiting_writers:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        """Hold the lock exclusively."""
+        with self._cond:
+            self._waiting_writers += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._waiting_writers -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+
+_catalog_lock = RWLock()
+_table_locks = {}
+_table_locks_guard = threading.Lock()
+
+
+def _table_lock(table_name):
+    with _table_locks_guard:
+        return _table_locks.setdefault(table_name, RWLock())
+
+
+def command_lock(user_input, session=None):
+    """
+    Find out which locks a command needs.
+
+    Args:
+        user_input: Command string
+        session: Settings of the client session, used to find the table
+            of a prepared statement for execute
+
+    Returns:
+        Pair (mode, table name): mode is "read" or "write" for the lock
+        of the table, or "catalog_read" / "catalog_write" with table
+        name None
+    """
+    words = user_input.split()
+    command = words[0].lower() if words else ""
+    lowered = [word.lower() for word in words]
+
+    table_name = None
+    if command == "execute" and len(words) > 1 and session is not None:
+        plan = session["prepared"].get(words[1].split("(")[0])
+        if plan is not None and plan["op"] in PLAN_LOCKS:
+            return PLAN_LOCKS[plan["op"]], plan["table"]
+    elif command == "select" and "from" in lowered:
+        position = lowered.index("from") + 1
+        table_name = words[position] if position < len(words) else None
+    elif command in ("insert", "delete"):
+        table_name = words[2] if len(words) > 2 else None
+    elif command in TABLE_READS | TABLE_WRITES:
+        table_name = words[1] if len(words) > 1 else None
+
+    if table_name is not None:
+        mode = "read" if command in TABLE_READS else "write"
+        return mode, table_word(table_name)
+    if command in CATALOG_READS or not command:
+        return "catalog_read", None
+    return "catalog_write", None
+
+
+@contextmanager
+def _locked(mode, table_name):
+    if mode == "catalog_write":
+        with _catalog_lock.write():
+            yield
+        return
+    with _catalog_lock.read():
+        if table_name is None:
+            yield
+            return
+        lock = _table_lock(table_name)
+        with lock.read() if mode == "read" else lock.write():
+            yield
+
+
+class _ThreadOutput(io.TextIOBase):
+    """Standard output that goes to a per-thread buffer while capturing."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self._local = threading.local()
+
+    def _target(self):
+        return getattr(self._local, "capture", None) or self.stream
+
+    def write(self, text):
+        return self._target().write(text)
+
+    def flush(self):
+        self._target().flush()
+
+    @contextmanager
+    def capture(self):
+        """Collect output of the current thread into a StringIO."""
+        self._local.capture = io.StringIO()
+        try:
+            yield self._local.capture
+        finally:
+            self._local.capture = None
+
+
+def run_command(output, user_input, session):
+    """
+    Run one client command under the locks it needs.
+
+    Args:
+        output: Installed _ThreadOutput
+        user_input: Command string
+        session: Settings of the client session
+
+    Returns:
+        Output of the command
+    """
+    words = user_input.split()
+    if words and words[0].lower() in SERVER_UNSUPPORTED:
+        return ERROR_SERVER_COMMAND.format(command=words[0].lower())
+
+    mode, table_name = command_lock(user_input, session)
+    with _locked(mode, table_name), output.capture() as buffer:
+        try:
+            engine.execute(user_input, session)
+        except Exception as e:
+            print(f"Ошибка: {e}")
+    return buffer.getvalue()
+
+
+def flush_changes():
+    """Write buffered changes of all clients and the metrics file to disk."""
+    with _catalog_lock.write():
+        if engine.catalog.is_dirty():
+            engine.catalog.commit()
+    engine.dump_metrics()
+
+
+async def _flush_periodically(executor, interval):
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(interval)
+        await loop.run_in_executor(executor, flush_changes)
+
+
+async def _read_command(reader):
+    """
+    Read one command line from a client.
+
+    Args:
+        reader: StreamReader of the connection
+
+    Returns:
+        Line bytes, b"" at the end of the stream or None if the line is
+        longer than the reader limit (the rest of it is skipped)
+    """
+    too_long = False
+    while True:
+        try:
+            line = await reader.readuntil(b"\n")
+        except asyncio.IncompleteReadError as e:
+            line = e.partial
+        except asyncio.LimitOverrunError as e:
+            # Drop what was read so far and look for the end of the line
+            await reader.readexactly(e.consumed)
+            too_long = True
+            continue
+        return None if too_long else line
+
+
+async def _handle_client(reader, writer, executor, output):
+    loop = asyncio.get_running_loop()
+    # Clients cannot answer confirmation questions
+    session = {"output_format": "table", "assume_yes": True, "prepared": {}}
+    try:
+        while True:
+            line = await _read_command(reader)
+            if line is None:
+                reply = ERROR_SERVER_LINE.format(limit=SERVER_LINE_LIMIT)
+                writer.write(encode_reply(reply))
+                await writer.drain()
+                continue
+            if not line:
+                break
+            user_input = line.decode("utf-8", errors="replace").strip()
+            if user_input.lower() == "exit":
+                break
+            result = await loop.run_in_executor(
+                executor, run_command, output, user_input, session
+            )
+            writer.write(encode_reply(result))
+            await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def _serve(host, port, workers, flush_interval, output):
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        server = await asyncio.start_server(
+            lambda reader, writer: _handle_client(reader, writer, executor, output),
+            host,
+            port,
+            limit=SERVER_LINE_LIMIT,
+        )
+        print(INFO_SERVER_STARTED.format(host=host, port=port))
+        flusher = asyncio.create_task(_flush_periodically(executor, flush_interval))
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            flusher.cancel()
+
+
+def serve(
+    host=SERVER_HOST,
+    port=SERVER_PORT,
+    workers=SERVER_WORKERS,
+    flush_interval=SERVER_FLUSH_INTERVAL,
+):
+    """
+    Run the query server until interrupted.
+
+    Args:
+        host: Address to listen on
+        port: Port to listen on
+        workers: Number of threads running commands
+        flush_interval: Seconds between flushes of buffered changes
+    """
+    engine.catalog.autocommit = False
+    output = _ThreadOutput(sys.stdout)
+    sys.stdout = output
+    try:
+        asyncio.run(_serve(host, port, workers, flush_interval, output))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sys.stdout = output.stream
+        engine.catalog.close()
+        print(INFO_SERVER_STOPPED)
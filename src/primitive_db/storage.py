@@ -0,0 +1,211 @@
+"""Pluggable storage backends for table data.
+
+The backend of a table is chosen by the "format" key of its metadata:
+
+- "json" - human-readable JSON list of records (default);
+- "columnar" - compact binary columnar format (see columnar.py);
+- "segmented" - directory of columnar segments (see segments.py).
+
+Backends with an "open" function can also return a lazy, read-only view
+of the table instead of decoding it whole.
+"""
+
+import os
+
+from src.primitive_db import columnar, segments
+from src.primitive_db.constants import DATA_DIR, DEFAULT_STORAGE_FORMAT, MMAP_READS
+from src.primitive_db.rows import schema_row_type
+from src.primitive_db.utils import (
+    file_size,
+    load_table_data,
+    save_table_data,
+    table_path,
+)
+
+
+def table_format(table_meta):
+    """
+    Get storage format of a table.
+
+    Args:
+        table_meta: Metadata of the table or None
+
+    Returns:
+        Format name
+    """
+    if not table_meta:
+        return DEFAULT_STORAGE_FORMAT
+    return table_meta.get("format", DEFAULT_STORAGE_FORMAT)
+
+
+def table_row_type(table_meta):
+    """
+    Get row class of a table.
+
+    Args:
+        table_meta: Metadata of the table or None
+
+    Returns:
+        Row class or None if the table has no schema
+    """
+    if not table_meta:
+        return None
+    return schema_row_type(table_meta["columns"])
+
+
+def _columnar_path(table_name):
+    return f"{DATA_DIR}/{table_name}.col"
+
+
+def _load_columnar(table_name, table_meta):
+    try:
+        with open(_columnar_path(table_name), "rb") as f:
+            return columnar.decode(f.read())
+    except FileNotFoundError:
+        return []
+
+
+def _open_columnar(table_name, table_meta):
+    try:
+        return columnar.MappedTable(_columnar_path(table_name))
+    except FileNotFoundError:
+        return []
+
+
+def _save_columnar(table_name, table_meta, data, filepath=None, sync=False):
+    os.makedirs(DATA_DIR, exist_ok=True)
+
+    if filepath is None:
+        filepath = _columnar_path(table_name)
+    payload = columnar.encode(data, table_meta["columns"])
+    with open(filepath, "wb") as f:
+        f.write(payload)
+        if sync:
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def _save_json(table_name, table_meta, data, filepath=None, sync=False):
+    save_table_data(table_name, data, filepath=filepath, sync=sync)
+
+
+BACKENDS = {
+    "json": {
+        "path": table_path,
+        "load": lambda table_name, table_meta: load_table_data(
+            table_name, table_row_type(table_meta)
+        ),
+        "save": _save_json,
+    },
+    "columnar": {
+        "path": _columnar_path,
+        "load": _load_columnar,
+        "open": _open_columnar,
+        "save": _save_columnar,
+    },
+    "segmented": {
+        "path": segments.manifest_path,
+        "load": segments.load_segments,
+        "open": segments.open_segments,
+        "save": segments.save_segments,
+        "compact": segments.compact_segments,
+        "size": segments.segments_size,
+        "remove": segments.remove_segments,
+    },
+}
+
+
+def data_path(table_name, table_meta):
+    """
+    Build path to the data file of a table for its storage format.
+
+    Args:
+        table_name: Name of the table
+        table_meta: Metadata of the table
+
+    Returns:
+        Path like "data/users.json" or "data/users.col"
+    """
+    return BACKENDS[table_format(table_meta)]["path"](table_name)
+
+
+def table_size(table_name, table_meta):
+    """
+    Get size of the data files of a table on disk.
+
+    Args:
+        table_name: Name of the table
+        table_meta: Metadata of the table
+
+    Returns:
+        Size in bytes (0 if the table was never saved)
+    """
+    backend = BACKENDS[table_format(table_meta)]
+    if "size" in backend:
+        return backend["size"](table_name)
+    return file_size(backend["path"](table_name))
+
+
+def remove_table(table_name, table_meta):
+    """
+    Delete the data files of a table.
+
+    Args:
+        table_name: Name of the table
+        table_meta: Metadata of the table
+    """
+    backend = BACKENDS[table_format(table_meta)]
+    if "remove" in backend:
+        backend["remove"](table_name)
+    elif os.path.exists(backend["path"](table_name)):
+        os.remove(backend["path"](table_name))
+
+
+def load_table(table_name, table_meta):
+    """
+    Load table data using its storage backend.
+
+    Args:
+        table_name: Name of the table
+        table_meta: Metadata of the table
+
+    Returns:
+        List of records or empty list if file not found
+    """
+    return BACKENDS[table_format(table_meta)]["load"](table_name, table_meta)
+
+
+def open_table(table_name, table_meta):
+    """
+    Open table for reading, memory-mapping it if the backend supports it.
+
+    Args:
+        table_name: Name of the table
+        table_meta: Metadata of the table
+
+    Returns:
+        Read-only sequence of records (a list if the backend is not lazy)
+    """
+    backend = BACKENDS[table_format(table_meta)]
+    if MMAP_READS and "open" in backend:
+        return backend["open"](table_name, table_meta)
+    return backend["load"](table_name, table_meta)
+
+
+def save_table(
+    table_name, table_meta, data, filepath=None, sync=False, compact=False
+):
+    """
+    Save table data using its storage backend.
+
+    Args:
+        table_name: Name of the table
+        table_meta: Metadata of the table
+        data: List of records
+        filepath: Target path, defaults to the table data file
+        sync: Call fsync before returning if True
+        compact: Drop deleted records kept by backends with tombstones
+    """
+    backend = BACKENDS[table_format(table_meta)]
+    save = backend["compact"] if compact and "compact" in backend else backend["save"]
+    save(table_name, table_meta, data, filepath=filepath, sync=sync)
@@ -0,0 +1,145 @@
+"""Atomic commit of several files at once.
+
+A transaction commit never overwrites a file in place:
+
+1. every changed file is written next to its target as <file>.txn and
+   fsynced;
+2. the commit record (TRANSACTION_FILE) listing the staged files and the
+   files to remove is written to a temporary file and renamed into
+   place - this rename is the commit point;
+3. the staged files are renamed over their targets and the removed
+   files are deleted;
+4. the commit record is deleted.
+
+recover_transaction() rolls a commit forward if the record exists (renames and
+removals are safe to repeat) and otherwise deletes staged files left by
+a commit that never reached its commit point. Either way all files of a
+transaction change together.
+"""
+
+import json
+import os
+
+from src.primitive_db.constants import (
+    DATA_DIR,
+    TRANSACTION_FILE,
+    TRANSACTION_SUFFIX,
+)
+
+
+def staged_path(filepath):
+    """
+    Build path a file is staged at until the commit.
+
+    Args:
+        filepath: Path to target file
+
+    Returns:
+        Path like "data/users.json.txn"
+    """
+    return filepath + TRANSACTION_SUFFIX
+
+
+def write_staged(filepath, payload):
+    """
+    Stage new contents of a file.
+
+    Args:
+        filepath: Path to target file
+        payload: New contents as bytes
+
+    Returns:
+        Staged path
+    """
+    staged = staged_path(filepath)
+    directory = os.path.dirname(staged)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(staged, "wb") as f:
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    return staged
+
+
+def _sync_dirs(paths):
+    """Persist renames in directories of the paths (best effort)."""
+    for directory in {os.path.dirname(path) or "." for path in paths}:
+        try:
+            fd = os.open(directory, os.O_RDONLY)
+        except OSError:
+            continue
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+
+def _roll_forward(record, record_file):
+    for target in record["replace"]:
+        staged = staged_path(target)
+        if os.path.exists(staged):
+            os.replace(staged, target)
+    for target in record["remove"]:
+        if os.path.exists(target):
+            os.remove(target)
+    _sync_dirs(record["replace"] + record["remove"])
+    os.remove(record_file)
+
+
+def commit_files(replace, remove, record_file=TRANSACTION_FILE):
+    """
+    Atomically install staged files and delete others.
+
+    Args:
+        replace: Target paths whose staged files (see write_staged) take
+            their place
+        remove: Paths of files to delete
+        record_file: Path to the commit record
+    """
+    record = {"replace": list(replace), "remove": list(remove)}
+    tmp = record_file + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(record, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, record_file)
+    _sync_dirs([record_file])
+    _roll_forward(record, record_file)
+
+
+def recover_transaction(record_file=TRANSACTION_FILE, metadata_file=None):
+    """
+    Finish a commit interrupted by a crash or discard its staged files.
+
+    Args:
+        record_file: Path to the commit record
+        metadata_file: Path to metadata file, whose staged copy lies
+            outside the data directory
+    """
+    try:
+        with open(record_file, "r", encoding="utf-8") as f:
+            record = json.load(f)
+    except FileNotFoundError:
+        record = None
+
+    if record is not None:
+        _roll_forward(record, record_file)
+        return
+
+    # The record is renamed into place whole, so a half-written one can
+    # only be the temporary file.
+    staged = [record_file + ".tmp"]
+    staged += [
+        os.path.join(directory, name)
+        for directory, _, names in os.walk(DATA_DIR)
+        for name in names
+        if name.endswith(TRANSACTION_SUFFIX)
+    ]
+    if metadata_file is not None:
+        staged.append(staged_path(metadata_file))
+    for path in staged:
+        if os.path.exists(path):
+            os.remove(path)
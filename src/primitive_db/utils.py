@@ -3,7 +3,22 @@
 import json
 import os
 
+from src.primitive_db import metrics
 from src.primitive_db.constants import DATA_DIR
+from src.primitive_db.rows import row_from_dict
+
+
+def row_to_dict(record):
+    """
+    Convert a row to a dictionary for JSON serialization.
+
+    Args:
+        record: Row object
+
+    Returns:
+        Dictionary with row values
+    """
+    return record.to_dict()
 
 
 def load_metadata(filepath):
@@ -18,53 +33,103 @@ def load_metadata(filepath):
     """
     try:
         with open(filepath, "r", encoding="utf-8") as f:
+            metrics.add("bytes_read", os.fstat(f.fileno()).st_size)
             return json.load(f)
     except FileNotFoundError:
         return {}
 
 
-def save_metadata(filepath, data):
+def save_metadata(filepath, data, sync=False):
     """
     Save metadata to JSON file.
 
     Args:
         filepath: Path to JSON file
         data: Dictionary to save
+        sync: Call fsync before returning if True
     """
     with open(filepath, "w", encoding="utf-8") as f:
         json.dump(data, f, ensure_ascii=False, indent=2)
+        metrics.add("bytes_written", f.tell())
+        if sync:
+            f.flush()
+            os.fsync(f.fileno())
 
 
-def load_table_data(table_name):
+def table_path(table_name):
+    """
+    Build path to the data file of a table.
+
+    Args:
+        table_name: Name of the table
+
+    Returns:
+        Path like "data/users.json"
+    """
+    return f"{DATA_DIR}/{table_name}.json"
+
+
+def load_table_data(table_name, row_class=None):
     """
     Load table data from JSON file.
 
     Args:
         table_name: Name of the table
+        row_class: Row class to build records with, or None for dicts
 
     Returns:
         List of records or empty list if file not found
     """
-    filepath = f"{DATA_DIR}/{table_name}.json"
+    filepath = table_path(table_name)
+    object_hook = None
+    if row_class is not None:
+        # Each object is converted as soon as it is parsed, so the dicts
+        # never exist all at once.
+        def object_hook(record):
+            return row_from_dict(row_class, record)
+
     try:
         with open(filepath, "r", encoding="utf-8") as f:
-            return json.load(f)
+            metrics.add("bytes_read", os.fstat(f.fileno()).st_size)
+            return json.load(f, object_hook=object_hook)
     except FileNotFoundError:
         return []
 
 
-def save_table_data(table_name, data):
+def save_table_data(table_name, data, filepath=None, sync=False):
     """
     Save table data to JSON file.
 
     Args:
         table_name: Name of the table
         data: List of records to save
+        filepath: Target path, defaults to the table data file
+        sync: Call fsync before returning if True
     """
     # Create data directory if it doesn't exist
     os.makedirs(DATA_DIR, exist_ok=True)
 
-    filepath = f"{DATA_DIR}/{table_name}.json"
+    if filepath is None:
+        filepath = table_path(table_name)
     with open(filepath, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+        json.dump(data, f, ensure_ascii=False, indent=2, default=row_to_dict)
+        metrics.add("bytes_written", f.tell())
+        if sync:
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def file_size(filepath):
+    """
+    Get size of a file.
+
+    Args:
+        filepath: Path to file
 
+    Returns:
+        Size in bytes or 0 if file not found
+    """
+    try:
+        return os.path.getsize(filepath)
+    except FileNotFoundError:
+        return 0
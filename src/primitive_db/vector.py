@@ -0,0 +1,383 @@
+"""Optional NumPy execution path for numeric columns.
+
+int and bool columns of a table are kept as NumPy arrays next to its
+records. WHERE conditions on them are evaluated as boolean masks over the
+whole column at once and SET values are written with masked assignment.
+Conditions that can not be vectorized (strings, LIKE) are checked per
+record on the rows selected by the mask.
+
+Without NumPy installed every function here reports that it can not
+help and the callers keep using compiled predicates over the records.
+"""
+
+from itertools import compress
+from operator import attrgetter, itemgetter
+
+from src.primitive_db.query import compile_where, conjuncts, record_class
+
+# NumPy is an optional dependency, imported by available() on first use:
+# loading it takes longer than starting the rest of the program
+np = None
+_numpy_checked = False
+
+# Column types stored as arrays and their dtypes
+VECTOR_DTYPES = {"int": "int64", "bool": "bool"}
+
+# Python value types a column array can represent exactly
+VECTOR_VALUE_TYPES = {"int": {int, bool}, "bool": {bool}}
+
+# Literals outside int64 are left to the per-record path
+INT64_MIN = -(2**63)
+INT64_MAX = 2**63 - 1
+
+
+def available():
+    """
+    Check whether NumPy is installed, importing it on the first call.
+
+    Returns:
+        True if the vectorized path can be used
+    """
+    global np, _numpy_checked
+    if not _numpy_checked:
+        try:
+            import numpy
+        except ImportError:
+            pass
+        else:
+            np = numpy
+        _numpy_checked = True
+    return np is not None
+
+
+def build_vectors(table_data, columns):
+    """
+    Prepare column arrays for a table.
+
+    Arrays are created lazily for the columns that queries use.
+
+    Args:
+        table_data: List of records
+        columns: Column definitions from metadata
+
+    Returns:
+        Dictionary with the records, their count, numeric column types
+        and arrays
+    """
+    return {
+        "rows": table_data,
+        "length": len(table_data),
+        "types": {
+            col["name"]: col["type"]
+            for col in columns
+            if col["type"] in VECTOR_DTYPES
+        },
+        "arrays": {},
+    }
+
+
+def _getter(table_data, column):
+    row_class = type(table_data[0]) if len(table_data) else None
+    slot = getattr(row_class, "_slot_of", {}).get(column)
+    return attrgetter(slot) if slot is not None else itemgetter(column)
+
+
+def _to_array(records, column, col_type):
+    """Build the array of a column, None if a value does not fit it."""
+    # Memory-mapped columnar tables already hold numeric columns as
+    # packed arrays, so they are wrapped without copying.
+    numeric_column = getattr(records, "numeric_column", None)
+    if numeric_column is not None:
+        raw = numeric_column(column)
+        if raw is not None:
+            col_type, data = raw
+            if col_type == "int":
+                return np.frombuffer(data, dtype="<i8")
+            return np.frombuffer(data, dtype=np.uint8).view(np.bool_)
+
+    # NumPy silently converts strings and floats, so values written
+    # without validation keep the column on the per-record path.
+    values = list(map(_getter(records, column), records))
+    if not set(map(type, values)) <= VECTOR_VALUE_TYPES[col_type]:
+        return None
+    try:
+        return np.array(values, dtype=VECTOR_DTYPES[col_type])
+    except OverflowError:
+        return None
+
+
+def refresh(vectors, table_data):
+    """
+    Bring column arrays up to date with the records.
+
+    Records appended since the arrays were built are added to them;
+    any other change of the table drops the arrays.
+
+    Args:
+        vectors: Result of build_vectors() or None
+        table_data: Current list of records
+
+    Returns:
+        True if the arrays match the records
+    """
+    if vectors is None or vectors["rows"] is not table_data:
+        return False
+    length = len(table_data)
+    if length < vectors["length"]:
+        return False
+    if length > vectors["length"]:
+        tail = table_data[vectors["length"] :]
+        for column, array in list(vectors["arrays"].items()):
+            extra = _to_array(tail, column, vectors["types"][column])
+            if extra is None:
+                return False
+            vectors["arrays"][column] = np.concatenate([array, extra])
+        vectors["length"] = length
+    return True
+
+
+def drop(vectors):
+    """
+    Forget column arrays after records were changed elsewhere.
+
+    Args:
+        vectors: Result of build_vectors() or None
+    """
+    if vectors is not None:
+        vectors["rows"] = None
+        vectors["arrays"].clear()
+
+
+def column_array(vectors, column):
+    """
+    Get the array of a numeric column, building it on first use.
+
+    Args:
+        vectors: Result of build_vectors()
+        column: Column name
+
+    Returns:
+        NumPy array or None if the column is not numeric
+    """
+    array = vectors["arrays"].get(column)
+    if array is None:
+        col_type = vectors["types"].get(column)
+        if col_type is None:
+            return None
+        array = _to_array(vectors["rows"], column, col_type)
+        if array is None:
+            del vectors["types"][column]
+            return None
+        vectors["arrays"][column] = array
+    return array
+
+
+def _numeric(value):
+    return isinstance(value, int) and INT64_MIN <= value <= INT64_MAX
+
+
+def _node_mask(vectors, node):
+    """Evaluate a condition node as a mask, None if not vectorizable."""
+    kind = node[0]
+    if kind in ("and", "or"):
+        masks = [_node_mask(vectors, child) for child in node[1:]]
+        if any(mask is None for mask in masks):
+            return None
+        combine = np.logical_and if kind == "and" else np.logical_or
+        return combine.reduce(masks)
+    if kind == "not":
+        mask = _node_mask(vectors, node[1])
+        return None if mask is None else ~mask
+    if kind == "cmp":
+        _, op, column, value = node
+        array = column_array(vectors, column)
+        if array is None or not _numeric(value):
+            return None
+        if op == "=":
+            return array == value
+        if op == "!=":
+            return array != value
+        if op == "<":
+            return array < value
+        if op == "<=":
+            return array <= value
+        if op == ">":
+            return array > value
+        return array >= value
+    if kind == "in":
+        _, column, values = node
+        array = column_array(vectors, column)
+        if array is None or not all(_numeric(value) for value in values):
+            return None
+        return np.isin(array, [int(value) for value in values])
+    return None
+
+
+def where_mask(vectors, where_clause):
+    """
+    Evaluate as much of a condition as possible as a boolean mask.
+
+    Args:
+        vectors: Result of build_vectors()
+        where_clause: Condition tree
+
+    Returns:
+        Pair (mask, residual) where residual is the part of the condition
+        (a condition tree or None) that still has to be checked on the
+        records selected by the mask, or None if nothing can be
+        vectorized
+    """
+    masks = []
+    residual = []
+    for node in conjuncts(where_clause):
+        mask = _node_mask(vectors, node)
+        if mask is None:
+            residual.append(node)
+        else:
+            masks.append(mask)
+    if not masks:
+        return None
+
+    mask = np.logical_and.reduce(masks) if len(masks) > 1 else masks[0]
+    if not residual:
+        return mask, None
+    return mask, residual[0] if len(residual) == 1 else ("and", *residual)
+
+
+def matching_positions(vectors, table_data, where_clause):
+    """
+    Find positions of records matching a condition using column masks.
+
+    Args:
+        vectors: Result of build_vectors()
+        table_data: List of records
+        where_clause: Condition tree
+
+    Returns:
+        Array of positions in ascending order, or None if no part of the
+        condition can be vectorized
+    """
+    masked = where_mask(vectors, where_clause)
+    if masked is None:
+        return None
+    mask, residual = masked
+    selected = np.flatnonzero(mask)
+    if residual is not None:
+        predicate = compile_where(residual, record_class(table_data))
+        keep = [predicate(table_data[pos]) for pos in selected.tolist()]
+        selected = selected[np.array(keep, dtype=bool)]
+    return selected
+
+
+def aggregate_groups(vectors, table_data, aggregates, where_clause):
+    """
+    Compute aggregates over numeric columns from their arrays.
+
+    Args:
+        vectors: Result of build_vectors()
+        table_data: List of records
+        aggregates: List of (func, column) pairs without plain columns
+        where_clause: Condition tree or None
+
+    Returns:
+        Dictionary like aggregate.compile_aggregates() returns for a
+        query without group by, or None if a column is not numeric or
+        no part of the condition can be vectorized
+    """
+    arrays = {}
+    for _, column in aggregates:
+        if column is not None and column not in arrays:
+            arrays[column] = column_array(vectors, column)
+            if arrays[column] is None:
+                return None
+
+    selected = None
+    if where_clause is not None:
+        selected = matching_positions(vectors, table_data, where_clause)
+        if selected is None:
+            return None
+    count = len(table_data) if selected is None else len(selected)
+    if not count:
+        return {}
+
+    state = [count]
+    for func, column in aggregates:
+        if func not in ("sum", "avg", "min", "max"):
+            state.append(None)
+            continue
+        values = arrays[column] if selected is None else arrays[column][selected]
+        if func == "min":
+            state.append(values.min().item())
+        elif func == "max":
+            state.append(values.max().item())
+        elif values.dtype == np.bool_:
+            state.append(int(np.count_nonzero(values)))
+        elif max(-int(values.min()), int(values.max())) * count <= INT64_MAX:
+            state.append(int(values.sum()))
+        else:
+            # The int64 sum could overflow
+            state.append(sum(values.tolist()))
+    return {None: state}
+
+
+def assign(vectors, selected, set_clause):
+    """
+    Write SET values into column arrays with masked assignment.
+
+    Args:
+        vectors: Result of build_vectors()
+        selected: Positions of updated records
+        set_clause: Dictionary like {'age': 29}
+
+    Returns:
+        False if a value does not fit its column array (the arrays are
+        dropped then), True otherwise
+    """
+    for column, value in set_clause.items():
+        col_type = vectors["types"].get(column)
+        if col_type is None or column == "ID":
+            continue
+        if type(value) not in VECTOR_VALUE_TYPES[col_type] or not _numeric(value):
+            drop(vectors)
+            return False
+        array = vectors["arrays"].get(column)
+        if array is not None:
+            array[selected] = value
+    return True
+
+
+def discard(vectors, selected):
+    """
+    Remove values at the given positions from column arrays.
+
+    Used when the records themselves were deleted in place.
+
+    Args:
+        vectors: Result of build_vectors()
+        selected: Positions of deleted records
+    """
+    keep = np.ones(vectors["length"], dtype=bool)
+    keep[selected] = False
+    for column, array in vectors["arrays"].items():
+        vectors["arrays"][column] = array[keep]
+    vectors["length"] -= len(selected)
+
+
+def remove(vectors, table_data, selected):
+    """
+    Remove records at the given positions from records and arrays.
+
+    Args:
+        vectors: Result of build_vectors()
+        table_data: List of records
+        selected: Positions of records to delete
+
+    Returns:
+        New list of the remaining records
+    """
+    keep = np.ones(len(table_data), dtype=bool)
+    keep[selected] = False
+    new_data = list(compress(table_data, keep.tolist()))
+    discard(vectors, selected)
+    vectors["rows"] = new_data
+    return new_data
@@ -0,0 +1,276 @@
+"""Append-only write-ahead log for table changes.
+
+Every write command appends one compact JSON line to data/<table>.wal
+instead of rewriting the base file (data/<table>.json or another storage
+format). A checkpoint folds the log into the base file:
+
+1. the new base file is written to <base>.tmp and fsynced;
+2. data/<table>.wal is renamed to data/<table>.wal.done;
+3. <base>.tmp is renamed to <base>;
+4. data/<table>.wal.done is removed.
+
+recover() completes or discards an interrupted checkpoint, so after a
+crash the table is always base file + replayed log.
+"""
+
+import json
+import os
+
+from src.primitive_db.constants import DATA_DIR
+from src.primitive_db.index import find_position, find_record
+from src.primitive_db.query import compile_where
+from src.primitive_db.rows import row_from_dict
+from src.primitive_db.storage import data_path, save_table
+
+
+def wal_path(table_name):
+    """
+    Build path to the log file of a table.
+
+    Args:
+        table_name: Name of the table
+
+    Returns:
+        Path like "data/users.wal"
+    """
+    return f"{DATA_DIR}/{table_name}.wal"
+
+
+def _sync_dir():
+    """Persist renames in the data directory (best effort)."""
+    try:
+        fd = os.open(DATA_DIR, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def recover(table_name, table_meta):
+    """
+    Finish or roll back a checkpoint interrupted by a crash.
+
+    Args:
+        table_name: Name of the table
+        table_meta: Metadata of the table
+    """
+    base = data_path(table_name, table_meta)
+    done = wal_path(table_name) + ".done"
+    tmp = base + ".tmp"
+
+    if os.path.exists(done):
+        # The log was already retired, so the new base file is complete.
+        if os.path.exists(tmp):
+            os.replace(tmp, base)
+        os.remove(done)
+        _sync_dir()
+    elif os.path.exists(tmp):
+        # The log is still current: the half-made base file is useless.
+        os.remove(tmp)
+
+
+def read_entries(table_name):
+    """
+    Read log entries of a table.
+
+    A torn last line left by a crash is cut off, so that new entries are
+    not appended after garbage.
+
+    Args:
+        table_name: Name of the table
+
+    Returns:
+        List of entries
+    """
+    entries = []
+    good_end = 0
+    path = wal_path(table_name)
+    try:
+        with open(path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    break
+                good_end += len(line)
+            torn = f.seek(0, os.SEEK_END) != good_end
+    except FileNotFoundError:
+        return entries
+
+    if torn:
+        os.truncate(path, good_end)
+    return entries
+
+
+def encode_entries(entries):
+    """
+    Serialize log entries as they are stored in the log file.
+
+    Args:
+        entries: List of entries
+
+    Returns:
+        String of JSON lines
+    """
+    return "".join(
+        json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n"
+        for entry in entries
+    )
+
+
+def apply_entry(table_data, entry, row_class):
+    """
+    Apply one log entry to table data.
+
+    Lazy tables that can be changed in place (see
+    segments.SegmentedTable) keep their mapped files and get the entry
+    applied over them.
+
+    Args:
+        table_data: List of records or a lazy table with replace_records()
+        entry: Entry like {'op': 'insert', 'row': {...}} or
+            {'op': 'update', 'ids': [...], 'set': {...}}
+        row_class: Row class of the table
+
+    Returns:
+        Updated table data
+    """
+    if hasattr(table_data, "replace_records"):
+        _apply_in_place(table_data, entry, row_class)
+        return table_data
+
+    op = entry["op"]
+
+    if op == "insert":
+        table_data.append(row_from_dict(row_class, entry["row"]))
+    elif op == "update" and "ids" in entry:
+        for record_id in entry["ids"]:
+            record = find_record(table_data, record_id)
+            if record is not None:
+                for key, value in entry["set"].items():
+                    record[key] = value
+    elif op == "update":
+        predicate = compile_where(entry["where"], row_class)
+        for record in table_data:
+            if predicate(record):
+                for key, value in entry["set"].items():
+                    if key in record and key != "ID":
+                        record[key] = value
+    elif op == "delete" and "ids" in entry:
+        deleted = set(entry["ids"])
+        table_data = [record for record in table_data if record["ID"] not in deleted]
+    elif op == "delete":
+        predicate = compile_where(entry["where"], row_class)
+        table_data = [record for record in table_data if not predicate(record)]
+
+    return table_data
+
+
+def _apply_in_place(table_data, entry, row_class):
+    op = entry["op"]
+    if op == "insert":
+        table_data.append(row_from_dict(row_class, entry["row"]))
+        return
+
+    if "ids" in entry:
+        positions = [find_position(table_data, record_id) for record_id in entry["ids"]]
+        positions = sorted(pos for pos in positions if pos is not None)
+    else:
+        predicate = compile_where(entry["where"], row_class)
+        positions = [pos for pos, record in enumerate(table_data) if predicate(record)]
+
+    if op == "delete":
+        table_data.mark_deleted(positions)
+    elif op == "update":
+        records = [table_data[pos] for pos in positions]
+        for record in records:
+            for key, value in entry["set"].items():
+                if key in record and key != "ID":
+                    record[key] = value
+        table_data.replace_records(positions, records)
+
+
+class WalWriter:
+    """
+    Appender for the log of one table with batched fsync.
+
+    Every entry is flushed to the OS immediately, so it survives a
+    process crash. fsync is issued once per fsync_batch entries (0 means
+    never, leaving it to the OS), trading durability on power loss for
+    throughput.
+    """
+
+    def __init__(self, table_name, fsync_batch):
+        """
+        Open log for appending.
+
+        Args:
+            table_name: Name of the table
+            fsync_batch: Number of entries between fsync calls
+        """
+        os.makedirs(DATA_DIR, exist_ok=True)
+        self.table_name = table_name
+        self.fsync_batch = fsync_batch
+        self.unsynced = 0
+        self._file = open(wal_path(table_name), "a", encoding="utf-8")
+
+    def append(self, entries):
+        """
+        Append entries to the log.
+
+        Args:
+            entries: List of entries
+        """
+        self._file.write(encode_entries(entries))
+        self._file.flush()
+        self.unsynced += len(entries)
+        if self.fsync_batch and self.unsynced >= self.fsync_batch:
+            self.sync()
+
+    def sync(self):
+        """Force log entries to stable storage."""
+        if self.unsynced:
+            os.fsync(self._file.fileno())
+            self.unsynced = 0
+
+    def close(self):
+        """Sync and close the log file."""
+        self.sync()
+        self._file.close()
+
+
+def checkpoint(table_name, table_meta, table_data, writer=None, compact=False):
+    """
+    Compact the log into the base file.
+
+    Args:
+        table_name: Name of the table
+        table_meta: Metadata of the table
+        table_data: Current list of records (base file + log)
+        writer: Open WalWriter of the table to close, or None
+        compact: Also drop deleted records kept as tombstones
+    """
+    if writer is not None:
+        writer.close()
+
+    base = data_path(table_name, table_meta)
+    log = wal_path(table_name)
+    done = log + ".done"
+    tmp = base + ".tmp"
+
+    save_table(
+        table_name, table_meta, table_data, filepath=tmp, sync=True, compact=compact
+    )
+    if os.path.exists(log):
+        os.replace(log, done)
+        _sync_dir()
+    os.replace(tmp, base)
+    _sync_dir()
+    if os.path.exists(done):
+        os.remove(done)